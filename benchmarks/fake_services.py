@@ -0,0 +1,297 @@
+"""
+In-memory stand-ins for Fence, indexd and a MinIO/S3 bucket, served locally so
+that the gen3minioclient can be benchmarked without a Gen3 commons or MinIO
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import formatdate
+from uuid import uuid4
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+
+
+def encode_jwt(claims):
+    # Fence and the Gen3 SDK only ever decode the claims, so the signature
+    # does not need to be valid
+    def encode(value):
+        return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+    return f"{encode({'alg': 'none', 'typ': 'JWT'})}.{encode(claims)}.c2lnbmF0dXJl"
+
+
+def create_api_key(gen3_commons_url: str):
+    return {
+        "api_key": encode_jwt({"iss": f"{gen3_commons_url}/user", "exp": int(time.time()) + 30 * 24 * 3600}),
+        "key_id": str(uuid4()),
+    }
+
+
+def create_fake_gen3_app(latency_seconds: float = 0.0):
+    # Fence's access token endpoint plus the indexd endpoints the client uses
+    app = FastAPI()
+    app.state.records = {}
+    app.state.request_counts = {}
+    records_lock = threading.Lock()
+
+    async def simulate_latency(name: str):
+        app.state.request_counts[name] = app.state.request_counts.get(name, 0) + 1
+        if latency_seconds:
+            await asyncio.sleep(latency_seconds)
+
+    @app.get("/health")
+    async def health():
+        return {"message": "I am healthy!!!"}
+
+    @app.post("/user/credentials/cdis/access_token")
+    async def access_token():
+        await simulate_latency("access_token")
+        return {"access_token": encode_jwt({"exp": int(time.time()) + 3600, "sub": "benchmark"})}
+
+    @app.post("/index/index/blank")
+    @app.post("/index/index/blank/")
+    async def create_blank_record(request: Request):
+        await simulate_latency("create_blank_record")
+        body = await request.json()
+        did = f"PREFIX/{uuid4()}"
+        rev = uuid4().hex[:8]
+        with records_lock:
+            app.state.records[did] = {"did": did, "rev": rev, "baseid": str(uuid4()), "file_name": body.get("file_name"), "uploader": body.get("uploader"), "hashes": {}, "size": None, "urls": [], "acl": [], "authz": []}
+        return {"did": did, "rev": rev, "baseid": app.state.records[did]["baseid"]}
+
+    @app.put("/index/index/blank/{did:path}")
+    async def update_blank_record(did: str, rev: str, request: Request):
+        await simulate_latency("update_blank_record")
+        body = await request.json()
+        with records_lock:
+            record = app.state.records.get(did)
+            if record is None or record["rev"] != rev:
+                return Response(status_code=404)
+            record.update({"hashes": body.get("hashes", {}), "size": body.get("size"), "rev": uuid4().hex[:8]})
+        return {"did": did, "rev": record["rev"], "baseid": record["baseid"]}
+
+    @app.post("/index/index")
+    @app.post("/index/index/")
+    async def create_record(request: Request):
+        await simulate_latency("create_record")
+        body = await request.json()
+        did = body.get("did") or f"PREFIX/{uuid4()}"
+        record = {**body, "did": did, "rev": uuid4().hex[:8], "baseid": str(uuid4())}
+        with records_lock:
+            app.state.records[did] = record
+        return {"did": did, "rev": record["rev"], "baseid": record["baseid"]}
+
+    @app.get("/index/index")
+    @app.get("/index/index/")
+    async def list_records(limit: int = 100, start: str = "", page: int = None):
+        await simulate_latency("list_records")
+        with records_lock:
+            dids = sorted(did for did in app.state.records if did > start)
+            if page is not None:
+                dids = dids[page * limit:]
+            dids = dids[:limit]
+            return {"records": [app.state.records[did] for did in dids]}
+
+    @app.get("/index/index/{did:path}")
+    async def get_record(did: str):
+        await simulate_latency("get_record")
+        record = app.state.records.get(did)
+        if record is None:
+            return Response(status_code=404)
+        return record
+
+    @app.delete("/index/index/{did:path}")
+    async def delete_record(did: str, rev: str):
+        await simulate_latency("delete_record")
+        with records_lock:
+            record = app.state.records.get(did)
+            if record is None or record["rev"] != rev:
+                return Response(status_code=404)
+            del app.state.records[did]
+        return Response(status_code=200)
+
+    return app
+
+
+def create_fake_s3_app(list_latency_seconds: float = 0.0):
+    # Enough of the S3 API for the MinIO SDK: path-style ListObjectsV2,
+    # PutObject, multipart uploads, HeadObject, (ranged) GetObject and
+    # multi-object DeleteObjects. 'list_latency_seconds' is added to every
+    # listing page, as a large bucket behind a real MinIO would.
+    app = FastAPI()
+    app.state.objects = {}
+    app.state.uploads = {}
+    objects_lock = threading.Lock()
+
+    def object_headers(obj):
+        return {
+            "ETag": f'"{obj["etag"]}"',
+            "Last-Modified": formatdate(obj["last_modified"], usegmt=True),
+            "Content-Type": "application/octet-stream",
+        }
+
+    def list_objects(bucket: str, request: Request):
+        prefix = request.query_params.get("prefix", "")
+        start_after = request.query_params.get("continuation-token") or request.query_params.get("start-after", "")
+        max_keys = int(request.query_params.get("max-keys", 1000))
+        delimiter = request.query_params.get("delimiter", "")
+        with objects_lock:
+            keys = sorted(key for (object_bucket, key) in app.state.objects if object_bucket == bucket and key.startswith(prefix) and key > start_after)
+        common_prefixes = []
+        if delimiter:
+            # Keys below a delimiter are rolled up into one common prefix
+            entries = []
+            for key in keys:
+                index = key.find(delimiter, len(prefix))
+                entry = key if index == -1 else key[:index + len(delimiter)]
+                if entry.endswith(delimiter) and start_after.startswith(entry):
+                    continue
+                if not entries or entries[-1] != entry:
+                    entries.append(entry)
+            is_truncated = len(entries) > max_keys
+            entries = entries[:max_keys]
+            keys = [entry for entry in entries if not entry.endswith(delimiter)]
+            common_prefixes = [entry for entry in entries if entry.endswith(delimiter)]
+            last_entry = entries[-1] if entries else ""
+        else:
+            is_truncated = len(keys) > max_keys
+            keys = keys[:max_keys]
+            last_entry = keys[-1] if keys else ""
+        contents = "".join(
+            f"<Contents><Key>{escape(key)}</Key>"
+            f"<LastModified>{datetime.fromtimestamp(app.state.objects[(bucket, key)]['last_modified'], timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')}</LastModified>"
+            f"<ETag>&quot;{app.state.objects[(bucket, key)]['etag']}&quot;</ETag>"
+            f"<Size>{len(app.state.objects[(bucket, key)]['data'])}</Size>"
+            f"<StorageClass>STANDARD</StorageClass></Contents>"
+            for key in keys
+        )
+        contents += "".join(f"<CommonPrefixes><Prefix>{escape(common_prefix)}</Prefix></CommonPrefixes>" for common_prefix in common_prefixes)
+        next_token = f"<NextContinuationToken>{escape(last_entry)}</NextContinuationToken>" if is_truncated else ""
+        body = (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+            f"<Name>{escape(bucket)}</Name><Prefix>{escape(prefix)}</Prefix><KeyCount>{len(keys) + len(common_prefixes)}</KeyCount>"
+            f"<MaxKeys>{max_keys}</MaxKeys><IsTruncated>{str(is_truncated).lower()}</IsTruncated>{next_token}{contents}"
+            "</ListBucketResult>"
+        )
+        return Response(content=body, media_type="application/xml")
+
+    @app.api_route("/{bucket}", methods=["GET", "POST"])
+    async def bucket_request(bucket: str, request: Request):
+        if request.method == "POST" and "delete" in request.query_params:
+            # Quiet mode: only the keys that could not be deleted are reported
+            keys = [element.text for element in ElementTree.fromstring(await request.body()).iter() if element.tag.endswith("Key")]
+            with objects_lock:
+                for key in keys:
+                    app.state.objects.pop((bucket, key), None)
+            body = '<?xml version="1.0" encoding="UTF-8"?><DeleteResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/"></DeleteResult>'
+            return Response(content=body, media_type="application/xml")
+        if list_latency_seconds:
+            await asyncio.sleep(list_latency_seconds)
+        return list_objects(bucket, request)
+
+    @app.api_route("/{bucket}/{key:path}", methods=["GET", "HEAD", "PUT", "POST", "DELETE"])
+    async def object_request(bucket: str, key: str, request: Request):
+        query_params = request.query_params
+        if not key:
+            return list_objects(bucket, request)
+
+        if request.method == "POST" and "uploads" in query_params:
+            upload_id = uuid4().hex
+            app.state.uploads[upload_id] = {}
+            body = (
+                '<?xml version="1.0" encoding="UTF-8"?><InitiateMultipartUploadResult>'
+                f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key><UploadId>{upload_id}</UploadId>"
+                "</InitiateMultipartUploadResult>"
+            )
+            return Response(content=body, media_type="application/xml")
+
+        if request.method == "PUT" and "uploadId" in query_params:
+            data = await request.body()
+            etag = hashlib.md5(data).hexdigest()
+            app.state.uploads[query_params["uploadId"]][int(query_params["partNumber"])] = (data, etag)
+            return Response(headers={"ETag": f'"{etag}"'})
+
+        if request.method == "POST" and "uploadId" in query_params:
+            parts = app.state.uploads.pop(query_params["uploadId"])
+            ordered_parts = [parts[part_number] for part_number in sorted(parts)]
+            combined_md5 = hashlib.md5(b"".join(bytes.fromhex(etag) for _, etag in ordered_parts)).hexdigest()
+            etag = f"{combined_md5}-{len(ordered_parts)}"
+            with objects_lock:
+                app.state.objects[(bucket, key)] = {"data": b"".join(data for data, _ in ordered_parts), "etag": etag, "last_modified": time.time()}
+            body = (
+                '<?xml version="1.0" encoding="UTF-8"?><CompleteMultipartUploadResult>'
+                f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key><ETag>&quot;{etag}&quot;</ETag>"
+                "</CompleteMultipartUploadResult>"
+            )
+            return Response(content=body, media_type="application/xml")
+
+        if request.method == "DELETE" and "uploadId" in query_params:
+            app.state.uploads.pop(query_params["uploadId"], None)
+            return Response(status_code=204)
+
+        if request.method == "PUT":
+            data = await request.body()
+            etag = hashlib.md5(data).hexdigest()
+            with objects_lock:
+                app.state.objects[(bucket, key)] = {"data": data, "etag": etag, "last_modified": time.time()}
+            return Response(headers={"ETag": f'"{etag}"'})
+
+        if request.method == "DELETE":
+            with objects_lock:
+                app.state.objects.pop((bucket, key), None)
+            return Response(status_code=204)
+
+        obj = app.state.objects.get((bucket, key))
+        if obj is None:
+            body = f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>NoSuchKey</Code><Key>{escape(key)}</Key></Error>'
+            return Response(content=body if request.method == "GET" else b"", status_code=404, media_type="application/xml")
+        if request.method == "HEAD":
+            return Response(headers={**object_headers(obj), "Content-Length": str(len(obj["data"]))})
+
+        data = obj["data"]
+        range_header = request.headers.get("Range")
+        if range_header:
+            start, end = range_header.replace("bytes=", "").split("-")
+            end = int(end) if end else len(data) - 1
+            return Response(content=data[int(start):end + 1], status_code=206, headers=object_headers(obj))
+        return Response(content=data, headers=object_headers(obj))
+
+    return app
+
+
+def get_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class LocalServer:
+    # Runs an ASGI app with uvicorn on a background thread:
+    #
+    # with LocalServer(create_fake_gen3_app()) as server:
+    #     requests.get(f"{server.url}/health")
+    def __init__(self, app, port: int = 0):
+        self.app = app
+        self.port = port or get_free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", access_log=False)
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.should_exit = True
+        self.thread.join()
@@ -0,0 +1,319 @@
+"""
+Offline benchmarks for the gen3minioclient
+
+Starts local stand-ins for Fence/indexd and a MinIO bucket (see
+'fake_services.py'), then times the upload, listing and manifest operations
+across file counts and sizes. Every run checks the number of objects,
+manifest rows and indexd records it produced, and fails on a mismatch rather
+than timing work that was silently skipped. Results are written as JSON so
+that runs can be compared against each other:
+
+    python benchmarks/run_benchmarks.py --fileCounts 10 100 --fileSizes 1024 1048576 --output results.json
+    python benchmarks/run_benchmarks.py --compare baseline.json --tolerance 0.2
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_services import LocalServer, create_api_key, create_fake_gen3_app, create_fake_s3_app  # noqa: E402
+
+BENCHMARKS = ["upload_file_and_update_record", "get_minio_objects", "update_minio_manifest_file", "create_indexd_manifest"]
+DEFAULT_FILE_COUNTS = [10, 100]
+DEFAULT_FILE_SIZES = [1024, 1024 * 1024]
+DEFAULT_REPEATS = 3
+DEFAULT_TOLERANCE = 0.2
+BUCKET_NAME = "benchmark-bucket"
+# MinIO's smallest part size, and the largest object sent with a single PUT
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PART_SIZE = 5 * 1024 * 1024 * 1024
+
+
+class BenchmarkCheckError(Exception):
+    pass
+
+
+def check_count(benchmark: str, what: str, expected: int, actual: int):
+    if actual != expected:
+        raise BenchmarkCheckError(f"{benchmark}: expected {expected} {what} but found {actual}")
+
+
+def percentile(values, fraction: float):
+    ordered_values = sorted(values)
+    index = min(len(ordered_values) - 1, max(0, round(fraction * (len(ordered_values) - 1))))
+    return ordered_values[index]
+
+
+def summarise_latencies(latencies):
+    return {
+        "count": len(latencies),
+        "mean": statistics.mean(latencies),
+        "min": min(latencies),
+        "p50": percentile(latencies, 0.5),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "max": max(latencies),
+    }
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@contextlib.contextmanager
+def quiet():
+    # The client reports progress with print(), which would otherwise
+    # dominate the timings of small files
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+class BenchmarkRunner:
+    def __init__(self, work_dir: str, gen3_server, s3_server):
+        from minio import Minio
+        from gen3minioclient.gen3minioclient import Gen3MinioClient
+
+        self.work_dir = work_dir
+        self.gen3_app = gen3_server.app
+        self.s3_app = s3_server.app
+        self.manifest_file_count = 0
+        # The files the bucket was last filled with by 'ensure_bucket_is_populated'
+        self.populated_file_paths = None
+        credentials_file = os.path.join(work_dir, "gen3-credentials.json")
+        with open(credentials_file, "w") as f:
+            json.dump(create_api_key(gen3_server.url), f)
+
+        with quiet():
+            self.gen3_minio_client = Gen3MinioClient()
+        self.gen3_minio_client.minio_bucket_name = BUCKET_NAME
+        self.gen3_minio_client.minio_api_endpoint = s3_server.url.replace("http://", "")
+        self.gen3_minio_client.gen3_commons_url = gen3_server.url
+        self.gen3_minio_client.gen3_credentials = credentials_file
+        self.gen3_minio_client.gen3_username = "benchmark@example.com"
+        self.gen3_minio_client.client = Minio(
+            endpoint=self.gen3_minio_client.minio_api_endpoint,
+            access_key="benchmark",
+            secret_key="benchmark",
+            secure=False,
+            region="us-east-1",
+        )
+
+    def reset(self):
+        self.gen3_app.state.records.clear()
+        self.s3_app.state.objects.clear()
+        self.s3_app.state.uploads.clear()
+        self.gen3_minio_client._object_name_index = None
+        self.gen3_minio_client._object_md5_index = None
+        self.populated_file_paths = None
+
+    def count_indexed_records(self):
+        return sum(1 for record in list(self.gen3_app.state.records.values()) if (record.get("hashes") or {}).get("md5"))
+
+    def count_manifest_rows(self, manifest_file: str):
+        if not os.path.exists(manifest_file):
+            return 0
+        with open(manifest_file) as f:
+            return sum(1 for _ in csv.DictReader(f, delimiter="\t"))
+
+    def create_files(self, file_count: int, file_size: int):
+        upload_dir = tempfile.mkdtemp(prefix=f"files-{file_count}x{file_size}-", dir=self.work_dir)
+        file_paths = []
+        for file_number in range(file_count):
+            file_path = os.path.join(upload_dir, f"file-{file_number:06d}.bin")
+            with open(file_path, "wb") as f:
+                f.write(os.urandom(file_size))
+            file_paths.append(file_path)
+        return file_paths
+
+    def new_manifest_file(self):
+        self.manifest_file_count += 1
+        return os.path.join(self.work_dir, f"manifest-{self.manifest_file_count}.tsv")
+
+    def time_call(self, function, *args, **kwargs):
+        return self.time_call_with_result(function, *args, **kwargs)[0]
+
+    def time_call_with_result(self, function, *args, **kwargs):
+        start = time.perf_counter()
+        with quiet():
+            result = function(*args, **kwargs)
+        return time.perf_counter() - start, result
+
+    def benchmark_upload_file_and_update_record(self, file_paths, repeats: int):
+        durations = []
+        latencies = []
+        for _ in range(repeats):
+            self.reset()
+            manifest_file = self.new_manifest_file()
+            start = time.perf_counter()
+            for file_path in file_paths:
+                latencies.append(self.time_call(self.gen3_minio_client.upload_file_and_update_record, file_path, manifest_file))
+            durations.append(time.perf_counter() - start)
+            check_count("upload_file_and_update_record", "objects", len(file_paths), len(self.s3_app.state.objects))
+            check_count("upload_file_and_update_record", "indexed records", len(file_paths), self.count_indexed_records())
+            check_count("upload_file_and_update_record", "manifest rows", len(file_paths), self.count_manifest_rows(manifest_file))
+        return durations, latencies
+
+    def benchmark_get_minio_objects(self, file_paths, repeats: int):
+        durations = []
+        for _ in range(repeats):
+            duration, minio_objects = self.time_call_with_result(self.gen3_minio_client.get_minio_objects)
+            check_count("get_minio_objects", "objects", len(file_paths), len(minio_objects))
+            durations.append(duration)
+        return durations, durations
+
+    def benchmark_update_minio_manifest_file(self, file_paths, repeats: int):
+        durations = []
+        for _ in range(repeats):
+            manifest_file = self.new_manifest_file()
+            durations.append(self.time_call(self.gen3_minio_client.update_minio_manifest_file, manifest_file))
+            check_count("update_minio_manifest_file", "manifest rows", len(file_paths), self.count_manifest_rows(manifest_file))
+        return durations, durations
+
+    def benchmark_create_indexd_manifest(self, file_paths, repeats: int):
+        durations = []
+        for _ in range(repeats):
+            self.gen3_app.state.records.clear()
+            durations.append(self.time_call(self.gen3_minio_client.create_indexd_manifest, self.new_manifest_file()))
+            check_count("create_indexd_manifest", "indexed records", len(file_paths), self.count_indexed_records())
+        return durations, durations
+
+    # The listing and manifest benchmarks need the bucket to hold exactly
+    # these files, so it is filled directly unless it already does. Each file
+    # is sent with a single PUT, so the ETag in a listing is the file's md5
+    # and the manifest built from the listing can be indexed; the objects
+    # left by the upload benchmark are multipart above 5 MiB and carry an
+    # '<md5>-<parts>' ETag instead.
+    def ensure_bucket_is_populated(self, file_paths):
+        if self.populated_file_paths == file_paths:
+            return
+        self.reset()
+        for file_path in file_paths:
+            file_size = os.path.getsize(file_path)
+            if file_size > MAX_PART_SIZE:
+                raise BenchmarkCheckError(f"Files over {MAX_PART_SIZE} bytes cannot be sent with a single PUT")
+            file_name = os.path.basename(file_path)
+            self.gen3_minio_client.client.fput_object(BUCKET_NAME, f"PREFIX/{file_name}/{file_name}", file_path, part_size=max(file_size, MIN_PART_SIZE))
+        self.populated_file_paths = file_paths
+
+    def run(self, benchmarks, file_counts, file_sizes, repeats: int):
+        results = []
+        for file_count in file_counts:
+            for file_size in file_sizes:
+                file_paths = self.create_files(file_count, file_size)
+                for benchmark in benchmarks:
+                    if benchmark == "upload_file_and_update_record":
+                        durations, latencies = self.benchmark_upload_file_and_update_record(file_paths, repeats)
+                    else:
+                        self.ensure_bucket_is_populated(file_paths)
+                        durations, latencies = getattr(self, f"benchmark_{benchmark}")(file_paths, repeats)
+                    median_duration = statistics.median(durations)
+                    result = {
+                        "benchmark": benchmark,
+                        "file_count": file_count,
+                        "file_size": file_size,
+                        "repeats": repeats,
+                        "seconds": {"min": min(durations), "median": median_duration, "max": max(durations)},
+                        "files_per_second": file_count / median_duration if median_duration else None,
+                        "bytes_per_second": file_count * file_size / median_duration if median_duration else None,
+                        "latency_seconds": summarise_latencies(latencies),
+                    }
+                    print(f"{benchmark:<32} {file_count:>7} files x {file_size:>10} bytes: {median_duration:.3f}s median, {result['files_per_second']:.1f} files/s")
+                    results.append(result)
+        return results
+
+
+def compare_results(results, baseline_results, tolerance: float):
+    # A benchmark regresses when its median time grows by more than
+    # 'tolerance' (a fraction) compared to the same benchmark in the baseline
+    baseline = {(result["benchmark"], result["file_count"], result["file_size"]): result for result in baseline_results}
+    regressions = []
+    for result in results:
+        key = (result["benchmark"], result["file_count"], result["file_size"])
+        if key not in baseline:
+            continue
+        baseline_median = baseline[key]["seconds"]["median"]
+        median = result["seconds"]["median"]
+        change = (median - baseline_median) / baseline_median if baseline_median else 0.0
+        if change > tolerance:
+            regressions.append({"benchmark": key[0], "file_count": key[1], "file_size": key[2], "baseline_seconds": baseline_median, "seconds": median, "change": change})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the gen3minioclient against local Fence/indexd and MinIO stand-ins.")
+    parser.add_argument("--benchmarks", nargs="+", choices=BENCHMARKS, default=BENCHMARKS, help="The benchmarks to run.")
+    parser.add_argument("--fileCounts", nargs="+", type=int, default=DEFAULT_FILE_COUNTS, help="Numbers of files to benchmark with.")
+    parser.add_argument("--fileSizes", nargs="+", type=int, default=DEFAULT_FILE_SIZES, help="File sizes in bytes to benchmark with.")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Number of times each benchmark is repeated.")
+    parser.add_argument("--indexdLatency", type=float, default=0.0, help="Seconds of latency added to every Fence/indexd request.")
+    parser.add_argument("--listLatency", type=float, default=0.0, help="Seconds of latency added to every page of a MinIO bucket listing.")
+    parser.add_argument("--output", default="benchmark_results.json", help="Path of the JSON results file.")
+    parser.add_argument("--compare", help="A previous JSON results file to check for regressions against.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown, as a fraction, before '--compare' reports a regression.")
+    args = parser.parse_args()
+
+    output_file = os.path.abspath(args.output)
+    baseline_file = os.path.abspath(args.compare) if args.compare else None
+
+    with tempfile.TemporaryDirectory(prefix="gen3minioclient-benchmarks-") as work_dir, \
+            LocalServer(create_fake_gen3_app(latency_seconds=args.indexdLatency)) as gen3_server, \
+            LocalServer(create_fake_s3_app(list_latency_seconds=args.listLatency)) as s3_server:
+        # The client reads its configuration from the environment, so it is
+        # pointed at the stand-ins before the client is created
+        os.environ.update({
+            "MINIO_ENDPOINT": s3_server.url.replace("http://", ""),
+            "MINIO_BUCKET_NAME": BUCKET_NAME,
+            "GEN3_COMMONS_URL": gen3_server.url,
+        })
+        os.chdir(work_dir)
+        runner = BenchmarkRunner(work_dir, gen3_server, s3_server)
+        # The Gen3 SDK logs every indexed record at INFO
+        logging.disable(logging.INFO)
+        try:
+            results = runner.run(args.benchmarks, args.fileCounts, args.fileSizes, args.repeats)
+        except BenchmarkCheckError as e:
+            print(f"CHECK FAILED {e}")
+            sys.exit(1)
+
+    report = {
+        "metadata": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": get_git_commit(),
+            "python_version": platform.python_version(),
+            "platform": platform.platform(),
+            "indexd_latency_seconds": args.indexdLatency,
+            "list_latency_seconds": args.listLatency,
+        },
+        "results": results,
+    }
+    with open(output_file, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote benchmark results to '{output_file}'.")
+
+    if baseline_file:
+        with open(baseline_file) as f:
+            regressions = compare_results(results, json.load(f)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression['benchmark']} ({regression['file_count']} files x {regression['file_size']} bytes): {regression['baseline_seconds']:.3f}s -> {regression['seconds']:.3f}s ({regression['change']:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} compared to '{baseline_file}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Startup time benchmarks for the gen3minioclient
+
+Times fresh interpreters importing the package and running the CLI, so that a
+new top-level import of a heavy dependency shows up as a regression:
+
+    python benchmarks/startup_benchmark.py --repeats 10 --output startup.json
+    python benchmarks/startup_benchmark.py --compare startup-baseline.json --tolerance 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run_benchmarks import get_git_commit, summarise_latencies  # noqa: E402
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMANDS = {
+    "python": [sys.executable, "-c", "pass"],
+    "import_package": [sys.executable, "-c", "import gen3minioclient"],
+    "import_client": [sys.executable, "-c", "import gen3minioclient.gen3minioclient"],
+    "cli_help": [sys.executable, "-m", "gen3minioclient.cli", "--help"],
+}
+DEFAULT_REPEATS = 5
+DEFAULT_TOLERANCE = 0.2
+
+
+def time_command(command):
+    start = time.perf_counter()
+    subprocess.run(command, cwd=REPOSITORY_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+def run(commands, repeats: int):
+    results = []
+    for name in commands:
+        # The first run warms the filesystem and bytecode caches
+        time_command(COMMANDS[name])
+        durations = [time_command(COMMANDS[name]) for _ in range(repeats)]
+        result = {"benchmark": name, "repeats": repeats, "seconds": summarise_latencies(durations)}
+        print(f"{name:<16} {statistics.median(durations) * 1000:8.1f}ms median")
+        results.append(result)
+    return results
+
+
+def compare_results(results, baseline_results, tolerance: float):
+    baseline = {result["benchmark"]: result for result in baseline_results}
+    regressions = []
+    for result in results:
+        if result["benchmark"] not in baseline:
+            continue
+        baseline_median = baseline[result["benchmark"]]["seconds"]["p50"]
+        median = result["seconds"]["p50"]
+        change = (median - baseline_median) / baseline_median if baseline_median else 0.0
+        if change > tolerance:
+            regressions.append({"benchmark": result["benchmark"], "baseline_seconds": baseline_median, "seconds": median, "change": change})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the import and CLI startup time of the gen3minioclient.")
+    parser.add_argument("--benchmarks", nargs="+", choices=list(COMMANDS), default=list(COMMANDS), help="The commands to time.")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Number of times each command is run.")
+    parser.add_argument("--output", default="startup_results.json", help="Path of the JSON results file.")
+    parser.add_argument("--compare", help="A previous JSON results file to check for regressions against.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown, as a fraction, before '--compare' reports a regression.")
+    args = parser.parse_args()
+
+    results = run(args.benchmarks, args.repeats)
+    report = {
+        "metadata": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": get_git_commit(),
+            "python_version": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote startup results to '{os.path.abspath(args.output)}'.")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_results(results, json.load(f)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression['benchmark']}: {regression['baseline_seconds'] * 1000:.1f}ms -> {regression['seconds'] * 1000:.1f}ms ({regression['change']:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} compared to '{args.compare}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,13 @@
-from gen3minioclient import create_minio_manifest_file
-from gen3minioclient import update_minio_manifest_file
-from gen3minioclient import upload_file_and_update_record
-from gen3minioclient import delete_record_by_guid
-from gen3minioclient import configure_gen3_minio_client
+# The clients are imported on first access, so that 'import gen3minioclient'
+# (and with it the CLI) does not pay for minio, httpx and the gen3 SDK up front
+def __getattr__(name):
+    if name == "Gen3MinioClient":
+        from gen3minioclient.gen3minioclient import Gen3MinioClient
+        return Gen3MinioClient
+    if name == "AsyncGen3MinioClient":
+        from gen3minioclient.async_client import AsyncGen3MinioClient
+        return AsyncGen3MinioClient
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ["Gen3MinioClient", "AsyncGen3MinioClient"]
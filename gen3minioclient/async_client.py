@@ -0,0 +1,333 @@
+"""
+asyncio counterpart of the Gen3MinioClient for the indexd/MinIO record pipeline
+"""
+import asyncio
+from pathlib import Path
+
+import httpx
+
+from gen3minioclient.concurrency import DEFAULT_MAX_CONNECTIONS, AdaptiveConcurrencyLimiter
+from gen3minioclient.metrics import get_default_registry
+from gen3minioclient.object_records import DEFAULT_OBJECT_ACL, DEFAULT_OBJECT_AUTHZ
+from gen3minioclient.retries import get_retry_delay, record_retry
+from gen3minioclient.stream_upload import DEFAULT_STREAM_PARTS_IN_FLIGHT, DEFAULT_STREAM_PART_SIZE, StreamingUploader
+from gen3minioclient.indexd import (
+    DEFAULT_BACKOFF_FACTOR,
+    DEFAULT_RETRIES,
+    DEFAULT_TIMEOUT,
+    RETRY_STATUS_CODES,
+    json_dumps,
+)
+
+
+class AsyncGen3MinioClient:
+    # Takes its configuration (commons URL, credentials, bucket and MinIO
+    # client) from a Gen3MinioClient, so both can be used side by side:
+    #
+    # async with AsyncGen3MinioClient(gen3_minio_client) as async_client:
+    #     responses = await asyncio.gather(*(async_client.create_blank_index(name) for name in file_names))
+    def __init__(self, gen3_minio_client, max_connections: int = DEFAULT_MAX_CONNECTIONS, retries: int = DEFAULT_RETRIES, backoff_factor: float = DEFAULT_BACKOFF_FACTOR, timeout=DEFAULT_TIMEOUT, executor=None):
+        self.gen3_minio_client = gen3_minio_client
+        self.max_connections = max_connections
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        connect_timeout, read_timeout = timeout
+        # A request waits for a free connection rather than failing, so any
+        # number of operations can be awaited at once
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout, pool=None)
+        self.http_client = None
+        self.token_lock = None
+        # Blocking work (token fetches, the MinIO SDK, hashing and the
+        # manifest store) runs on this executor, the event loop's default
+        # one when None. The caller owns it and shuts it down.
+        self.executor = executor
+
+    @property
+    def gen3_commons_url(self):
+        return self.gen3_minio_client.gen3_commons_url
+
+    @property
+    def minio_bucket_name(self):
+        return self.gen3_minio_client.minio_bucket_name
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def get_http_client(self):
+        # Created lazily so that it is bound to the running event loop
+        if self.http_client is None:
+            self.http_client = httpx.AsyncClient(
+                verify=False,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            )
+        return self.http_client
+
+    async def aclose(self):
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
+
+    # Retries on 429/5xx and transport errors, like the requests session in
+    # indexd.py. A POST (which creates a blank record) is not idempotent, so it
+    # is only retried when the connection could not be made.
+    async def request(self, method: str, url: str, **kwargs):
+        http_client = self.get_http_client()
+        idempotent = method.upper() != "POST"
+        for attempt in range(self.retries + 1):
+            try:
+                response = await http_client.request(method, url, **kwargs)
+                if response.status_code not in RETRY_STATUS_CODES or not idempotent or attempt == self.retries:
+                    return response
+                delay = get_retry_delay(attempt, self.backoff_factor, response.headers.get("Retry-After"))
+                reason = str(response.status_code)
+            except httpx.TransportError as e:
+                if attempt == self.retries or not (idempotent or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))):
+                    raise
+                delay = get_retry_delay(attempt, self.backoff_factor)
+                reason = type(e).__name__
+            record_retry(f"http_{method.lower()}", reason)
+            await asyncio.sleep(delay)
+
+    # The token comes from the Gen3MinioClient's 'Gen3AccessTokenProvider', so
+    # it is shared with the synchronous client. A refresh is a blocking
+    # request, so it runs on the executor, one at a time.
+    async def get_gen3_commons_access_token(self):
+        access_token_provider = self.gen3_minio_client.get_gen3_access_token_provider()
+        if access_token_provider.is_valid():
+            return access_token_provider.access_token
+        if self.token_lock is None:
+            self.token_lock = asyncio.Lock()
+        async with self.token_lock:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, access_token_provider.get_access_token)
+
+    async def get_headers(self):
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {await self.get_gen3_commons_access_token()}"
+        }
+
+    async def create_blank_index(self, file_name):
+        url = f"{self.gen3_commons_url}/index/index/blank"
+        data = json_dumps({"uploader": self.gen3_minio_client.gen3_username, "file_name": file_name})
+        return await self.request("POST", url, content=data, headers=await self.get_headers())
+
+    # Raises httpx.HTTPStatusError for an error response, like
+    # 'Gen3MinioClient.update_blank_index'
+    async def update_blank_index(self, did, rev, minio_object):
+        url = f"{self.gen3_commons_url}/index/index/blank/{did}"
+        data = json_dumps({
+            "hashes": {
+                "md5": minio_object["md5"]
+            },
+            "size": minio_object["file_size"]
+        })
+        response = await self.request("PUT", url, content=data, params={"rev": rev}, headers=await self.get_headers())
+        response.raise_for_status()
+        return response
+
+    async def get_record(self, guid):
+        return await self.request("GET", f"{self.gen3_commons_url}/index/index/{guid}")
+
+    async def delete_record_by_guid(self, guid, rev):
+        url = f"{self.gen3_commons_url}/index/index/{guid}"
+        return await self.request("DELETE", url, params={"rev": rev}, headers=await self.get_headers())
+
+    # Deletes many indexd records at once. indexd only deletes a record given
+    # its current rev, so each record is looked up first; its URLs are kept
+    # so that the objects can be removed afterwards. Returns
+    # {guid: {"guid", "rev", "urls", "status", "error"}} with a status of
+    # 'deleted', 'not_found' or 'failed'.
+    async def delete_records(self, guids, limiter=None):
+        limiter = limiter or AdaptiveConcurrencyLimiter(max_limit=self.max_connections)
+        results = {}
+
+        async def delete(guid):
+            result = {"guid": guid, "rev": None, "urls": [], "status": "failed", "error": None}
+            try:
+                async with limiter.slot() as slot:
+                    response = await self.get_record(guid)
+                    slot["healthy"] = response.status_code not in RETRY_STATUS_CODES
+                if response.status_code == 404:
+                    result["status"] = "not_found"
+                    return
+                response.raise_for_status()
+                record = response.json()
+                result["rev"] = record["rev"]
+                result["urls"] = record.get("urls") or []
+                async with limiter.slot() as slot:
+                    response = await self.delete_record_by_guid(guid, result["rev"])
+                    slot["healthy"] = response.status_code not in RETRY_STATUS_CODES
+                response.raise_for_status()
+                result["status"] = "deleted"
+            except Exception as e:
+                result["error"] = str(e)
+            finally:
+                results[guid] = result
+
+        await asyncio.gather(*(delete(guid) for guid in guids))
+        print(f"Deleted {sum(1 for result in results.values() if result['status'] == 'deleted')} of {len(results)} indexd records: {limiter.summary()}")
+        return results
+
+    # The MinIO SDK is synchronous, so object lookups run on the executor
+    # instead of blocking the event loop
+    async def check_if_object_key_is_in_minio_bucket(self, object_key: str):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.gen3_minio_client.check_if_object_key_is_in_minio_bucket, object_key)
+
+    async def check_if_object_is_in_minio_bucket(self, object_name: str, object_key=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: self.gen3_minio_client.check_if_object_is_in_minio_bucket(object_name, object_key=object_key))
+
+    # The upload pipeline of 'Gen3MinioClient.upload_file' for data that arrives
+    # as an async iterator of byte chunks, such as a request body, instead of
+    # a local file: existence check, blank record, streamed multipart upload
+    # with md5/size calculated on the fly, then the index update. The object
+    # is added to the manifest store when one is configured. Returns a result
+    # like 'upload_file' does.
+    async def upload_stream(self, file_name: str, chunks, part_size: int = DEFAULT_STREAM_PART_SIZE, parts_in_flight: int = DEFAULT_STREAM_PARTS_IN_FLIGHT):
+        gen3_minio_client = self.gen3_minio_client
+        metrics = get_default_registry()
+        upload_result = {
+            "file_name": file_name,
+            "status": "failed",
+            "stage": "existence check",
+            "did": None,
+            "rev": None,
+            "md5": None,
+            "file_size": None,
+            "error": None,
+            "minio_object": None,
+            "blank_record_released": False,
+        }
+        index_updated = False
+        try:
+            with metrics.time_phase("existence_check"):
+                file_exists = await self.check_if_object_is_in_minio_bucket(file_name)
+            if file_exists:
+                upload_result["status"] = "skipped"
+                upload_result["error"] = f"File '{file_name}' already exists in MinIO bucket."
+                metrics.increment("uploads_total", status="skipped")
+                return upload_result
+
+            upload_result["stage"] = "blank index"
+            with metrics.time_phase("blank_index"):
+                response = await self.create_blank_index(file_name)
+                response.raise_for_status()
+            did = str(response.json()["did"])
+            rev = str(response.json()["rev"])
+            upload_result["did"] = did
+            upload_result["rev"] = rev
+            path_in_minio_bucket = f"{did}/{file_name}"
+
+            upload_result["stage"] = "upload"
+            uploader = StreamingUploader(gen3_minio_client.get_multipart_uploader(), part_size=part_size, parts_in_flight=parts_in_flight, executor=self.executor)
+            with metrics.time_phase("minio_put") as phase:
+                file_digests = await uploader.upload(path_in_minio_bucket, chunks)
+                phase["bytes"] = file_digests["file_size"]
+            upload_result["md5"] = file_digests["md5"]
+            upload_result["file_size"] = file_digests["file_size"]
+            minio_object = {
+                "guid": did,
+                "file_name": file_name,
+                "md5": file_digests["md5"],
+                "file_size": file_digests["file_size"],
+                "acl": list(DEFAULT_OBJECT_ACL),
+                "authz": list(DEFAULT_OBJECT_AUTHZ),
+                "urls": [f"https://{gen3_minio_client.minio_api_endpoint}/{self.minio_bucket_name}/{path_in_minio_bucket}"],
+            }
+            upload_result["minio_object"] = minio_object
+            gen3_minio_client.add_object_to_name_index(file_name, file_digests["md5"])
+
+            upload_result["stage"] = "index update"
+            with metrics.time_phase("index_update"):
+                await self.update_blank_index(did, rev, minio_object)
+            index_updated = True
+
+            if gen3_minio_client.manifest_store_location:
+                upload_result["stage"] = "manifest update"
+                with metrics.time_phase("manifest_update"):
+                    await asyncio.get_running_loop().run_in_executor(self.executor, gen3_minio_client.get_manifest_store().upsert_rows, [minio_object])
+        except Exception as e:
+            print(f"Failed at stage '{upload_result['stage']}' for streamed file '{file_name}': {e}")
+            upload_result["error"] = str(e)
+            # A stream cannot be resumed, so a blank record that never got its
+            # hashes would be left orphaned in indexd
+            if upload_result["did"] and not index_updated:
+                upload_result["blank_record_released"] = await self.release_blank_record(upload_result["did"], upload_result["rev"], f"{upload_result['did']}/{file_name}")
+            metrics.increment("uploads_total", status="failed")
+            return upload_result
+
+        upload_result["status"] = "uploaded"
+        upload_result["stage"] = "done"
+        metrics.increment("uploads_total", status="uploaded")
+        return upload_result
+
+    # Deletes the blank record of a failed streamed upload, then whatever part
+    # of its object reached MinIO. The object is only removed once the record
+    # is gone, like in 'Gen3MinioClient.delete_records_and_objects'. Returns
+    # whether the record was deleted; when it was not, the caller still has
+    # its did in the upload result.
+    async def release_blank_record(self, did, rev, object_name):
+        try:
+            response = await self.delete_record_by_guid(did, rev)
+            response.raise_for_status()
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.gen3_minio_client.client.remove_object, self.minio_bucket_name, object_name)
+        except Exception as e:
+            print(f"Failed to delete blank record with did '{did}': {e}")
+            return False
+        print(f"Deleted blank record with did '{did}' of failed upload.")
+        return True
+
+    # Creates a blank record for every file, with as many requests in flight as
+    # indexd handles comfortably; the limiter grows concurrency while latency
+    # and error rate stay healthy and backs off on 429/5xx or slow responses.
+    # Returns {file_path: {"did": ..., "rev": ...}} for the records created,
+    # ready to be passed to the upload stage.
+    async def reserve_blank_records(self, file_paths, limiter=None):
+        limiter = limiter or AdaptiveConcurrencyLimiter(max_limit=self.max_connections)
+        reserved_records = {}
+        failures = {}
+
+        async def reserve(file_path):
+            try:
+                async with limiter.slot() as slot:
+                    response = await self.create_blank_index(Path(file_path).name)
+                    slot["healthy"] = response.status_code not in RETRY_STATUS_CODES
+                response.raise_for_status()
+                response_json = response.json()
+                reserved_records[file_path] = {"did": str(response_json["did"]), "rev": str(response_json["rev"])}
+            except Exception as e:
+                failures[file_path] = str(e)
+
+        await asyncio.gather(*(reserve(file_path) for file_path in file_paths))
+        print(f"Reserved {len(reserved_records)} blank records ({len(failures)} failed): {limiter.summary()}")
+        for file_path, error in failures.items():
+            print(f"Failed to reserve blank record for '{file_path}': {error}")
+        return reserved_records
+
+    # Fills in the hashes and size of many blank records at once.
+    # 'records' is a list of (did, rev, minio_object) tuples, and the result
+    # maps each did to the status code indexd returned (or the error).
+    async def update_blank_records(self, records, limiter=None):
+        limiter = limiter or AdaptiveConcurrencyLimiter(max_limit=self.max_connections)
+        results = {}
+
+        async def update(did, rev, minio_object):
+            try:
+                async with limiter.slot() as slot:
+                    try:
+                        response = await self.update_blank_index(did, rev, minio_object)
+                    except httpx.HTTPStatusError as e:
+                        response = e.response
+                    slot["healthy"] = response.status_code not in RETRY_STATUS_CODES
+                results[did] = response.status_code
+            except Exception as e:
+                results[did] = str(e)
+
+        await asyncio.gather(*(update(did, rev, minio_object) for did, rev, minio_object in records))
+        print(f"Updated {sum(1 for status in results.values() if status == 200)} of {len(results)} blank records: {limiter.summary()}")
+        return results
@@ -0,0 +1,94 @@
+"""
+Cached, thread-safe access to Gen3 credentials for the gen3minioclient
+"""
+import base64
+import json
+import threading
+import time
+
+from gen3minioclient.metrics import get_default_registry
+
+# Refresh the access token this many seconds before it actually expires
+DEFAULT_REFRESH_LEEWAY_SECONDS = 60
+
+
+def get_jwt_expiry(token: str):
+    # Reads the 'exp' claim of a JWT without verifying it; verification is
+    # left to Fence/indexd, we only need to know when to ask for a new token
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class Gen3AccessTokenProvider:
+    def __init__(self, gen3_commons_url: str, gen3_credentials: str, refresh_leeway_seconds: int = DEFAULT_REFRESH_LEEWAY_SECONDS, session=None, timeout=None, clock=time.time):
+        self.gen3_commons_url = gen3_commons_url
+        self.gen3_credentials = gen3_credentials
+        # Shares the indexd connection pool when a session is provided;
+        # otherwise requests is imported on the first token fetch
+        self.session = session
+        self.timeout = timeout
+        self.refresh_leeway_seconds = refresh_leeway_seconds
+        # Compared with the token's 'exp' claim; replaceable in tests
+        self.clock = clock
+        self.access_token = None
+        self.expires_at = 0
+        self.api_key = None
+        self.lock = threading.Lock()
+
+    def is_valid(self):
+        return self.access_token is not None and self.clock() < self.expires_at - self.refresh_leeway_seconds
+
+    def load_api_key(self):
+        if self.api_key is None:
+            with open(self.gen3_credentials) as f:
+                creds = json.load(f)
+            self.api_key = {
+                "api_key": creds["api_key"],
+                "key_id": creds["key_id"]
+            }
+        return self.api_key
+
+    def fetch_access_token(self):
+        session = self.session
+        if session is None:
+            import requests as session
+        url = f"{self.gen3_commons_url}/user/credentials/cdis/access_token"
+        with get_default_registry().time_phase("token_fetch"):
+            response = session.post(
+                url,
+                data=self.load_api_key(),
+                verify=False,
+                timeout=self.timeout,
+            )
+        response_json = json.loads(response.content)
+        return response_json["access_token"]
+
+    def get_access_token(self):
+        if self.is_valid():
+            return self.access_token
+
+        # Only one thread refreshes; the others wait on the lock and then
+        # pick up the token it fetched
+        with self.lock:
+            if not self.is_valid():
+                print("Fetching access token...")
+                access_token = self.fetch_access_token()
+                expires_at = get_jwt_expiry(access_token)
+                if expires_at is None:
+                    # Without an 'exp' claim we cannot tell how long the token
+                    # lives, so treat it as valid for a single call only
+                    expires_at = 0
+                self.access_token = access_token
+                self.expires_at = expires_at
+                return access_token
+            return self.access_token
+
+    def invalidate(self):
+        with self.lock:
+            self.access_token = None
+            self.expires_at = 0
@@ -0,0 +1,61 @@
+"""
+Bulk deletion of indexd records and MinIO objects for the gen3minioclient
+"""
+from concurrent.futures import ThreadPoolExecutor
+from csv import DictWriter
+
+from gen3minioclient.metrics import get_default_registry
+
+# The most keys S3 accepts in one multi-object delete request
+DEFAULT_DELETE_BATCH_SIZE = 1000
+DEFAULT_DELETE_LIST_WORKERS = 8
+
+DELETE_REPORT_FIELDS = ['guid', 'rev', 'record_status', 'object_names', 'object_status', 'error']
+
+
+# Removes the objects with multi-object delete requests of up to
+# 'batch_size' keys each. Returns {object name: error} for the objects MinIO
+# could not delete; deleting an object that does not exist is not an error.
+def remove_objects_in_batches(client, bucket_name: str, object_names, batch_size: int = DEFAULT_DELETE_BATCH_SIZE):
+    from minio.deleteobjects import DeleteObject
+
+    object_names = list(object_names)
+    errors = {}
+    for start in range(0, len(object_names), batch_size):
+        batch = object_names[start:start + batch_size]
+        with get_default_registry().time_phase("object_delete") as phase:
+            # 'remove_objects' is lazy, so nothing is deleted until its
+            # errors are iterated over
+            for error in client.remove_objects(bucket_name, [DeleteObject(object_name) for object_name in batch]):
+                errors[error.name] = f"{error.code}: {error.message}"
+            phase["items"] = len(batch)
+        print(f"Removed {start + len(batch)} of {len(object_names)} objects from the MinIO bucket...")
+    return errors
+
+
+# Object names under each prefix, listed concurrently. Uploads store objects
+# as '<did>/<file name>', so this finds the objects of records that were never
+# given URLs, such as the blank records of a failed submission.
+def list_objects_by_prefix(client, bucket_name: str, prefixes, max_workers: int = DEFAULT_DELETE_LIST_WORKERS):
+    def list_prefix(prefix):
+        return [obj.object_name for obj in client.list_objects(bucket_name, prefix=prefix, recursive=True)]
+
+    prefixes = list(prefixes)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(prefixes, executor.map(list_prefix, prefixes)))
+
+
+def summarise_delete_results(delete_results):
+    summary = {}
+    for result in delete_results:
+        for field in ("record_status", "object_status"):
+            key = f"{field.split('_')[0]}_{result[field]}"
+            summary[key] = summary.get(key, 0) + 1
+    return summary
+
+
+def write_delete_report(report_file: str, delete_results):
+    with open(report_file, "w") as f:
+        writer = DictWriter(f, fieldnames=DELETE_REPORT_FIELDS, delimiter="\t", extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(delete_results)
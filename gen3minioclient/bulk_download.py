@@ -0,0 +1,158 @@
+"""
+Parallel, verified bulk downloads from MinIO for the gen3minioclient
+"""
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from csv import DictWriter
+from pathlib import Path
+from urllib.parse import urlparse
+
+from gen3minioclient.hashing import DEFAULT_CHUNK_SIZE, calculate_file_digests, get_minio_part_size
+from gen3minioclient.retries import call_with_retries
+
+DEFAULT_DOWNLOAD_WORKERS = 4
+DEFAULT_RANGE_SIZE = 64 * 1024 * 1024
+DEFAULT_RANGE_WORKERS = 8
+DEFAULT_RANGE_RETRIES = 3
+DEFAULT_RANGE_RETRY_BACKOFF_SECONDS = 1.0
+
+DOWNLOAD_REPORT_FIELDS = ['guid', 'file_name', 'object_name', 'file_path', 'status', 'md5', 'file_size', 'error']
+
+
+# Manifest URLs look like 'https://<endpoint>/<bucket>/<object name>' (or
+# 's3://<bucket>/<object name>'), so the object name is everything after the bucket
+def get_object_name_from_url(url: str, bucket_name: str):
+    parsed_url = urlparse(url)
+    if parsed_url.scheme == "s3":
+        return parsed_url.path.lstrip("/") if parsed_url.netloc == bucket_name else None
+    path = parsed_url.path.lstrip("/")
+    bucket_prefix = f"{bucket_name}/"
+    if not path.startswith(bucket_prefix):
+        return None
+    return path[len(bucket_prefix):]
+
+
+# File names from a manifest or an indexd record are not trusted: only their
+# last path component is used, so that a name like '../../.bashrc' cannot
+# write outside the output directory. Returns None when nothing usable is left.
+def get_safe_file_name(file_name):
+    file_name = Path(file_name).name if file_name else ""
+    return file_name if file_name not in ("", ".", "..") else None
+
+
+def is_path_within_directory(file_path: str, directory: str):
+    directory = os.path.realpath(directory)
+    return os.path.commonpath([directory, os.path.realpath(file_path)]) == directory
+
+
+# Candidate part sizes an object with a multipart ETag ('<md5>-<part count>')
+# could have been uploaded with: the configured sizes first, then the MinIO
+# default, then the smallest whole MiB giving that many parts
+def get_candidate_part_size(file_size: int, part_count: int, part_sizes=()):
+    for part_size in (*part_sizes, 0):
+        candidate_part_size, candidate_part_count = get_minio_part_size(file_size, part_size)
+        if candidate_part_count == part_count:
+            return candidate_part_size
+    mebibyte = 1024 * 1024
+    return math.ceil(math.ceil(file_size / part_count) / mebibyte) * mebibyte
+
+
+# Checks a local file against the md5 and size from the manifest. Objects
+# listed straight from the bucket carry their ETag as 'md5', which for a
+# multipart upload is only reproducible with the part size it was uploaded with.
+def verify_file_digests(file_path: str, md5: str, file_size, part_sizes=()):
+    if file_size not in (None, "") and os.path.getsize(file_path) != int(file_size):
+        return False
+    if not md5:
+        return True
+    if "-" in md5:
+        part_count = int(md5.rsplit("-", 1)[1])
+        part_size = get_candidate_part_size(os.path.getsize(file_path), part_count, part_sizes)
+        return calculate_file_digests(file_path, part_size=part_size)["etag"] == md5
+    return calculate_file_digests(file_path)["md5"] == md5
+
+
+class RangedDownloader:
+    # Downloads large objects as parallel byte-range GETs written straight
+    # into their place in a pre-sized temporary file. Each range is streamed
+    # in 'chunk_size' pieces and retried on its own.
+    def __init__(self, client, bucket_name: str, range_size: int = DEFAULT_RANGE_SIZE, max_workers: int = DEFAULT_RANGE_WORKERS, range_retries: int = DEFAULT_RANGE_RETRIES, retry_backoff_seconds: float = DEFAULT_RANGE_RETRY_BACKOFF_SECONDS, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.client = client
+        self.bucket_name = bucket_name
+        self.range_size = range_size
+        self.max_workers = max_workers
+        self.range_retries = range_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.chunk_size = chunk_size
+
+    def download_range(self, object_name: str, file_path: str, offset: int, length: int):
+        def download():
+            response = self.client.get_object(self.bucket_name, object_name, offset=offset, length=length)
+            try:
+                bytes_written = 0
+                with open(file_path, "r+b") as f:
+                    f.seek(offset)
+                    for data in response.stream(self.chunk_size):
+                        f.write(data)
+                        bytes_written += len(data)
+            finally:
+                response.close()
+                response.release_conn()
+            if bytes_written != length:
+                raise ValueError(f"Expected {length} bytes at offset {offset} of '{object_name}' but received {bytes_written}")
+            return bytes_written
+
+        return call_with_retries(download, self.range_retries, self.retry_backoff_seconds, "ranged_get", f"bytes {offset}-{offset + length - 1} of '{object_name}'")
+
+    # The object only appears at 'file_path' once every range has been
+    # written, so an interrupted download never looks like a complete file
+    def download_object(self, object_name: str, file_path: str, file_size=None):
+        if file_size is None:
+            file_size = self.client.stat_object(self.bucket_name, object_name).size
+        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+        temporary_file_path = f"{file_path}.part"
+        with open(temporary_file_path, "wb") as f:
+            f.truncate(file_size)
+
+        try:
+            if file_size <= self.range_size:
+                if file_size > 0:
+                    self.download_range(object_name, temporary_file_path, 0, file_size)
+            else:
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    futures = [
+                        executor.submit(self.download_range, object_name, temporary_file_path, offset, min(self.range_size, file_size - offset))
+                        for offset in range(0, file_size, self.range_size)
+                    ]
+                    for future in as_completed(futures):
+                        future.result()
+            os.replace(temporary_file_path, file_path)
+        except Exception:
+            if os.path.exists(temporary_file_path):
+                os.remove(temporary_file_path)
+            raise
+        return file_size
+
+
+def download_objects_in_parallel(download_object, download_requests, max_workers: int = DEFAULT_DOWNLOAD_WORKERS):
+    download_results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(download_object, download_request) for download_request in download_requests]
+        for future in as_completed(futures):
+            download_results.append(future.result())
+    return download_results
+
+
+def summarise_download_results(download_results):
+    summary = {"downloaded": 0, "skipped": 0, "failed": 0}
+    for result in download_results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    return summary
+
+
+def write_download_report(report_file: str, download_results):
+    with open(report_file, "w") as f:
+        writer = DictWriter(f, fieldnames=DOWNLOAD_REPORT_FIELDS, delimiter="\t", extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(download_results)
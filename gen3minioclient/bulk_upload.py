@@ -0,0 +1,90 @@
+"""
+Parallel, bounded-memory bulk uploads for the gen3minioclient
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from csv import DictWriter
+
+DEFAULT_UPLOAD_WORKERS = 4
+DEFAULT_MAX_IN_FLIGHT_BYTES = 8 * 1024 * 1024 * 1024
+
+UPLOAD_REPORT_FIELDS = ['file_path', 'file_name', 'status', 'stage', 'did', 'rev', 'md5', 'file_size', 'error']
+
+
+class InFlightByteLimiter:
+    # Blocks workers until the files already being processed leave enough room
+    # for the next one. A file larger than the whole budget is still let through
+    # once nothing else is in flight, so that it cannot block forever.
+    def __init__(self, max_in_flight_bytes: int):
+        self.max_in_flight_bytes = max_in_flight_bytes
+        self.in_flight_bytes = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, number_of_bytes: int):
+        with self.condition:
+            while self.in_flight_bytes > 0 and self.in_flight_bytes + number_of_bytes > self.max_in_flight_bytes:
+                self.condition.wait()
+            self.in_flight_bytes += number_of_bytes
+
+    def release(self, number_of_bytes: int):
+        with self.condition:
+            self.in_flight_bytes -= number_of_bytes
+            self.condition.notify_all()
+
+
+def collect_file_paths_from_directory(upload_dir: str):
+    file_paths = []
+    for root, _, file_names in os.walk(upload_dir):
+        for file_name in sorted(file_names):
+            file_paths.append(os.path.join(root, file_name))
+    return file_paths
+
+
+def collect_file_paths_from_list(upload_list_file: str):
+    # One file path per line; blank lines and '#' comments are ignored
+    with open(upload_list_file, "r") as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+
+
+def upload_files_in_parallel(upload_file, file_paths, max_workers: int = DEFAULT_UPLOAD_WORKERS, max_in_flight_bytes: int = DEFAULT_MAX_IN_FLIGHT_BYTES):
+    limiter = InFlightByteLimiter(max_in_flight_bytes)
+
+    def upload_with_limit(file_path):
+        try:
+            file_size = os.path.getsize(file_path)
+        except OSError as e:
+            return {
+                "file_path": file_path,
+                "file_name": os.path.basename(file_path),
+                "status": "failed",
+                "stage": "hashing",
+                "error": str(e),
+                "minio_object": None,
+            }
+        limiter.acquire(file_size)
+        try:
+            return upload_file(file_path)
+        finally:
+            limiter.release(file_size)
+
+    upload_results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(upload_with_limit, file_path) for file_path in file_paths]
+        for future in as_completed(futures):
+            upload_results.append(future.result())
+    return upload_results
+
+
+def summarise_upload_results(upload_results):
+    summary = {"uploaded": 0, "skipped": 0, "failed": 0}
+    for result in upload_results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    return summary
+
+
+def write_upload_report(report_file: str, upload_results):
+    with open(report_file, "w") as f:
+        writer = DictWriter(f, fieldnames=UPLOAD_REPORT_FIELDS, delimiter="\t", extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(upload_results)
@@ -0,0 +1,153 @@
+"""
+Chunked, resumable indexing of large manifests for the gen3minioclient
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from csv import DictWriter
+
+from gen3minioclient.metrics import get_default_registry
+from gen3minioclient.sqlite_connections import ThreadLocalSQLiteDatabase
+
+DEFAULT_INDEXING_BATCH_SIZE = 1000
+DEFAULT_INDEXING_BATCH_WORKERS = 2
+# Threads 'index_object_manifest' uses within each batch
+DEFAULT_INDEXING_THREADS = 8
+
+INDEXING_REPORT_FIELDS = ['batch', 'rows', 'indexed', 'failed', 'seconds', 'rows_per_second']
+
+INDEXING_CHECKPOINT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS indexed_rows (
+    row_key TEXT PRIMARY KEY,
+    guid TEXT,
+    md5 TEXT,
+    indexed_at REAL
+);
+"""
+
+# The most parameters SQLite accepts in one statement on older versions
+CHECKPOINT_LOOKUP_BATCH_SIZE = 500
+
+
+# A row is identified by its guid (or its URLs, when it has none) and its md5,
+# so a row whose object has changed since it was indexed is indexed again
+def get_row_key(row):
+    return f"{row.get('guid') or row.get('urls')}\t{row.get('md5')}"
+
+
+class IndexingCheckpoint(ThreadLocalSQLiteDatabase):
+    # The manifest rows that indexd is known to have, so that a restarted
+    # indexing run skips them
+    def __init__(self, checkpoint_file: str):
+        self.checkpoint_file = checkpoint_file
+        super().__init__(checkpoint_file, INDEXING_CHECKPOINT_SCHEMA, synchronous="NORMAL")
+
+    # The rows that have not been indexed yet, in their original order
+    def filter_unindexed(self, rows):
+        row_keys = [get_row_key(row) for row in rows]
+        indexed_keys = set()
+        for start in range(0, len(row_keys), CHECKPOINT_LOOKUP_BATCH_SIZE):
+            batch = row_keys[start:start + CHECKPOINT_LOOKUP_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            indexed_keys.update(
+                row_key for (row_key,) in self.get_connection().execute(f"SELECT row_key FROM indexed_rows WHERE row_key IN ({placeholders})", batch)
+            )
+        return [row for row, row_key in zip(rows, row_keys) if row_key not in indexed_keys]
+
+    def mark_indexed(self, rows):
+        connection = self.get_connection()
+        indexed_at = time.time()
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO indexed_rows (row_key, guid, md5, indexed_at) VALUES (?, ?, ?, ?)",
+                [(get_row_key(row), row.get("guid"), row.get("md5"), indexed_at) for row in rows],
+            )
+
+    def count(self):
+        return self.get_connection().execute("SELECT COUNT(*) FROM indexed_rows").fetchone()[0]
+
+
+def iter_batches(rows, batch_size: int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Indexes the manifest 'rows' in batches of 'batch_size', with up to
+# 'batch_workers' batches in flight. 'index_batch(batch_number, rows)' indexes
+# one batch and returns the rows indexd is known to have afterwards; only
+# those are recorded in 'checkpoint', and rows already recorded there are
+# skipped, so an interrupted run can simply be started again. Only a few
+# batches are read ahead of the ones being indexed, so the manifest is never
+# held in memory.
+#
+# The rows, rows indexed, failures and throughput of every batch are printed
+# and written to 'report_file' (see 'INDEXING_REPORT_FIELDS') as each batch
+# finishes. Returns the totals.
+def index_in_batches(rows, index_batch, checkpoint: IndexingCheckpoint, batch_size: int = DEFAULT_INDEXING_BATCH_SIZE, batch_workers: int = DEFAULT_INDEXING_BATCH_WORKERS, report_file=None):
+    summary = {"batches": 0, "rows": 0, "skipped": 0, "indexed": 0, "failed": 0}
+
+    def run_batch(batch_number, batch):
+        start = time.perf_counter()
+        try:
+            with get_default_registry().time_phase("index_batch") as phase:
+                indexed_rows = index_batch(batch_number, batch)
+                phase["items"] = len(indexed_rows)
+        except Exception as error:
+            # The batch is left out of the checkpoint and retried on the
+            # next run, like any rows that failed within it
+            print(f"Could not index batch {batch_number}: {error}")
+            indexed_rows = []
+        return batch_number, batch, indexed_rows, time.perf_counter() - start
+
+    def record_batch(future, writer):
+        batch_number, batch, indexed_rows, seconds = future.result()
+        checkpoint.mark_indexed(indexed_rows)
+        report_row = {
+            "batch": batch_number,
+            "rows": len(batch),
+            "indexed": len(indexed_rows),
+            "failed": len(batch) - len(indexed_rows),
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(len(indexed_rows) / seconds, 1) if seconds else None,
+        }
+        summary["batches"] += 1
+        summary["indexed"] += report_row["indexed"]
+        summary["failed"] += report_row["failed"]
+        print(f"Indexed batch {batch_number}: {report_row['indexed']} of {report_row['rows']} rows in {report_row['seconds']}s ({report_row['rows_per_second']} rows/s).")
+        if writer:
+            writer.writerow(report_row)
+
+    report = open(report_file, "w") if report_file else None
+    try:
+        writer = None
+        if report:
+            writer = DictWriter(report, fieldnames=INDEXING_REPORT_FIELDS, delimiter="\t")
+            writer.writeheader()
+        with ThreadPoolExecutor(max_workers=batch_workers) as executor:
+            pending = set()
+            batch_number = 0
+            for batch in iter_batches(rows, batch_size):
+                summary["rows"] += len(batch)
+                unindexed_rows = checkpoint.filter_unindexed(batch)
+                summary["skipped"] += len(batch) - len(unindexed_rows)
+                if not unindexed_rows:
+                    continue
+                batch_number += 1
+                pending.add(executor.submit(run_batch, batch_number, unindexed_rows))
+                while len(pending) > batch_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record_batch(future, writer)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record_batch(future, writer)
+    finally:
+        if report:
+            report.close()
+    return summary
@@ -2,61 +2,513 @@
 The command-line interface for the gen3minioclient
 """
 import argparse
-from gen3minioclient import create_minio_manifest_file
-from gen3minioclient import update_minio_manifest_file
-from gen3minioclient import upload_file_and_update_record
-from gen3minioclient import delete_record_by_guid
-from gen3minioclient import configure_gen3_minio_client
+import json
+from gen3minioclient.concurrency import DEFAULT_MAX_CONNECTIONS
+from gen3minioclient.bulk_upload import DEFAULT_MAX_IN_FLIGHT_BYTES, DEFAULT_UPLOAD_WORKERS
+from gen3minioclient.indexd_records import DEFAULT_RECORD_PAGE_SIZE, DEFAULT_RECORD_READ_AHEAD
+from gen3minioclient.metrics import get_default_registry
 
 def main():
     parser = argparse.ArgumentParser(
         description="An application for interacting with a Gen3 instance and an on-prem MinIO bucket."
     )
-    
+
     parser.add_argument(
         "--createManifestFile",
         help=(
             "The './output_manifest_file.tsv' will be saved to the current working directory."
         )
     )
-    
+
     parser.add_argument(
         "--updateManifestFile",
         help=(
             "The './output_manifest_file.tsv' will be updated, or recreated if it does not exist."
         )
     )
-    
+
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "Only add objects that are new or changed since the last '--updateManifestFile' run, using a persisted listing checkpoint."
+        )
+    )
+
+    parser.add_argument(
+        "--checkpointFile",
+        help=(
+            "The listing checkpoint used by '--incremental'. Defaults to '<manifest>.checkpoint.db'."
+        )
+    )
+
+    parser.add_argument(
+        "--manifestStore",
+        help=(
+            "Path to a SQLite manifest store. '--createManifestFile'/'--updateManifestFile' still write TSV manifests; use '--importManifest'/'--exportManifest' to move entries between the two."
+        )
+    )
+
+    parser.add_argument(
+        "--importManifest",
+        help=(
+            "Import the entries of this TSV manifest into the '--manifestStore'."
+        )
+    )
+
+    parser.add_argument(
+        "--exportManifest",
+        help=(
+            "Export the entries of the '--manifestStore' to this TSV manifest."
+        )
+    )
+
     parser.add_argument(
         "--filePath",
+        help=(
+            "Specify the file path for the file to be uploaded to a MinIO bucket."
+        )
+    )
+
+    parser.add_argument(
         "--manifestFile",
+        default="./output_manifest_file.tsv",
+        help=(
+            "The manifest file that will be updated, or recreated if it does not exist, after an upload."
+        )
+    )
+
+    parser.add_argument(
+        "--uploadDir",
+        help=(
+            "Upload every file inside this directory (recursively) to the MinIO bucket in parallel."
+        )
+    )
+
+    parser.add_argument(
+        "--uploadList",
+        help=(
+            "Upload every file listed in this text file (one file path per line) to the MinIO bucket in parallel."
+        )
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_UPLOAD_WORKERS,
+        help=(
+            "Number of files to upload or download concurrently when using '--uploadDir', '--uploadList', '--downloadManifest' or '--downloadGuids'."
+        )
+    )
+
+    parser.add_argument(
+        "--maxInFlightBytes",
+        type=int,
+        default=DEFAULT_MAX_IN_FLIGHT_BYTES,
+        help=(
+            "Maximum total size in bytes of the files being uploaded at the same time."
+        )
+    )
+
+    parser.add_argument(
+        "--reportFile",
+        help=(
+            "Write a per-file success/failure report (TSV) of a bulk upload, download or delete to this path."
+        )
+    )
+
+    parser.add_argument(
+        "--multipart",
+        action="store_true",
+        help=(
+            "Upload files as multipart uploads with parts sent concurrently."
+        )
+    )
+
+    parser.add_argument(
+        "--partSize",
+        type=int,
+        help=(
+            "Part size in bytes for '--multipart' uploads (minimum 5 MiB)."
+        )
+    )
+
+    parser.add_argument(
+        "--partWorkers",
+        type=int,
+        help=(
+            "Number of parts of a single file to upload concurrently with '--multipart'."
+        )
+    )
+
+    parser.add_argument(
+        "--journalFile",
+        help=(
+            "Record the progress of every upload in this journal so that an interrupted upload can be resumed."
+        )
+    )
+
+    parser.add_argument(
+        "--resume",
+        help=(
+            "Continue every unfinished upload in this journal from its last completed stage."
+        )
+    )
+
+    parser.add_argument(
+        "--downloadManifest",
+        help=(
+            "Download every object in this TSV manifest (or only the '--downloadGuids') in parallel, verifying each against its md5 and size."
+        )
+    )
+
+    parser.add_argument(
+        "--downloadGuids",
+        nargs="+",
+        help=(
+            "GUIDs of the objects to download, looked up in '--downloadManifest', the '--manifestStore' or indexd."
+        )
+    )
+
+    parser.add_argument(
+        "--outputDir",
+        default=".",
+        help=(
+            "Directory that downloaded files are written to."
+        )
+    )
+
+    parser.add_argument(
+        "--reserveBlankRecords",
+        action="store_true",
+        help=(
+            "Create the blank records of a '--uploadDir'/'--uploadList' upload up front, concurrently, before any file is uploaded."
+        )
+    )
+
+    parser.add_argument(
+        "--maxConnections",
+        type=int,
+        default=DEFAULT_MAX_CONNECTIONS,
+        help=(
+            "Upper bound on concurrent indexd requests with '--reserveBlankRecords', '--deleteGuids' or '--deleteManifest'."
+        )
+    )
+
+    parser.add_argument(
+        "--listBucket",
+        action="store_true",
+        help=(
+            "List the whole MinIO bucket, rather than only reading the manifest, when checking whether a file has already been uploaded."
+        )
+    )
+
+    parser.add_argument(
+        "--listingWorkers",
+        type=int,
+        help=(
+            "Number of threads that list key-range shards of the MinIO bucket in parallel (1 lists it on a single thread)."
+        )
+    )
+
+    parser.add_argument(
+        "--hashCache",
+        help=(
+            "SQLite file caching the digests of local files by path, size and modification time, so that unchanged files are not hashed again on later runs."
+        )
+    )
+
+    parser.add_argument(
+        "--allowDuplicateContent",
+        action="store_true",
+        help=(
+            "Upload files whose md5 is already in the manifest (or the bucket, with '--listBucket') under another name, instead of skipping them."
+        )
+    )
+
+    parser.add_argument(
+        "--indexManifest",
+        help=(
+            "Sync the given manifest with the MinIO bucket and index it in indexd."
+        )
+    )
+
+    parser.add_argument(
+        "--chunked",
+        action="store_true",
+        help=(
+            "With '--indexManifest', index the manifest in batches and record the indexed rows in a checkpoint, so that an interrupted run can be resumed."
+        )
+    )
+
+    parser.add_argument(
+        "--indexCheckpoint",
+        help=(
+            "Checkpoint of the rows indexed by '--indexManifest' (implies '--chunked'; default '<manifest>.indexing.sqlite')."
+        )
+    )
+
+    parser.add_argument(
+        "--indexBatchSize",
+        type=int,
+        help=(
+            "Number of manifest rows per batch with '--chunked'."
+        )
+    )
+
+    parser.add_argument(
+        "--indexBatchWorkers",
+        type=int,
         help=(
-            "Specify the file path for the file to be uploaded to a MinIO bucket. The './output_manifest_file.tsv' will be updated, or recreated if it does not exist."
+            "Number of batches indexed concurrently with '--chunked'."
         )
     )
-    
+
+    parser.add_argument(
+        "--indexThreads",
+        type=int,
+        help=(
+            "Number of threads used to index the rows of the manifest (or of each batch)."
+        )
+    )
+
+    parser.add_argument(
+        "--skipManifestSync",
+        action="store_true",
+        help=(
+            "With '--indexManifest', index the manifest as it is instead of first adding new objects from the MinIO bucket to it."
+        )
+    )
+
+    parser.add_argument(
+        "--exportRecords",
+        help=(
+            "Stream the indexd records (optionally filtered by '--uploader', '--authz' and '--urlPrefix') to this TSV manifest."
+        )
+    )
+
+    parser.add_argument(
+        "--uploader",
+        help=(
+            "Only export indexd records created by this uploader."
+        )
+    )
+
+    parser.add_argument(
+        "--authz",
+        nargs="+",
+        help=(
+            "Only export indexd records that have all of these authz resources."
+        )
+    )
+
+    parser.add_argument(
+        "--urlPrefix",
+        help=(
+            "Only export indexd records with a URL starting with this prefix."
+        )
+    )
+
+    parser.add_argument(
+        "--pageSize",
+        type=int,
+        default=DEFAULT_RECORD_PAGE_SIZE,
+        help=(
+            "Number of indexd records fetched per request with '--exportRecords' (at most 1024)."
+        )
+    )
+
+    parser.add_argument(
+        "--readAhead",
+        type=int,
+        default=DEFAULT_RECORD_READ_AHEAD,
+        help=(
+            "Number of pages of indexd records fetched in parallel with '--exportRecords'. 1 pages sequentially."
+        )
+    )
+
+    parser.add_argument(
+        "--reconcile",
+        help=(
+            "Compare the MinIO bucket, indexd and the '--manifestFile' (or '--manifestStore') and write every disagreement to this TSV report."
+        )
+    )
+
+    parser.add_argument(
+        "--repairManifest",
+        help=(
+            "With '--reconcile', also write the bucket objects that have no indexd record to this manifest so that they can be indexed."
+        )
+    )
+
+    parser.add_argument(
+        "--deleteGuids",
+        nargs="+",
+        help=(
+            "Delete the indexd records of these GUIDs concurrently, then remove their objects from the MinIO bucket."
+        )
+    )
+
+    parser.add_argument(
+        "--deleteManifest",
+        help=(
+            "Delete the indexd records and MinIO objects of every GUID in this TSV manifest."
+        )
+    )
+
+    parser.add_argument(
+        "--keepObjects",
+        action="store_true",
+        help=(
+            "With '--deleteGuids' or '--deleteManifest', only delete the indexd records."
+        )
+    )
+
     parser.add_argument(
         "--guid",
-        "--rev",
         help=(
             "DELETE a record from the Sheepdog database by providing the GUID and revision number."
         )
     )
-    
+
+    parser.add_argument(
+        "--rev",
+        help=(
+            "The revision number of the record to be deleted with '--guid'."
+        )
+    )
+
+    parser.add_argument(
+        "--metricsFile",
+        help=(
+            "Also write the per-phase timing summary printed at the end of the run to this JSON file."
+        )
+    )
+
     parser.add_argument(
         "--pathToGen3MinioCreds",
         help=(
             "Provide path to 'gen3-minio-credentials.json' so that the CLI tool can communicate with Gen3 and MinIO."
         )
     )
-    
+
     args = parser.parse_args()
-    
-    create_minio_manifest_file(output_manifest_file=args.createManifestFile)
-    update_minio_manifest_file(old_manifest_file=args.updateManifestFile)
-    upload_file_and_update_record(file_path=args.filePath, old_manifest_file=args.manifestFile)
-    delete_record_by_guid(guid=args.guid, rev=args.rev)
-    configure_gen3_minio_client(gen3_minio_json_file=args)
+
+    # Imported only once the arguments are known to be valid, so that
+    # '--help' and argument errors return without loading the client
+    from gen3minioclient.gen3minioclient import Gen3MinioClient, configure_logging
+    configure_logging()
+    gen3_minio_client = Gen3MinioClient()
+    if args.pathToGen3MinioCreds:
+        print(gen3_minio_client.configure_gen3_minio_client(gen3_minio_json_file=args.pathToGen3MinioCreds))
+    if args.listBucket:
+        gen3_minio_client.list_bucket_for_existence_check = True
+    if args.listingWorkers:
+        gen3_minio_client.listing_workers = args.listingWorkers
+    if args.hashCache:
+        gen3_minio_client.hash_cache_location = args.hashCache
+    if args.allowDuplicateContent:
+        gen3_minio_client.skip_duplicate_content = False
+    if args.multipart:
+        gen3_minio_client.multipart_upload = True
+    if args.partSize:
+        gen3_minio_client.multipart_part_size = args.partSize
+    if args.partWorkers:
+        gen3_minio_client.multipart_workers = args.partWorkers
+
+    if args.manifestStore:
+        gen3_minio_client.manifest_store_location = args.manifestStore
+
+    if args.importManifest:
+        gen3_minio_client.import_minio_manifest_file_to_store(args.importManifest)
+    if args.createManifestFile:
+        gen3_minio_client.create_minio_manifest_file(output_manifest_file=args.createManifestFile)
+    if args.updateManifestFile:
+        gen3_minio_client.update_minio_manifest_file(
+            old_manifest_file=args.updateManifestFile,
+            incremental=args.incremental,
+            checkpoint_file=args.checkpointFile,
+        )
+    if args.exportManifest:
+        gen3_minio_client.export_minio_manifest_store_to_file(args.exportManifest)
+    if args.filePath:
+        print(gen3_minio_client.upload_file_and_update_record(file_path=args.filePath, old_manifest_file=args.manifestFile, journal_file=args.journalFile))
+
+    bulk_upload_options = {
+        "max_workers": args.workers,
+        "max_in_flight_bytes": args.maxInFlightBytes,
+        "report_file": args.reportFile,
+    }
+    if args.resume:
+        gen3_minio_client.resume_uploads(args.resume, args.manifestFile, **bulk_upload_options)
+    bulk_upload_options["journal_file"] = args.journalFile
+    if args.reserveBlankRecords:
+        bulk_upload_options["reserve_blank_records"] = True
+        bulk_upload_options["max_connections"] = args.maxConnections
+    if args.uploadDir:
+        gen3_minio_client.upload_directory_and_update_records(args.uploadDir, args.manifestFile, **bulk_upload_options)
+    if args.uploadList:
+        gen3_minio_client.upload_file_list_and_update_records(args.uploadList, args.manifestFile, **bulk_upload_options)
+
+    if args.downloadManifest or args.downloadGuids:
+        gen3_minio_client.download_files(
+            manifest_file=args.downloadManifest,
+            guids=args.downloadGuids,
+            output_dir=args.outputDir,
+            max_workers=args.workers,
+            report_file=args.reportFile,
+        )
+
+    if args.indexBatchSize:
+        gen3_minio_client.indexing_batch_size = args.indexBatchSize
+    if args.indexBatchWorkers:
+        gen3_minio_client.indexing_batch_workers = args.indexBatchWorkers
+    if args.indexThreads:
+        gen3_minio_client.indexing_threads = args.indexThreads
+    if args.indexManifest:
+        gen3_minio_client.create_indexd_manifest(
+            args.indexManifest,
+            chunked=args.chunked,
+            checkpoint_file=args.indexCheckpoint,
+            report_file=args.reportFile,
+            sync_manifest=not args.skipManifestSync,
+        )
+
+    if args.exportRecords:
+        gen3_minio_client.export_indexd_records(
+            args.exportRecords,
+            page_size=args.pageSize,
+            read_ahead=args.readAhead,
+            uploader=args.uploader,
+            authz=args.authz,
+            url_prefix=args.urlPrefix,
+        )
+
+    if args.reconcile:
+        gen3_minio_client.reconcile_bucket_index_and_manifest(
+            args.reconcile,
+            manifest_file=None if args.manifestStore else args.manifestFile,
+            repair_manifest_file=args.repairManifest,
+        )
+
+    if args.deleteGuids or args.deleteManifest:
+        gen3_minio_client.delete_records_and_objects(
+            guids=args.deleteGuids,
+            manifest_file=args.deleteManifest,
+            delete_objects=not args.keepObjects,
+            max_connections=args.maxConnections,
+            report_file=args.reportFile,
+        )
+
+    if args.guid:
+        gen3_minio_client.delete_record_by_guid(guid=args.guid, rev=args.rev)
+
+    metrics_summary = get_default_registry().summary()
+    if metrics_summary["phases"] or metrics_summary["counters"]:
+        print(json.dumps(metrics_summary, indent=2))
+        if args.metricsFile:
+            with open(args.metricsFile, "w") as f:
+                json.dump(metrics_summary, f, indent=2)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
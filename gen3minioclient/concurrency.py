@@ -0,0 +1,91 @@
+"""
+Adaptive concurrency control for bursts of indexd requests in the gen3minioclient
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+DEFAULT_INITIAL_CONCURRENCY = 8
+DEFAULT_MIN_CONCURRENCY = 1
+DEFAULT_MAX_CONCURRENCY = 256
+# A request counts as slow once it takes this many times the best latency seen
+DEFAULT_LATENCY_TOLERANCE = 3.0
+DEFAULT_DECREASE_FACTOR = 0.5
+# Upper bound on concurrent indexd requests (and pooled connections) when
+# fanning out from the async client
+DEFAULT_MAX_CONNECTIONS = 100
+
+
+class AdaptiveConcurrencyLimiter:
+    # Additive-increase/multiplicative-decrease: every healthy request lets the
+    # limit grow by roughly one per round of requests, while an error or a slow
+    # request halves it. Decreases happen at most once per round trip so that
+    # a burst of failures from the same round only backs off once.
+    def __init__(self, initial_limit: int = DEFAULT_INITIAL_CONCURRENCY, min_limit: int = DEFAULT_MIN_CONCURRENCY, max_limit: int = DEFAULT_MAX_CONCURRENCY, latency_tolerance: float = DEFAULT_LATENCY_TOLERANCE, decrease_factor: float = DEFAULT_DECREASE_FACTOR):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self.min_latency = None
+        self.last_decrease = 0.0
+        self.successes = 0
+        self.errors = 0
+        self.condition = None
+
+    def get_condition(self):
+        # Created lazily so that it is bound to the running event loop
+        if self.condition is None:
+            self.condition = asyncio.Condition()
+        return self.condition
+
+    async def acquire(self):
+        condition = self.get_condition()
+        async with condition:
+            while self.in_flight >= int(self.limit):
+                await condition.wait()
+            self.in_flight += 1
+
+    async def release(self, latency: float, healthy: bool):
+        condition = self.get_condition()
+        async with condition:
+            self.in_flight -= 1
+            if healthy:
+                self.successes += 1
+                self.min_latency = latency if self.min_latency is None else min(self.min_latency, latency)
+            else:
+                self.errors += 1
+            is_slow = self.min_latency is not None and latency > self.min_latency * self.latency_tolerance
+            now = time.monotonic()
+            if not healthy or is_slow:
+                if now - self.last_decrease > (self.min_latency or latency):
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self.last_decrease = now
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            condition.notify_all()
+
+    # async with limiter.slot() as slot:
+    #     response = await send_request()
+    #     slot["healthy"] = response.status_code < 400
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        slot = {"healthy": True}
+        start = time.monotonic()
+        try:
+            yield slot
+        except Exception:
+            slot["healthy"] = False
+            raise
+        finally:
+            await self.release(time.monotonic() - start, slot["healthy"])
+
+    def summary(self):
+        return {
+            "limit": int(self.limit),
+            "successes": self.successes,
+            "errors": self.errors,
+            "min_latency_seconds": self.min_latency,
+        }
@@ -1,28 +1,132 @@
-from fastapi import FastAPI
-import requests
-import json
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from pathlib import Path
+from typing import List
+from pydantic import BaseModel
+import asyncio
+import os
+import threading
 
-app = FastAPI()
+from gen3minioclient.metrics import get_default_registry
+from gen3minioclient.presigned_urls import DEFAULT_PRESIGNED_URL_EXPIRY, MAX_PRESIGNED_URL_BATCH_SIZE, PRESIGNED_URL_METHODS
+from gen3minioclient.stream_upload import DEFAULT_MAX_CONCURRENT_STREAM_UPLOADS, DEFAULT_STREAM_PARTS_IN_FLIGHT, DEFAULT_STREAM_PART_SIZE
+
+# One client, and so one presigned URL cache, is shared by every request.
+# It is created on the first request that needs it.
+gen3_minio_client = None
+gen3_minio_client_lock = threading.Lock()
+
+def get_gen3_minio_client():
+    global gen3_minio_client
+    with gen3_minio_client_lock:
+        if gen3_minio_client is None:
+            from gen3minioclient.gen3minioclient import Gen3MinioClient
+            gen3_minio_client = Gen3MinioClient()
+        return gen3_minio_client
+
+# Streamed uploads share one async client (and its indexd connection pool)
+# and one executor for the blocking MinIO calls and hashing. Uploads beyond
+# 'max_concurrent_stream_uploads' wait for a free slot, so the memory used by
+# the gateway stays below roughly
+# max_concurrent_stream_uploads * (stream_parts_in_flight + 1) * stream_part_size.
+max_concurrent_stream_uploads = int(os.getenv("GATEWAY_MAX_CONCURRENT_UPLOADS", DEFAULT_MAX_CONCURRENT_STREAM_UPLOADS))
+stream_part_size = int(os.getenv("GATEWAY_PART_SIZE", DEFAULT_STREAM_PART_SIZE))
+stream_parts_in_flight = int(os.getenv("GATEWAY_PARTS_IN_FLIGHT", DEFAULT_STREAM_PARTS_IN_FLIGHT))
+async_gen3_minio_client = None
+stream_upload_executor = None
+stream_upload_slots = None
+
+def get_async_gen3_minio_client():
+    global async_gen3_minio_client, stream_upload_executor, stream_upload_slots
+    if async_gen3_minio_client is None:
+        from gen3minioclient.async_client import AsyncGen3MinioClient
+        # Enough threads for every part in flight of every upload
+        stream_upload_executor = ThreadPoolExecutor(max_workers=max_concurrent_stream_uploads * stream_parts_in_flight, thread_name_prefix="gateway")
+        async_gen3_minio_client = AsyncGen3MinioClient(get_gen3_minio_client(), executor=stream_upload_executor)
+        stream_upload_slots = asyncio.Semaphore(max_concurrent_stream_uploads)
+    return async_gen3_minio_client
+
+# Closes the async client's connections and shuts down its executor when the
+# server stops. They are created again by the next upload, so the app can be
+# started more than once in the same process (as the tests do).
+async def close_async_gen3_minio_client():
+    global async_gen3_minio_client, stream_upload_executor, stream_upload_slots
+    if async_gen3_minio_client is not None:
+        await async_gen3_minio_client.aclose()
+        async_gen3_minio_client = None
+    if stream_upload_executor is not None:
+        stream_upload_executor.shutdown(wait=True)
+        stream_upload_executor = None
+    stream_upload_slots = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await close_async_gen3_minio_client()
+
+app = FastAPI(lifespan=lifespan)
+
+class PresignedUrlRequest(BaseModel):
+    object_names: List[str]
+    method: str = "PUT"
+    expires_seconds: int = int(DEFAULT_PRESIGNED_URL_EXPIRY.total_seconds())
 
 @app.get("/health")
 async def root():
     return {"message": "I am healthy!!!"}
 
-# Opening JSON file containing Gen3 credentials
-gen3_credentials_file = open('./../gen3-credentials.json')
-
-# returns JSON object as a python dictionary in the form:
-# key = {
-#   "api_key": "<actual-key>",
-#   "key_id": "<a-key-uuid>"
-# }
-
-gen3_credentials = json.load(gen3_credentials_file)
+# Per-phase timings and counters of every Gen3MinioClient in this process,
+# in the Prometheus text format
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return get_default_registry().render_prometheus()
 
-# Pass the API key to the Gen3 API using "requests.post" to receive the access token:
-access_token = requests.post('https://gen3-dev.core.wits.ac.za/user/credentials/cdis/access_token', json=gen3_credentials, verify=False).json()
+# Presigned PUT or GET URLs for a whole submission in one request:
+#
+# POST /presigned-urls {"object_names": ["PREFIX/a.txt", ...], "method": "PUT", "expires_seconds": 86400}
+#
+# URLs minted earlier are returned again, unchanged, until they are close to
+# expiring. Declared without 'async' so that signing runs in the threadpool.
+@app.post("/presigned-urls")
+def presigned_urls(presigned_url_request: PresignedUrlRequest):
+    method = presigned_url_request.method.upper()
+    if method not in PRESIGNED_URL_METHODS:
+        raise HTTPException(status_code=400, detail=f"'method' must be one of {', '.join(PRESIGNED_URL_METHODS)}")
+    if len(presigned_url_request.object_names) > MAX_PRESIGNED_URL_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PRESIGNED_URL_BATCH_SIZE} object names can be signed per request")
+    # MinIO rejects presigned URLs that live longer than seven days
+    if not 1 <= presigned_url_request.expires_seconds <= 7 * 24 * 3600:
+        raise HTTPException(status_code=400, detail="'expires_seconds' must be between 1 and 604800")
+    return {"urls": get_gen3_minio_client().get_minio_presigned_urls(
+        presigned_url_request.object_names,
+        method=method,
+        expires=timedelta(seconds=presigned_url_request.expires_seconds),
+    )}
 
-# Print the access_token
-print(access_token)
+# Streams the request body straight into the MinIO bucket and registers it
+# in indexd, without writing it to disk first:
+#
+# curl -T data.bin http://localhost:8000/uploads/data.bin
+#
+# Responds 201 with the did, md5 and size of the new record, 409 when a file
+# with the same name has already been uploaded, or 500 with the failed stage.
+@app.put("/uploads/{file_name}")
+async def upload_stream(file_name: str, request: Request):
+    file_name = Path(file_name).name
+    if not file_name:
+        raise HTTPException(status_code=400, detail="A file name is required")
+    async_client = get_async_gen3_minio_client()
+    async with stream_upload_slots:
+        upload_result = await async_client.upload_stream(
+            file_name,
+            request.stream(),
+            part_size=stream_part_size,
+            parts_in_flight=stream_parts_in_flight,
+        )
+    status_code = {"uploaded": 201, "skipped": 409}.get(upload_result["status"], 500)
+    return JSONResponse(status_code=status_code, content={key: value for key, value in upload_result.items() if key != "minio_object"})
 
 # Run the command 'fastapi dev gen3api.py' to start the development server
\ No newline at end of file
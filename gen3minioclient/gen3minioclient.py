@@ -1,27 +1,117 @@
 import logging
 import os
-import requests
-from requests.auth import HTTPBasicAuth
 import sys
-import hashlib
+import asyncio
+import itertools
 import json
-import re
+import tempfile
+import threading
 from pathlib import Path
 
+from concurrent.futures import ThreadPoolExecutor
 from csv import  DictReader, DictWriter
 from datetime import timedelta
 from uuid import uuid4
-from minio import Minio
-from dotenv import load_dotenv
-from boto3 import client, resource
-from gen3.auth import Gen3Auth, get_access_token_with_client_credentials, get_access_token_with_key
-from gen3.tools.indexing.index_manifest import index_object_manifest
-from gen3.index import Gen3Index
-from gen3.file import Gen3File
-from gen3.submission import Gen3Submission
+# minio, the gen3 SDK and httpx are imported where they are first used, so
+# that importing this module (and starting the CLI) stays fast
+from gen3minioclient.auth import Gen3AccessTokenProvider
+from gen3minioclient.concurrency import DEFAULT_MAX_CONNECTIONS
+from gen3minioclient.hash_cache import HashCache
+from gen3minioclient.hashing import calculate_file_digests, check_multipart_part_size, get_minio_part_size
+from gen3minioclient.listing_checkpoint import ListingCheckpoint
+from gen3minioclient.metrics import get_default_registry
+from gen3minioclient.multipart_upload import (
+    DEFAULT_MULTIPART_PART_SIZE,
+    DEFAULT_MULTIPART_WORKERS,
+    DEFAULT_PART_RETRIES,
+    MultipartUploader,
+)
+from gen3minioclient.upload_journal import (
+    STAGE_BLANK_RECORD_CREATED,
+    STAGE_HASHED,
+    STAGE_INDEX_UPDATED,
+    STAGE_UPLOADED,
+    UploadJournal,
+    has_reached_stage,
+)
+from gen3minioclient.manifest_store import ManifestStore, parse_manifest_list
+from gen3minioclient.object_records import (
+    DEFAULT_OBJECT_ACL,
+    DEFAULT_OBJECT_AUTHZ,
+    MinioObjectRecord,
+    get_object_url_prefix,
+)
+from gen3minioclient.chunked_indexing import (
+    DEFAULT_INDEXING_BATCH_SIZE,
+    DEFAULT_INDEXING_BATCH_WORKERS,
+    DEFAULT_INDEXING_THREADS,
+    IndexingCheckpoint,
+    index_in_batches,
+    iter_batches,
+)
+from gen3minioclient.sharded_listing import (
+    DEFAULT_LISTING_WORKERS,
+    DEFAULT_SHARD_DEPTH,
+    LISTING_BATCH_SIZE,
+    iter_listing,
+    iter_sharded_objects,
+)
+from gen3minioclient.indexd import (
+    DEFAULT_BACKOFF_FACTOR,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_RETRIES,
+    DEFAULT_TIMEOUT,
+    IndexdClient,
+    create_http_session,
+)
+from gen3minioclient.bulk_download import (
+    DEFAULT_DOWNLOAD_WORKERS,
+    DEFAULT_RANGE_SIZE,
+    DEFAULT_RANGE_WORKERS,
+    RangedDownloader,
+    download_objects_in_parallel,
+    get_object_name_from_url,
+    get_safe_file_name,
+    is_path_within_directory,
+    summarise_download_results,
+    verify_file_digests,
+    write_download_report,
+)
+from gen3minioclient.bulk_delete import (
+    DEFAULT_DELETE_BATCH_SIZE,
+    list_objects_by_prefix,
+    remove_objects_in_batches,
+    summarise_delete_results,
+    write_delete_report,
+)
+from gen3minioclient.bulk_upload import (
+    DEFAULT_MAX_IN_FLIGHT_BYTES,
+    DEFAULT_UPLOAD_WORKERS,
+    collect_file_paths_from_directory,
+    collect_file_paths_from_list,
+    summarise_upload_results,
+    upload_files_in_parallel,
+    write_upload_report,
+)
+from gen3minioclient.indexd_records import (
+    DEFAULT_RECORD_PAGE_SIZE,
+    DEFAULT_RECORD_READ_AHEAD,
+    iter_indexd_records,
+    record_to_manifest_row,
+)
+from gen3minioclient.reconciliation import DEFAULT_RECONCILIATION_PARTITIONS, is_multipart_etag, reconcile
+from gen3minioclient.presigned_urls import (
+    DEFAULT_PRESIGNED_URL_EXPIRY,
+    DEFAULT_PRESIGNED_URL_REFRESH_LEEWAY_SECONDS,
+    PresignedUrlCache,
+    mint_presigned_urls,
+)
 
-logging.basicConfig(filename="output.log", level=logging.DEBUG)
-logging.getLogger().addHandler(logging.StreamHandler(sys.stdout))
+# Called by the CLI and scripts rather than at import time, so that importing
+# the client does not reconfigure the logging of the application using it
+def configure_logging(log_file: str = "output.log", level=logging.DEBUG):
+    logging.basicConfig(filename=log_file, level=level)
+    logging.getLogger().addHandler(logging.StreamHandler(sys.stdout))
 
 class Gen3MinioClient:
     MANIFEST_FIELDS = ['guid', 'urls', 'authz', 'acl', 'md5', 'file_size', 'file_name']
@@ -34,15 +124,53 @@ class Gen3MinioClient:
     gen3_credentials = os.getenv("GEN3_CREDENTIALS_PATH")
     gen3_username = os.getenv("GEN3_USERNAME")
     manifest_file_location = os.getenv("MANIFEST_FILE_LOCATION")
-    
-    client = Minio(
-        endpoint=minio_api_endpoint,
-        access_key=minio_access_key,
-        secret_key=minio_secret_key,
-        cert_check=False,
-    )
+    manifest_store_location = os.getenv("MANIFEST_STORE_LOCATION")
+    http_pool_size = int(os.getenv("HTTP_POOL_SIZE", DEFAULT_POOL_SIZE))
+    http_retries = int(os.getenv("HTTP_RETRIES", DEFAULT_RETRIES))
+    http_backoff_factor = float(os.getenv("HTTP_BACKOFF_FACTOR", DEFAULT_BACKOFF_FACTOR))
+    http_timeout = DEFAULT_TIMEOUT
+    manifest_write_batch_size = 10000
+    multipart_upload = os.getenv("MULTIPART_UPLOAD", "false").lower() == "true"
+    multipart_part_size = int(os.getenv("MULTIPART_PART_SIZE", DEFAULT_MULTIPART_PART_SIZE))
+    multipart_workers = int(os.getenv("MULTIPART_WORKERS", DEFAULT_MULTIPART_WORKERS))
+    multipart_part_retries = int(os.getenv("MULTIPART_PART_RETRIES", DEFAULT_PART_RETRIES))
+    download_range_size = int(os.getenv("DOWNLOAD_RANGE_SIZE", DEFAULT_RANGE_SIZE))
+    download_range_workers = int(os.getenv("DOWNLOAD_RANGE_WORKERS", DEFAULT_RANGE_WORKERS))
+    presigned_url_refresh_leeway_seconds = int(os.getenv("PRESIGNED_URL_REFRESH_LEEWAY_SECONDS", DEFAULT_PRESIGNED_URL_REFRESH_LEEWAY_SECONDS))
+    # Threads 'index_object_manifest' uses, and how many rows and batches of
+    # rows chunked indexing sends at a time
+    indexing_threads = int(os.getenv("INDEXING_THREADS", DEFAULT_INDEXING_THREADS))
+    indexing_batch_size = int(os.getenv("INDEXING_BATCH_SIZE", DEFAULT_INDEXING_BATCH_SIZE))
+    indexing_batch_workers = int(os.getenv("INDEXING_BATCH_WORKERS", DEFAULT_INDEXING_BATCH_WORKERS))
+    # Full listings are split into key-range shards listed on this many
+    # threads; 1 lists the bucket with a single 'list_objects' call
+    listing_workers = int(os.getenv("LISTING_WORKERS", DEFAULT_LISTING_WORKERS))
+    # Shards per listing are 16 ** listing_shard_depth
+    listing_shard_depth = int(os.getenv("LISTING_SHARD_DEPTH", DEFAULT_SHARD_DEPTH))
+    # Listing the whole bucket to find duplicate file names is expensive, so
+    # existence checks only use the manifest unless this is switched on
+    list_bucket_for_existence_check = os.getenv("LIST_BUCKET_FOR_EXISTENCE_CHECK", "false").lower() == "true"
+    # Digests of unchanged files are read from this SQLite cache instead of
+    # being calculated again
+    hash_cache_location = os.getenv("HASH_CACHE_LOCATION")
+    # Files whose md5 (or ETag) is already in the manifest, or in the bucket
+    # when it is listed, are skipped even when their name is new
+    skip_duplicate_content = os.getenv("SKIP_DUPLICATE_CONTENT", "true").lower() == "true"
 
     def __init__(self):
+        self._gen3_auth_lock = threading.Lock()
+        self._client = None
+        self._access_token_provider = None
+        self._gen3_auth = None
+        self._http_session = None
+        self._indexd_client = None
+        self._object_name_index_lock = threading.Lock()
+        self._object_name_index = None
+        self._object_md5_index = None
+        self._manifest_store = None
+        self._hash_cache = None
+        self.presigned_url_cache = PresignedUrlCache(refresh_leeway_seconds=self.presigned_url_refresh_leeway_seconds)
+        self.metrics = get_default_registry()
         print(f"Initialising Gen3MinioClient with bucket {self.minio_bucket_name} and endpoint https://{self.minio_api_endpoint} for uploader {self.gen3_username}...")
         
     def configure_gen3_minio_client(self, gen3_minio_json_file):
@@ -81,86 +209,182 @@ class Gen3MinioClient:
         self.gen3_commons_url = json_values["gen3_commons_url"]
         self.gen3_credentials = json_values["gen3_credentials_path"]
         self.gen3_username = json_values["gen3_username"]
-        
-        self.client = Minio(
-            endpoint=self.minio_api_endpoint,
-            access_key=self.minio_access_key,
-            secret_key=self.minio_secret_key,
-            cert_check=False,
-        )
+        self.manifest_store_location = json_values.get("manifest_store_location", self.manifest_store_location)
+        with self._gen3_auth_lock:
+            self._client = None
+            self._manifest_store = None
+            self._hash_cache = None
+            self.presigned_url_cache.clear()
+            self._access_token_provider = None
+            self._gen3_auth = None
+            self._indexd_client = None
     
         return f"Credentials for the 'gen3-minio-client' CLI tool has been successfully initialised."
         
         
+    # The MinIO client is built on first use, from the configuration at that
+    # time, instead of when the class is defined
+    @property
+    def client(self):
+        with self._gen3_auth_lock:
+            if self._client is None:
+                from minio import Minio
+                self._client = Minio(
+                    endpoint=self.minio_api_endpoint,
+                    access_key=self.minio_access_key,
+                    secret_key=self.minio_secret_key,
+                    cert_check=False,
+                )
+            return self._client
+    
+    @client.setter
+    def client(self, client):
+        with self._gen3_auth_lock:
+            self._client = client
+    
+    # One pooled keep-alive session is shared by every indexd and Fence call
+    def get_http_session(self):
+        with self._gen3_auth_lock:
+            if self._http_session is None:
+                self._http_session = create_http_session(
+                    pool_size=self.http_pool_size,
+                    retries=self.http_retries,
+                    backoff_factor=self.http_backoff_factor,
+                )
+            return self._http_session
+    
+    def get_gen3_access_token_provider(self):
+        session = self.get_http_session()
+        with self._gen3_auth_lock:
+            if self._access_token_provider is None:
+                self._access_token_provider = Gen3AccessTokenProvider(
+                    self.gen3_commons_url,
+                    self.gen3_credentials,
+                    session=session,
+                    timeout=self.http_timeout,
+                )
+            return self._access_token_provider
+    
+    def get_indexd_client(self):
+        session = self.get_http_session()
+        with self._gen3_auth_lock:
+            if self._indexd_client is None:
+                self._indexd_client = IndexdClient(
+                    self.gen3_commons_url,
+                    self.get_gen3_commons_access_token,
+                    session=session,
+                    timeout=self.http_timeout,
+                )
+            return self._indexd_client
+    
+    # Returns the cached access token until shortly before its 'exp' claim,
+    # so that uploads do not make a Fence round-trip for every indexd call
     def get_gen3_commons_access_token(self):
-        url = f"{self.gen3_commons_url}/user/credentials/cdis/access_token"
+        return self.get_gen3_access_token_provider().get_access_token()
+    
+    # One Gen3Auth is shared by every call that goes through the Gen3 SDK
+    def get_gen3_auth(self):
+        with self._gen3_auth_lock:
+            if self._gen3_auth is None:
+                from gen3.auth import Gen3Auth
+                self._gen3_auth = Gen3Auth(refresh_file=self.gen3_credentials)
+            return self._gen3_auth
         
-        # opening JSON file containing Api Key
-        f = open(self.gen3_credentials)
-
-        # returns JSON object as 
-        # a dictionary
-        creds = json.load(f)
-        data = {
-            "api_key": creds["api_key"],
-            "key_id": creds["key_id"]
-        }
-        response = requests.post(
-            url,
-            data=data,
-            verify=False
+    # A compact, read-only 'MinioObjectRecord' for an object from a listing
+    def create_minio_object_record(self, obj, url_prefix=None):
+        return MinioObjectRecord(
+            obj.object_name,
+            str(obj.etag).strip('"'),
+            obj.size,
+            url_prefix or get_object_url_prefix(self.minio_api_endpoint, self.minio_bucket_name),
         )
-        response_json = json.loads(response.content)
-        access_token = response_json["access_token"]
-        print("Fetching access token...")
-        return access_token
-        
-    def get_minio_objects(self):
-        objects = self.client.list_objects(self.minio_bucket_name, recursive=True)
-        minio_objects = []
+    
+    # A manifest row dict, which unlike a 'MinioObjectRecord' can be changed
+    def create_object_record(self, full_object_name: str, md5: str, file_size: int):
+        return MinioObjectRecord(full_object_name, md5, file_size, get_object_url_prefix(self.minio_api_endpoint, self.minio_bucket_name)).to_dict()
+    
+    # Yields every object under the prefix. With more than one listing
+    # worker, the keyspace is split into shards (see 'sharded_listing') that
+    # are listed in parallel, in key order unless 'ordered' is False.
+    # 'shard_plan' is a list of (lo, hi) key ranges and is discovered from the
+    # bucket when not given, once the listing turns out to be longer than a
+    # page.
+    def iter_minio_listing(self, prefix=None, ordered: bool = True, shard_plan=None):
+        if self.listing_workers <= 1 and shard_plan is None:
+            return self.client.list_objects(self.minio_bucket_name, prefix=prefix, recursive=True)
+        if shard_plan is None:
+            return iter_listing(
+                self.client,
+                self.minio_bucket_name,
+                prefix=prefix or "",
+                max_workers=self.listing_workers,
+                ordered=ordered,
+                depth=self.listing_shard_depth,
+            )
+        return iter_sharded_objects(
+            self.client,
+            self.minio_bucket_name,
+            prefix=prefix or "",
+            shard_plan=shard_plan,
+            max_workers=max(self.listing_workers, 1),
+            ordered=ordered,
+        )
+    
+    # Yields one object record at a time so that callers never need to hold
+    # the whole bucket listing in memory
+    def iter_minio_objects(self, prefix=None, ordered: bool = True):
+        url_prefix = get_object_url_prefix(self.minio_api_endpoint, self.minio_bucket_name)
+        objects = self.iter_minio_listing(prefix=prefix, ordered=ordered)
         for obj in objects:
-            object_name = obj.object_name
-            guid = str(uuid4())
-            index = object_name.rfind('/')
-            if (index != -1):
-                object_name = object_name[index+1:]
-            minio_object = {
-                "guid": guid,
-                "file_name": object_name,
-                "md5": str(obj.etag).strip('"'),
-                "file_size": obj.size,
-                "acl": ["*"],
-                "authz": ["/programs/gen3Program502/projects/P502"],
-                "urls": [f"https://{self.minio_api_endpoint}/{self.minio_bucket_name}/{obj.object_name}"],
-            }
-            minio_objects.append(minio_object)
-        print(minio_objects)
+            yield self.create_minio_object_record(obj, url_prefix=url_prefix)
+    
+    def iter_minio_objects_by_prefix(self, prefix: str, ordered: bool = True):
+        return self.iter_minio_objects(prefix=prefix, ordered=ordered)
+    
+    # Holds the whole listing in memory, so prefer 'iter_minio_objects' for
+    # large buckets
+    def get_minio_objects(self):
+        with self.metrics.time_phase("list_objects") as phase:
+            minio_objects = list(self.iter_minio_objects())
+            phase["items"] = len(minio_objects)
+        print(f"Found {len(minio_objects)} objects in MinIO bucket.")
         return minio_objects
 
     def get_minio_objects_by_prefix(self, prefix: str):
-        objects = self.client.list_objects(self.minio_bucket_name, prefix=prefix, recursive=True)
-        minio_objects = []
-        for obj in objects:
-            object_name = obj.object_name
-            # did = str(uuid4())
-            last_index = object_name.rfind('/')
-            if (last_index != -1):
-                # did = object_name[ object_name.find("/")+1 : object_name.rfind("/") ]
-                object_name = object_name[last_index+1:]
-            minio_object = {
-                "guid": str(uuid4()),
-                "file_name": object_name,
-                "md5": str(obj.etag).strip('"'),
-                "file_size": obj.size,
-                "acl": ["*"],
-                "authz": ["/programs/gen3Program502/projects/P502"],
-                "urls": [f"https://{self.minio_api_endpoint}/{self.minio_bucket_name}/{obj.object_name}"],
-            }
-            minio_objects.append(minio_object)
+        return list(self.iter_minio_objects_by_prefix(prefix))
+    
+    # Lists the whole prefix (in parallel shards, see 'iter_minio_listing') and
+    # yields only the objects whose key is not in the checkpoint yet or whose
+    # ETag has changed, recording them there. The listing is compared with the
+    # checkpoint a page at a time, so it is never held in memory.
+    def iter_new_or_changed_minio_objects(self, checkpoint: ListingCheckpoint, prefix: str = ""):
+        for minio_object, _ in self.iter_minio_object_changes(checkpoint, prefix=prefix):
+            yield minio_object
+    
+    # Yields (minio_object, changed) for every object that is new or changed
+    # since the last run, where 'changed' is True for an object the checkpoint
+    # has seen before with another ETag, i.e. one that has been overwritten
+    def iter_minio_object_changes(self, checkpoint: ListingCheckpoint, prefix: str = ""):
+        url_prefix = get_object_url_prefix(self.minio_api_endpoint, self.minio_bucket_name)
+        objects = self.iter_minio_listing(prefix=prefix or None)
+        for batch in iter_batches(objects, LISTING_BATCH_SIZE):
+            etags = {obj.object_name: str(obj.etag).strip('"') for obj in batch}
+            known_etags = checkpoint.get_known_etags(prefix, etags)
+            new_or_changed = {object_name: etag for object_name, etag in etags.items() if known_etags.get(object_name) != etag}
+            if not new_or_changed:
+                continue
+            checkpoint.record(prefix, new_or_changed)
+            for obj in batch:
+                if obj.object_name in new_or_changed:
+                    yield self.create_minio_object_record(obj, url_prefix=url_prefix), obj.object_name in known_etags
+    
+    def get_new_or_changed_minio_objects(self, checkpoint: ListingCheckpoint, prefix: str = ""):
+        minio_objects = list(self.iter_new_or_changed_minio_objects(checkpoint, prefix=prefix))
+        print(f"Found {len(minio_objects)} new or changed objects in MinIO bucket.")
         return minio_objects
     
     def get_minio_object_names(self):
-        objects = self.client.list_objects(self.minio_bucket_name, recursive=True)
+        objects = self.iter_minio_listing()
         object_names = []
         for obj in objects:
             object_name = obj.object_name
@@ -172,7 +396,7 @@ class Gen3MinioClient:
         return object_names
     
     def get_minio_object_names_by_prefix(self, prefix: str):
-        objects = self.client.list_objects(self.minio_bucket_name, prefix, recursive=True)
+        objects = self.iter_minio_listing(prefix=prefix)
         object_names = []
         for obj in objects:
             object_name = obj.object_name
@@ -183,92 +407,380 @@ class Gen3MinioClient:
             print(object_name)
         return object_names
     
-    def check_if_object_is_in_minio_bucket(self, object_name: str):
-        object_exists = False
-        minio_object_names = self.get_minio_object_names()
-        if object_name in minio_object_names:
-            object_exists = True
-        return object_exists
+    # A single HEAD request for an object whose full key is known
+    def check_if_object_key_is_in_minio_bucket(self, object_key: str):
+        from minio.error import S3Error
+        try:
+            self.client.stat_object(self.minio_bucket_name, object_key)
+        except S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchObject", "ResourceNotFound"):
+                return False
+            raise
+        return True
+    
+    # Loads the file names and md5 values (ETags, for listed objects) of the
+    # objects in the bucket into in-memory sets once, from the manifest (or
+    # from a full bucket listing when asked to), so that every later existence
+    # check is a constant-time lookup
+    def load_minio_object_name_index(self, manifest_file=None, list_bucket: bool = False):
+        object_names = set()
+        md5_values = set()
+        if list_bucket:
+            print("Listing all objects in MinIO bucket to build object name index...")
+            for obj in self.iter_minio_listing(ordered=False):
+                object_names.add(obj.object_name.rsplit('/', 1)[-1])
+                md5_values.add(str(obj.etag).strip('"'))
+        manifest_file = manifest_file or self.manifest_file_location
+        if manifest_file and os.path.exists(manifest_file):
+            for row in self.iter_minio_manifest_file(manifest_file):
+                if row.get("file_name"):
+                    object_names.add(row["file_name"])
+                if row.get("md5"):
+                    md5_values.add(row["md5"])
+        with self._object_name_index_lock:
+            self._object_name_index = object_names
+            self._object_md5_index = md5_values
+        return len(object_names)
+    
+    def add_object_to_name_index(self, object_name: str, md5=None):
+        with self._object_name_index_lock:
+            if self._object_name_index is None:
+                self._object_name_index = set()
+                self._object_md5_index = set()
+            self._object_name_index.add(object_name)
+            if md5:
+                self._object_md5_index.add(md5)
+    
+    def check_if_object_is_in_minio_bucket(self, object_name: str, object_key=None, list_bucket: bool = False):
+        if object_key:
+            return self.check_if_object_key_is_in_minio_bucket(object_key)
+        
+        with self._object_name_index_lock:
+            index_loaded = self._object_name_index is not None
+        if not index_loaded or list_bucket:
+            self.load_minio_object_name_index(list_bucket=list_bucket or self.list_bucket_for_existence_check)
+        
+        with self._object_name_index_lock:
+            return object_name in self._object_name_index
+    
+    # Whether a file with these digests has already been uploaded under any
+    # name. Objects listed from the bucket only have their ETag, which is the
+    # md5 for single-part uploads and matches the 'etag' digest otherwise.
+    def check_if_content_is_in_minio_bucket(self, file_digests):
+        with self._object_name_index_lock:
+            index_loaded = self._object_md5_index is not None
+        if not index_loaded:
+            self.load_minio_object_name_index(list_bucket=self.list_bucket_for_existence_check)
+        
+        with self._object_name_index_lock:
+            if file_digests["md5"] in self._object_md5_index or file_digests.get("etag") in self._object_md5_index:
+                return True
+        if self.manifest_store_location:
+            return self.get_manifest_store().contains_md5(file_digests["md5"])
+        return False
     
     # Get presigned URL string to upload file in
     # bucket with response-content-type as application/json
     # and one day expiry.
     def get_minio_presigned_url(self, file_upload_path: str):
-        url = self.client.get_presigned_url(
-            "PUT",
+        return self.get_minio_presigned_urls([file_upload_path])[file_upload_path]["url"]
+    
+    # Presigned PUT or GET URLs for many object names in one call. URLs that
+    # are still comfortably valid come from 'presigned_url_cache' instead of
+    # being signed again.
+    def get_minio_presigned_urls(self, object_names, method: str = "PUT", expires: timedelta = DEFAULT_PRESIGNED_URL_EXPIRY):
+        response_headers = {"response-content-type": "application/json"} if method.upper() == "PUT" else None
+        return mint_presigned_urls(
+            self.client,
             self.minio_bucket_name,
-            file_upload_path,
-            expires=timedelta(days=1),
-            response_headers={"response-content-type": "application/json"},
+            object_names,
+            method=method,
+            expires=expires,
+            cache=self.presigned_url_cache,
+            response_headers=response_headers,
         )
-        return url
         
     def calculate_size_of_file(self, file_path: str):
-        data = open(file_path, "rb").read()
-        file_size = sys.getsizeof(data)
+        file_size = os.path.getsize(file_path)
         print(file_size)
         return file_size
     
     def generate_md5_for_file(self, file_path: str):
-        data = open(file_path, "rb").read()
-        md5sum = hashlib.md5(data).hexdigest()
+        md5sum = self.generate_digests_for_file(file_path)["md5"]
         print(md5sum)
         return md5sum
     
-    def load_minio_manifest_file(self, manifest_file: str) -> dict:
+    # Size, MD5, optional SHA-256 and the ETag MinIO will report for the
+    # object, all calculated in a single pass over the file
+    def generate_digests_for_file(self, file_path: str, sha256: bool = False, part_size: int = 0):
+        return self.get_file_digests(file_path, sha256=sha256, part_size=part_size)[0]
+    
+    def get_hash_cache(self):
+        with self._gen3_auth_lock:
+            if self._hash_cache is None and self.hash_cache_location:
+                self._hash_cache = HashCache(self.hash_cache_location)
+            return self._hash_cache
+    
+    # Returns the digests of a file and whether they came from the hash
+    # cache, which is used when 'hash_cache_location' is set
+    def get_file_digests(self, file_path: str, sha256: bool = False, part_size: int = 0):
+        hash_cache = self.get_hash_cache()
+        if hash_cache is None:
+            return calculate_file_digests(file_path, sha256=sha256, part_size=part_size), False
+        file_digests, cached = hash_cache.get_file_digests(file_path, sha256=sha256, part_size=part_size)
+        self.metrics.increment("hash_cache_total", result="hit" if cached else "miss")
+        return file_digests, cached
+    
+    def iter_minio_manifest_file(self, manifest_file: str):
         with open(manifest_file, "r") as f:
             reader = DictReader(f, delimiter="\t")
-            return [row for row in reader]
-        
-    def create_minio_manifest_file(self, output_manifest_file: str):
-        minio_objects = self.get_minio_objects()
-        with open(output_manifest_file, "w") as f:
-            writer = DictWriter(f, fieldnames=self.MANIFEST_FIELDS, delimiter="\t")
+            for row in reader:
+                yield row
+    
+    def load_minio_manifest_file(self, manifest_file: str) -> dict:
+        return list(self.iter_minio_manifest_file(manifest_file))
+    
+    def parse_manifest_list(self, value):
+        return parse_manifest_list(value)
+    
+    # Reads the manifest one row at a time and only keeps the md5 values and
+    # URLs (with the md5 of the row each is in), which is all that is needed
+    # to tell whether an object is new or has changed
+    def load_minio_manifest_keys(self, manifest_file: str):
+        existing_md5sum_values = set()
+        existing_urls = {}
+        number_of_entries = 0
+        if os.path.exists(manifest_file):
+            for row in self.iter_minio_manifest_file(manifest_file):
+                number_of_entries += 1
+                existing_md5sum_values.add(row["md5"])
+                existing_urls.update(dict.fromkeys(self.parse_manifest_list(row.get("urls")), row["md5"]))
+        return existing_md5sum_values, existing_urls, number_of_entries
+    
+    def is_object_in_manifest_keys(self, minio_object, existing_md5sum_values, existing_urls):
+        if str(minio_object["md5"]) in existing_md5sum_values:
+            return True
+        return any(url in existing_urls for url in minio_object["urls"])
+    
+    # An object whose URL is already in the manifest with another md5 has been
+    # overwritten since its row was written. Its row is queued in
+    # 'replacements' ({url: minio_object}) instead of a new row being added,
+    # and the keys are updated so that later duplicates of it are skipped.
+    def queue_manifest_row_replacement(self, minio_object, existing_md5sum_values, existing_urls, replacements):
+        md5 = str(minio_object["md5"])
+        urls = [url for url in minio_object["urls"] if url in existing_urls]
+        if not urls or all(existing_urls[url] == md5 for url in urls):
+            return False
+        for url in urls:
+            replacements[url] = minio_object
+            existing_urls[url] = md5
+        existing_md5sum_values.add(md5)
+        return True
+    
+    # Rewrites the manifest with each row that has a URL in 'replacements'
+    # replaced by the object now at that URL. The row keeps its guid, so
+    # indexing updates the record it was indexed as instead of adding a
+    # second one. Returns the number of rows replaced.
+    def replace_minio_manifest_rows(self, manifest_file: str, replacements):
+        number_of_rows = 0
+        temporary_manifest_file = f"{manifest_file}.tmp"
+        with open(temporary_manifest_file, "w") as f:
+            writer = DictWriter(f, fieldnames=self.MANIFEST_FIELDS, delimiter="\t", extrasaction="ignore")
             writer.writeheader()
+            for row in self.iter_minio_manifest_file(manifest_file):
+                replacement = next((replacements[url] for url in self.parse_manifest_list(row.get("urls")) if url in replacements), None)
+                if replacement is not None:
+                    row = {**replacement, "guid": row["guid"]}
+                    number_of_rows += 1
+                writer.writerow(row)
+        os.replace(temporary_manifest_file, manifest_file)
+        return number_of_rows
+    
+    # Appends new rows in batches of 'manifest_write_batch_size', writing the
+    # header first when the manifest is new. Returns the number of rows written.
+    def write_minio_objects_to_manifest_file(self, manifest_file: str, minio_objects, write_header: bool = False):
+        number_of_rows = 0
+        batch = []
+        with open(manifest_file, "w" if write_header else "a") as f:
+            writer = DictWriter(f, fieldnames=self.MANIFEST_FIELDS, delimiter="\t")
+            if write_header:
+                writer.writeheader()
             for minio_object in minio_objects:
-                writer.writerow(minio_object)
+                batch.append(minio_object)
+                if len(batch) >= self.manifest_write_batch_size:
+                    writer.writerows(batch)
+                    number_of_rows += len(batch)
+                    batch = []
+            writer.writerows(batch)
+            number_of_rows += len(batch)
+        return number_of_rows
+        
+    # Streams the listing straight into the manifest, so memory use does not
+    # grow with the size of the bucket
+    def create_minio_manifest_file(self, output_manifest_file: str):
+        with self.metrics.time_phase("list_objects") as phase:
+            number_of_rows = self.write_minio_objects_to_manifest_file(output_manifest_file, self.iter_minio_objects(), write_header=True)
+            phase["items"] = number_of_rows
+        print(f"Found {number_of_rows} objects in MinIO bucket.")
         print("Created manifest file and saved it in current working directory.")
         return "Created manifest file and saved it in current working directory."
 
-    def update_minio_manifest_file(self, old_manifest_file: str):
-        minio_objects = self.get_minio_objects()
-        if len(minio_objects) == 0:
-            print("There are no objects in the MinIO bucket.")
-            return "There are no objects in the MinIO bucket."
-        
-        updated_minio_objects = []
-        existing_minio_objects = self.load_minio_manifest_file(old_manifest_file)
-        if len(existing_minio_objects) == 0:
+    # With 'incremental' set, only objects that are new or changed since the
+    # last run are processed, using the listing state persisted in 'checkpoint_file'.
+    # Bucket objects are streamed and checked against sets of the md5 values and
+    # URLs already in the manifest, so the merge is linear in time and only the
+    # manifest keys are held in memory. Objects the checkpoint has seen with
+    # another ETag replace their existing row rather than being skipped.
+    def update_minio_manifest_file(self, old_manifest_file: str, incremental: bool = False, checkpoint_file=None, prefix: str = ""):
+        checkpoint = None
+        if incremental:
+            checkpoint = ListingCheckpoint(checkpoint_file or f"{old_manifest_file}.checkpoint.db")
+            minio_objects = self.iter_minio_object_changes(checkpoint, prefix=prefix)
+        else:
+            minio_objects = ((minio_object, False) for minio_object in self.iter_minio_objects(prefix=prefix or None))
+        
+        existing_md5sum_values, existing_urls, number_of_entries = self.load_minio_manifest_keys(old_manifest_file)
+        if number_of_entries == 0:
             print("There are no entries in the manifest file. Creating a new manifest file...")
-            return self.create_minio_manifest_file(old_manifest_file)
-        
-        existing_minio_objects_md5sum_values = [object["md5"] for object in existing_minio_objects]
-        for obj in minio_objects:
-            if str(obj["md5"]) in existing_minio_objects_md5sum_values:
-                continue            
-            updated_minio_objects.append({
-                "guid": obj["guid"],
-                "file_name": obj["file_name"],
-                "md5": obj["md5"],
-                "file_size": obj["file_size"],
-                "acl": ["*"],
-                "authz": ["/programs/gen3Program502/projects/P502"],
-                "urls": obj["urls"],
-            })
-        with open(old_manifest_file, "a") as f:
-            writer = DictWriter(f, fieldnames=self.MANIFEST_FIELDS, delimiter="\t")
-            for minio_object in updated_minio_objects:
-                writer.writerow(minio_object)
+        
+        counts = {"listed": 0}
+        replacements = {}
+        def new_minio_objects():
+            for minio_object, changed in minio_objects:
+                counts["listed"] += 1
+                if changed and self.queue_manifest_row_replacement(minio_object, existing_md5sum_values, existing_urls, replacements):
+                    continue
+                if self.is_object_in_manifest_keys(minio_object, existing_md5sum_values, existing_urls):
+                    continue
+                yield minio_object
+        
+        # Peek at the first new object so that an empty bucket leaves the
+        # manifest untouched
+        new_objects = new_minio_objects()
+        first_new_object = next(new_objects, None)
+        number_of_rows = 0
+        if first_new_object is not None:
+            number_of_rows = self.write_minio_objects_to_manifest_file(
+                old_manifest_file,
+                itertools.chain([first_new_object], new_objects),
+                write_header=number_of_entries == 0,
+            )
+        number_of_replaced_rows = self.replace_minio_manifest_rows(old_manifest_file, replacements) if replacements else 0
+        # Only advance the listing state once the manifest has been written
+        if checkpoint:
+            checkpoint.save()
+        if number_of_rows == 0 and number_of_replaced_rows == 0:
+            if counts["listed"] == 0:
+                message = "There are no new objects in the MinIO bucket." if checkpoint else "There are no objects in the MinIO bucket."
+            else:
+                message = "Manifest file is already up to date."
+            print(message)
+            return message
+        print(f"Listed {counts['listed']} objects and added {number_of_rows} new entries to the manifest file.")
+        if number_of_replaced_rows:
+            print(f"Replaced {number_of_replaced_rows} entries of changed objects in the manifest file.")
+        if number_of_entries == 0:
+            print("Created manifest file and saved it in current working directory.")
+            return "Created manifest file and saved it in current working directory."
+        print("Updated manifest file.")
+        return "Updated manifest file."
+    
+    # Appends already-known objects (e.g. from a bulk upload) to the manifest
+    # in one write, without re-listing the bucket. An object whose URL is
+    # already in the manifest with another md5 replaces that row.
+    def append_minio_objects_to_manifest_file(self, manifest_file: str, minio_objects):
+        existing_md5sum_values, existing_urls, number_of_entries = self.load_minio_manifest_keys(manifest_file)
+        replacements = {}
+        self.write_minio_objects_to_manifest_file(
+            manifest_file,
+            (
+                obj for obj in minio_objects
+                if not self.queue_manifest_row_replacement(obj, existing_md5sum_values, existing_urls, replacements)
+                and not self.is_object_in_manifest_keys(obj, existing_md5sum_values, existing_urls)
+            ),
+            write_header=number_of_entries == 0,
+        )
+        if replacements:
+            number_of_replaced_rows = self.replace_minio_manifest_rows(manifest_file, replacements)
+            print(f"Replaced {number_of_replaced_rows} entries of changed objects in the manifest file.")
+        if number_of_entries == 0:
+            print("Created manifest file.")
+            return "Created manifest file."
         print("Updated manifest file.")
         return "Updated manifest file."
         
-    def create_indexd_manifest(self, manifest_file: str):
-        auth = Gen3Auth(refresh_file=self.gen3_credentials)
-        self.update_minio_manifest_file(manifest_file)
+    def get_manifest_store(self):
+        with self._gen3_auth_lock:
+            if self._manifest_store is None:
+                if not self.manifest_store_location:
+                    raise ValueError("'manifest_store_location' has not been specified")
+                self._manifest_store = ManifestStore(self.manifest_store_location, self.MANIFEST_FIELDS)
+            return self._manifest_store
+    
+    def import_minio_manifest_file_to_store(self, manifest_file: str):
+        number_of_rows = self.get_manifest_store().import_tsv(manifest_file, batch_size=self.manifest_write_batch_size)
+        print(f"Imported {number_of_rows} entries from '{manifest_file}' into the manifest store.")
+        return number_of_rows
+    
+    def export_minio_manifest_store_to_file(self, manifest_file: str):
+        number_of_rows = self.get_manifest_store().export_tsv(manifest_file)
+        print(f"Exported {number_of_rows} entries from the manifest store to '{manifest_file}'.")
+        return number_of_rows
+    
+    # Same merge as 'update_minio_manifest_file', but new objects are upserted
+    # into the SQLite store, where the md5 and URL checks are index lookups.
+    # A changed object is upserted under the guid of the row it replaces.
+    def update_minio_manifest_store(self, incremental: bool = False, checkpoint_file=None, prefix: str = ""):
+        manifest_store = self.get_manifest_store()
+        checkpoint = None
+        if incremental:
+            checkpoint = ListingCheckpoint(checkpoint_file or f"{self.manifest_store_location}.checkpoint.db")
+            minio_objects = self.iter_minio_object_changes(checkpoint, prefix=prefix)
+        else:
+            minio_objects = ((minio_object, False) for minio_object in self.iter_minio_objects(prefix=prefix or None))
+        
+        number_of_rows = 0
+        batch = []
+        for minio_object, changed in minio_objects:
+            rows = None
+            if changed:
+                existing_rows = [row for url in minio_object["urls"] for row in manifest_store.find_by_url(url)]
+                if any(row["md5"] != str(minio_object["md5"]) for row in existing_rows):
+                    rows = [{**minio_object, "guid": row["guid"]} for row in existing_rows]
+            if rows is None:
+                if manifest_store.contains_md5(str(minio_object["md5"])) or any(manifest_store.contains_url(url) for url in minio_object["urls"]):
+                    continue
+                rows = [minio_object]
+            batch.extend(rows)
+            if len(batch) >= self.manifest_write_batch_size:
+                number_of_rows += manifest_store.upsert_rows(batch)
+                batch = []
+        number_of_rows += manifest_store.upsert_rows(batch)
+        if checkpoint:
+            checkpoint.save()
+        print(f"Added or replaced {number_of_rows} entries in the manifest store.")
+        return number_of_rows
+    
+    # Syncs the manifest with the bucket (unless 'sync_manifest' is False) and
+    # indexes it. With 'chunked' set, or a 'checkpoint_file' given, the
+    # manifest is indexed in batches instead of in one call; see
+    # 'index_manifest_in_batches'.
+    def create_indexd_manifest(self, manifest_file: str, chunked: bool = False, checkpoint_file=None, report_file=None, sync_manifest: bool = True):
+        from gen3.tools.indexing.index_manifest import index_object_manifest
+        auth = self.get_gen3_auth()
+        if sync_manifest:
+            if self.manifest_store_location:
+                # 'index_object_manifest' needs a TSV, so write one out from the store
+                self.update_minio_manifest_store()
+                self.export_minio_manifest_store_to_file(manifest_file)
+            else:
+                self.update_minio_manifest_file(manifest_file)
+        if chunked or checkpoint_file:
+            return self.index_manifest_in_batches(manifest_file, checkpoint_file=checkpoint_file, report_file=report_file)
         indexd_manifest = index_object_manifest(
             commons_url=self.gen3_commons_url,
             manifest_file=manifest_file,
-            thread_num=8,
+            thread_num=self.indexing_threads,
             auth=auth,
             replace_urls=True,
             manifest_file_delimiter="\t", # put "," if the manifest is a CSV file
@@ -277,31 +789,160 @@ class Gen3MinioClient:
 
         print(indexd_manifest)
     
+    # Indexes the manifest 'indexing_batch_size' rows at a time, with
+    # 'indexing_batch_workers' batches in flight, each indexed by
+    # 'index_object_manifest' on 'indexing_threads' threads. Rows are only
+    # recorded in the SQLite 'checkpoint_file' ('<manifest>.indexing.sqlite'
+    # by default) once indexd is seen to have them, and recorded rows are
+    # skipped, so a failed run is resumed by running it again. A report with
+    # the throughput of every batch is written to 'report_file'.
+    def index_manifest_in_batches(self, manifest_file: str, checkpoint_file=None, report_file=None):
+        from gen3.tools.indexing.index_manifest import index_object_manifest
+        auth = self.get_gen3_auth()
+        checkpoint = IndexingCheckpoint(checkpoint_file or f"{manifest_file}.indexing.sqlite")
+        with tempfile.TemporaryDirectory(prefix="gen3minioclient-indexing-") as directory:
+            def index_batch(batch_number, rows):
+                batch_file = os.path.join(directory, f"batch-{batch_number}.tsv")
+                with open(batch_file, "w") as f:
+                    writer = DictWriter(f, fieldnames=self.MANIFEST_FIELDS, delimiter="\t", extrasaction="ignore")
+                    writer.writeheader()
+                    writer.writerows(rows)
+                files, _ = index_object_manifest(
+                    commons_url=self.gen3_commons_url,
+                    manifest_file=batch_file,
+                    thread_num=self.indexing_threads,
+                    auth=auth,
+                    replace_urls=True,
+                    manifest_file_delimiter="\t",
+                    output_filename=os.path.join(directory, f"batch-{batch_number}-output.csv"),
+                    submit_additional_metadata_columns=False,
+                )
+                return self.get_indexed_manifest_rows(rows, files or [])
+            
+            summary = index_in_batches(
+                self.iter_minio_manifest_file(manifest_file),
+                index_batch,
+                checkpoint,
+                batch_size=self.indexing_batch_size,
+                batch_workers=self.indexing_batch_workers,
+                report_file=report_file,
+            )
+        checkpoint.close()
+        print(f"Indexed {summary['indexed']} rows in {summary['batches']} batches, skipped {summary['skipped']} rows indexed by an earlier run and {summary['failed']} rows failed.")
+        return summary
+    
+    # The manifest rows of a batch that indexd now has with the same md5.
+    # 'index_object_manifest' logs failed rows rather than raising, so each
+    # row is looked up instead of trusting its return value. Rows without a
+    # guid are matched to the record it created by md5.
+    def get_indexed_manifest_rows(self, rows, files):
+        indexd_client = self.get_indexd_client()
+        created_guids = {file.get("md5"): file.get("guid") for file in files if file.get("guid")}
+        
+        def is_indexed(row):
+            guid = row.get("guid") or created_guids.get(row.get("md5"))
+            if not guid:
+                return False
+            response = indexd_client.get_record(guid)
+            return response.status_code == 200 and (response.json().get("hashes") or {}).get("md5") == row.get("md5")
+        
+        with ThreadPoolExecutor(max_workers=self.indexing_threads) as executor:
+            return [row for row, indexed in zip(rows, executor.map(is_indexed, rows)) if indexed]
+    
+    # Streams indexd records page by page; see 'iter_indexd_records'
+    def iter_indexd_records(self, page_size: int = DEFAULT_RECORD_PAGE_SIZE, read_ahead: int = DEFAULT_RECORD_READ_AHEAD, uploader=None, authz=None, url_prefix=None, compact: bool = True):
+        return iter_indexd_records(
+            self.get_indexd_client(),
+            page_size=page_size,
+            read_ahead=read_ahead,
+            uploader=uploader,
+            authz=authz,
+            url_prefix=url_prefix,
+            compact=compact,
+        )
+    
+    # Holds every record in memory, so prefer 'iter_indexd_records' for
+    # anything but small commons
     def get_all_records(self):
-        auth = Gen3Auth(refresh_file=self.gen3_credentials)
-        gen3_index = Gen3Index(auth)
-        gen3_index_records = gen3_index.get_all_records()
-        print(gen3_index_records)
+        gen3_index_records = list(self.iter_indexd_records(compact=False))
+        print(f"Fetched {len(gen3_index_records)} indexd records.")
         return gen3_index_records
+    
+    # Writes the matching indexd records to a TSV manifest as they are
+    # fetched, without holding them all in memory
+    def export_indexd_records(self, output_file: str, page_size: int = DEFAULT_RECORD_PAGE_SIZE, read_ahead: int = DEFAULT_RECORD_READ_AHEAD, uploader=None, authz=None, url_prefix=None):
+        number_of_records = 0
+        with open(output_file, "w") as f:
+            writer = DictWriter(f, fieldnames=self.MANIFEST_FIELDS, delimiter="\t")
+            writer.writeheader()
+            for record in self.iter_indexd_records(page_size=page_size, read_ahead=read_ahead, uploader=uploader, authz=authz, url_prefix=url_prefix):
+                writer.writerow(record_to_manifest_row(record))
+                number_of_records += 1
+        print(f"Exported {number_of_records} indexd records to '{output_file}'.")
+        return number_of_records
+    
+    # Reconciliation entries (see 'reconciliation.ENTRY_FIELDS') of the three
+    # sources, keyed by object name so that 'https://' and 's3://' URLs of the
+    # same object match
+    def iter_bucket_reconciliation_entries(self, prefix: str = ""):
+        for obj in self.iter_minio_listing(prefix=prefix or None, ordered=False):
+            yield (obj.object_name, "", str(obj.etag).strip('"'), obj.size, "", "")
+    
+    def iter_index_reconciliation_entries(self, prefix: str = ""):
+        for record in self.iter_indexd_records():
+            for url in record.urls:
+                object_name = get_object_name_from_url(url, self.minio_bucket_name)
+                if object_name and object_name.startswith(prefix):
+                    yield (object_name, record.did, record.md5 or "", "" if record.size is None else record.size, str(list(record.acl)), str(list(record.authz)))
+    
+    def iter_manifest_reconciliation_entries(self, manifest_file=None, prefix: str = ""):
+        rows = self.iter_minio_manifest_file(manifest_file) if manifest_file else self.get_manifest_store().iter_rows()
+        for row in rows:
+            for url in self.parse_manifest_list(row.get("urls")):
+                object_name = get_object_name_from_url(url, self.minio_bucket_name)
+                if object_name and object_name.startswith(prefix):
+                    yield (object_name, row.get("guid") or "", row.get("md5") or "", row.get("file_size") or "", row.get("acl") or "", row.get("authz") or "")
+    
+    # A manifest row that indexes an object found without an indexd record.
+    # The manifest's guid, acl and authz are kept when it has a row for the
+    # object. indexd needs a real md5, so objects only known by a multipart
+    # ETag are left out.
+    def create_reconciliation_repair_row(self, bucket_entry, manifest_entry=None):
+        md5_values = [manifest_entry["md5"] if manifest_entry else "", bucket_entry["md5"]]
+        md5 = next((md5 for md5 in md5_values if md5 and not is_multipart_etag(md5)), None)
+        if md5 is None:
+            return None
+        minio_object = self.create_object_record(bucket_entry["object_name"], md5, int(bucket_entry["size"]))
+        if manifest_entry:
+            minio_object["guid"] = manifest_entry["guid"] or minio_object["guid"]
+            minio_object["acl"] = self.parse_manifest_list(manifest_entry["acl"]) or minio_object["acl"]
+            minio_object["authz"] = self.parse_manifest_list(manifest_entry["authz"]) or minio_object["authz"]
+        return minio_object
+    
+    # Streams the bucket listing, every indexd record and the manifest (the
+    # TSV 'manifest_file', or the manifest store) and writes every object
+    # they disagree on to 'report_file'; see 'reconciliation.reconcile'.
+    # With 'repair_manifest_file', objects missing from indexd are also
+    # written as a manifest that 'create_indexd_manifest' can index.
+    def reconcile_bucket_index_and_manifest(self, report_file: str, manifest_file=None, repair_manifest_file=None, prefix: str = "", number_of_partitions: int = DEFAULT_RECONCILIATION_PARTITIONS):
+        summary = reconcile(
+            self.iter_bucket_reconciliation_entries(prefix=prefix),
+            self.iter_index_reconciliation_entries(prefix=prefix),
+            self.iter_manifest_reconciliation_entries(manifest_file=manifest_file, prefix=prefix),
+            report_file,
+            repair_manifest_file=repair_manifest_file,
+            create_repair_row=self.create_reconciliation_repair_row,
+            manifest_fields=self.MANIFEST_FIELDS,
+            number_of_partitions=number_of_partitions,
+        )
+        print(f"Reconciled {summary['bucket_entries']} bucket objects, {summary['index_entries']} indexd URLs and {summary['manifest_entries']} manifest URLs: {json.dumps(summary)}")
+        return summary
            
     def json_dumps(self, data):
         return json.dumps({k: v for (k, v) in data.items() if v is not None})
         
     def create_blank_index(self, file_name):
-        url = f"{self.gen3_commons_url}/index/index/blank"
-        json = {"uploader": self.gen3_username, "file_name": file_name}
-        data = self.json_dumps(json)
-        access_token = self.get_gen3_commons_access_token()
-        headers = {
-            "content-type": "application/json",
-            "Authorization": f"Bearer {access_token}"
-        }
-        response = requests.post(
-            url,
-            data=data,
-            headers=headers,
-            verify=False,
-        )
+        response = self.get_indexd_client().create_blank_record(self.gen3_username, file_name)
         
         # The response.text has the following structure:
         # {
@@ -312,124 +953,455 @@ class Gen3MinioClient:
         
         return response
         
+    # Raises for an error response, so that the record is never taken to be
+    # filled in (and the journal never moves past the upload) when it is not
     def update_blank_index(self, did, rev, minio_object):
-        url = f"{self.gen3_commons_url}/index/index/blank/{did}"
-        
-        access_token = self.get_gen3_commons_access_token()
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {access_token}"
-        }
-        params = {"rev": rev}
-        json = {
-            "hashes": {
-                "md5": minio_object["md5"]
-            },
-            "size": minio_object["file_size"]
+        hashes = {
+            "md5": minio_object["md5"]
         }
-        # if minio_object["urls"]:
-        #     json["urls"] = minio_object["urls"]
-        # if minio_object["acl"]:
-        #     json["authz"] = minio_object["acl"]
-        # if minio_object["authz"]:
-        #     json["authz"] = minio_object["authz"]
-        data = self.json_dumps(json)
-
-        response = requests.put(
-            url,
-            data=data,
-            params=params,
-            # auth=auth,
-            headers=headers,
-            verify=False,
+        # urls=minio_object["urls"] and authz=minio_object["authz"] can also
+        # be passed once indexd is configured to accept them on blank records
+        response = self.get_indexd_client().update_blank_record(
+            did,
+            rev,
+            hashes=hashes,
+            size=minio_object["file_size"],
         )
         
         print(response)
+        response.raise_for_status()
+        return response
     
     def get_gen3_presigned_url(self, guid):
-        auth = Gen3Auth(refresh_file=self.gen3_credentials)
+        from gen3.file import Gen3File
+        auth = self.get_gen3_auth()
         gen3_file = Gen3File(endpoint=self.gen3_commons_url, auth_provider=auth)
         gen3_presigned_url = gen3_file.get_presigned_url(guid)
         return gen3_presigned_url
         
     def delete_record_by_guid(self, guid, rev):
-        auth = Gen3Auth(refresh_file=self.gen3_credentials)
-        url = f"{self.gen3_commons_url}/index/index/{guid}"
-        params = {"rev": rev}
-        headers = {
-            "Content-Type": "application/json",
-        }
+        response = None
         try:
             print(f"Deleting file with GUID '{guid}' and rev '{rev}'...")
-            response = requests.delete(
-                url,
-                params=params,
-                auth=auth,
-                headers=headers,
-                verify=False,
-            )
-        except:
-            print(f"Failed to delete file with GUID '{guid}'")
+            response = self.get_indexd_client().delete_record(guid, rev)
+        except Exception as e:
+            print(f"Failed to delete file with GUID '{guid}': {e}")
         
         print(response)
+        return response
+    
+    # Deletes the indexd records of many GUIDs (given directly and/or as the
+    # 'guid' column of a manifest) concurrently, then removes their objects
+    # from MinIO in multi-object delete batches. Objects are found from the
+    # record and manifest URLs, or by listing '<guid>/' when there are none.
+    # An object is only removed once its record is gone, so a failure never
+    # leaves a record pointing at a missing object. Returns one result per GUID.
+    def delete_records_and_objects(self, guids=None, manifest_file=None, delete_objects: bool = True, max_connections: int = DEFAULT_MAX_CONNECTIONS, batch_size: int = DEFAULT_DELETE_BATCH_SIZE, report_file=None):
+        from gen3minioclient.async_client import AsyncGen3MinioClient
+        
+        guids = list(guids or [])
+        manifest_object_names = {}
+        if manifest_file:
+            for row in self.iter_minio_manifest_file(manifest_file):
+                guids.append(row["guid"])
+                object_names = [get_object_name_from_url(url, self.minio_bucket_name) for url in self.parse_manifest_list(row.get("urls"))]
+                manifest_object_names.setdefault(row["guid"], set()).update(object_name for object_name in object_names if object_name)
+        guids = list(dict.fromkeys(guids))
+        
+        async def delete_records():
+            async with AsyncGen3MinioClient(self, max_connections=max_connections) as async_client:
+                return await async_client.delete_records(guids)
+        record_results = asyncio.run(delete_records())
+        
+        object_names_by_guid = {}
+        if delete_objects:
+            for guid in guids:
+                record_result = record_results[guid]
+                if record_result["status"] == "failed":
+                    continue
+                object_names = set(manifest_object_names.get(guid, ()))
+                object_names.update(get_object_name_from_url(url, self.minio_bucket_name) for url in record_result["urls"])
+                object_names.discard(None)
+                object_names_by_guid[guid] = sorted(object_names)
+            unlisted_guids = [guid for guid, object_names in object_names_by_guid.items() if not object_names]
+            for prefix, object_names in list_objects_by_prefix(self.client, self.minio_bucket_name, [f"{guid}/" for guid in unlisted_guids]).items():
+                object_names_by_guid[prefix[:-1]] = object_names
+        
+        object_errors = remove_objects_in_batches(
+            self.client,
+            self.minio_bucket_name,
+            [object_name for object_names in object_names_by_guid.values() for object_name in object_names],
+            batch_size=batch_size,
+        )
+        
+        delete_results = []
+        for guid in guids:
+            record_result = record_results[guid]
+            object_names = object_names_by_guid.get(guid)
+            errors = [f"{object_name}: {object_errors[object_name]}" for object_name in object_names or () if object_name in object_errors]
+            if object_names is None:
+                object_status = "skipped"
+            elif not object_names:
+                object_status = "none"
+            else:
+                object_status = "failed" if errors else "deleted"
+            delete_results.append({
+                "guid": guid,
+                "rev": record_result["rev"],
+                "record_status": record_result["status"],
+                "object_names": object_names or [],
+                "object_status": object_status,
+                "error": "; ".join(filter(None, [record_result["error"], *errors])) or None,
+            })
+        
+        if self.manifest_store_location:
+            self.get_manifest_store().delete_rows(result["guid"] for result in delete_results if result["record_status"] != "failed")
+        if report_file:
+            write_delete_report(report_file, delete_results)
+        print(f"Bulk delete finished: {summarise_delete_results(delete_results)}")
+        return delete_results
         
         
-    def upload_file_and_update_record(self, file_path: str, old_manifest_file):
+    def get_multipart_uploader(self):
+        return MultipartUploader(
+            self.client,
+            self.minio_bucket_name,
+            part_size=self.multipart_part_size,
+            max_workers=self.multipart_workers,
+            part_retries=self.multipart_part_retries,
+        )
+    
+    # Pre-registers blank records for a whole batch of files concurrently and
+    # returns {file_path: {"did": ..., "rev": ...}} for 'reserved_records'
+    def reserve_blank_records(self, file_paths, max_connections: int = DEFAULT_MAX_CONNECTIONS):
+        from gen3minioclient.async_client import AsyncGen3MinioClient
+        
+        async def reserve():
+            async with AsyncGen3MinioClient(self, max_connections=max_connections) as async_client:
+                return await async_client.reserve_blank_records(file_paths)
+        return asyncio.run(reserve())
+    
+    def update_blank_records(self, records, max_connections: int = DEFAULT_MAX_CONNECTIONS):
+        from gen3minioclient.async_client import AsyncGen3MinioClient
+        
+        async def update():
+            async with AsyncGen3MinioClient(self, max_connections=max_connections) as async_client:
+                return await async_client.update_blank_records(records)
+        return asyncio.run(update())
+    
+    # Deletes blank records that were reserved but never used, e.g. because
+    # their file turned out to be a duplicate of an object already in the
+    # bucket. Returns the result of 'delete_records' for each did.
+    def release_blank_records(self, dids, max_connections: int = DEFAULT_MAX_CONNECTIONS):
+        from gen3minioclient.async_client import AsyncGen3MinioClient
+        
+        async def release():
+            async with AsyncGen3MinioClient(self, max_connections=max_connections) as async_client:
+                return await async_client.delete_records(dids)
+        return asyncio.run(release())
+    
+    # Runs the per-file pipeline (hash, existence check, blank record, upload
+    # and index update) and returns a result describing how far the file got.
+    # The manifest is only updated when 'old_manifest_file' is provided, so
+    # that bulk uploads can write a single aggregated update at the end.
+    # 'multipart' switches between a plain 'fput_object' and the concurrent
+    # multipart engine; when it is None the client's 'multipart_upload' setting
+    # is used. With a 'journal', every completed stage is recorded and a
+    # re-run continues from the last completed stage instead of starting over.
+    # A 'reserved_record' ({"did", "rev"}) from 'reserve_blank_records' is used
+    # instead of creating a new blank record.
+    def upload_file(self, file_path: str, old_manifest_file=None, multipart=None, journal=None, reserved_record=None):
+        if multipart is None:
+            multipart = self.multipart_upload
         print("Extracting file name from file path...")
         upload_path = Path(file_path)
         file_name = upload_path.name
-        size_of_file = self.calculate_size_of_file(file_path)
         print(f"Name of file to be uploaded: '{file_name}'.")
+        upload_result = {
+            "file_path": file_path,
+            "file_name": file_name,
+            "status": "failed",
+            "stage": "hashing",
+            "did": None,
+            "rev": None,
+            "md5": None,
+            "file_size": None,
+            "error": None,
+            "minio_object": None,
+        }
         
-        print("Checking if file already exists in MinIO bucket...")
-        file_exists = self.check_if_object_is_in_minio_bucket(file_name)
-        if file_exists:
-            print(f"File '{file_name}' already exists in MinIO bucket. Process stopped.")
-            return f"File '{file_name}' already exists in MinIO bucket. Process stopped."
+        entry = journal.get(file_path) if journal else None
         try:
-            print(f"Creating blank record for '{file_name}'...")
-            blank_index_response = self.create_blank_index(file_name)
-            blank_index_json_response = blank_index_response.json()
-            did = str(blank_index_json_response["did"])
-            rev = str(blank_index_json_response["rev"])
+            if has_reached_stage(entry, STAGE_HASHED) and not has_reached_stage(entry, STAGE_INDEX_UPDATED) and not journal.is_file_unchanged(entry, file_path):
+                print(f"File '{file_name}' has changed since it was hashed. Starting its upload again...")
+                journal.reset_file_contents(file_path)
+                entry = journal.get(file_path)
+            
+            # Digests from an earlier run that used another upload mode or part
+            # size have an ETag this run would not produce, so they are thrown
+            # away (keeping the blank record) and the file is hashed again
+            if entry and entry["digests"] and not has_reached_stage(entry, STAGE_UPLOADED) and entry["digests"]["part_size"] != self.get_upload_part_size(entry["digests"]["file_size"], multipart):
+                print(f"File '{file_name}' was hashed for a different part size. Hashing it again...")
+                journal.reset_file_contents(file_path)
+                entry = journal.get(file_path)
+            
+            # An entry can be past the hashing stage without digests, when
+            # they were thrown away after the blank record had been created
+            if entry and entry["digests"]:
+                file_digests = entry["digests"]
+            else:
+                print("Calculating size and checksums of file...")
+                file_stat = os.stat(file_path)
+                if multipart:
+                    check_multipart_part_size(file_stat.st_size, self.get_multipart_uploader().part_size)
+                with self.metrics.time_phase("hashing") as phase:
+                    file_digests, cached = self.get_file_digests(file_path, part_size=self.get_multipart_uploader().part_size if multipart else 0)
+                    if not cached:
+                        phase["bytes"] = file_digests["file_size"]
+                if journal:
+                    stage = entry["stage"] if has_reached_stage(entry, STAGE_HASHED) else STAGE_HASHED
+                    journal.record_stage(file_path, stage, digests=file_digests, file_size=file_stat.st_size, file_mtime_ns=file_stat.st_mtime_ns)
+            upload_result["md5"] = file_digests["md5"]
+            upload_result["file_size"] = file_digests["file_size"]
+            
+            if has_reached_stage(entry, STAGE_BLANK_RECORD_CREATED):
+                did = entry["did"]
+                rev = entry["rev"]
+                print(f"Reusing blank record with did '{did}' and rev '{rev}' for '{file_name}'...")
+            else:
+                upload_result["stage"] = "existence check"
+                print("Checking if file already exists in MinIO bucket...")
+                with self.metrics.time_phase("existence_check"):
+                    file_exists = self.check_if_object_is_in_minio_bucket(file_name)
+                    content_exists = not file_exists and self.skip_duplicate_content and self.check_if_content_is_in_minio_bucket(file_digests)
+                if file_exists:
+                    print(f"File '{file_name}' already exists in MinIO bucket. Process stopped.")
+                    upload_result["status"] = "skipped"
+                    upload_result["error"] = f"File '{file_name}' already exists in MinIO bucket."
+                    self.metrics.increment("uploads_total", status="skipped")
+                    return upload_result
+                if content_exists:
+                    print(f"A file with the same md5 as '{file_name}' already exists in MinIO bucket. Process stopped.")
+                    upload_result["status"] = "skipped"
+                    upload_result["error"] = f"A file with md5 '{file_digests['md5']}' already exists in MinIO bucket."
+                    self.metrics.increment("uploads_total", status="skipped")
+                    return upload_result
+                
+                if reserved_record:
+                    did = reserved_record["did"]
+                    rev = reserved_record["rev"]
+                    print(f"Using reserved blank record with did '{did}' and rev '{rev}' for '{file_name}'...")
+                else:
+                    upload_result["stage"] = "blank index"
+                    print(f"Creating blank record for '{file_name}'...")
+                    with self.metrics.time_phase("blank_index"):
+                        blank_index_response = self.create_blank_index(file_name)
+                        blank_index_json_response = blank_index_response.json()
+                    did = str(blank_index_json_response["did"])
+                    rev = str(blank_index_json_response["rev"])
+                if journal:
+                    journal.record_stage(file_path, STAGE_BLANK_RECORD_CREATED, did=did, rev=rev)
+            upload_result["did"] = did
+            upload_result["rev"] = rev
             path_in_minio_bucket = os.path.join(did, file_name)
             
-            try:
+            if has_reached_stage(entry, STAGE_UPLOADED):
+                minio_object = entry["minio_object"]
+            else:
+                upload_result["stage"] = "upload"
                 print("Uploading file to MinIO bucket...")
-                result = self.client.fput_object(
-                    bucket_name=self.minio_bucket_name, 
-                    object_name=path_in_minio_bucket, 
-                    file_path=file_path,
-                )
+                with self.metrics.time_phase("minio_put") as phase:
+                    if multipart:
+                        etag = self.upload_file_in_parts(file_path, path_in_minio_bucket, journal=journal)
+                    else:
+                        result = self.client.fput_object(
+                            bucket_name=self.minio_bucket_name, 
+                            object_name=path_in_minio_bucket, 
+                            file_path=file_path,
+                            part_size=file_digests["part_size"],
+                        )
+                        etag = str(result.etag).strip('"')
+                    phase["bytes"] = file_digests["file_size"]
                 
+                if etag != file_digests["etag"]:
+                    # The object cannot be trusted (e.g. the file changed while
+                    # it was being uploaded), so it is removed and the file is
+                    # hashed and uploaded again from scratch on the next run
+                    self.client.remove_object(self.minio_bucket_name, path_in_minio_bucket)
+                    if journal:
+                        journal.reset_file_contents(file_path)
+                    raise ValueError(f"ETag '{etag}' returned by MinIO does not match the locally calculated ETag '{file_digests['etag']}'")
+
                 minio_object = {
                     "guid": str(uuid4()),
                     "file_name": file_name,
-                    "md5": str(result.etag,).strip('"'),
-                    "file_size": size_of_file,
-                    "acl": ["*"],
-                    "authz": ["/programs/gen3Program502/projects/P502"],
+                    "md5": file_digests["md5"],
+                    "file_size": file_digests["file_size"],
+                    "acl": list(DEFAULT_OBJECT_ACL),
+                    "authz": list(DEFAULT_OBJECT_AUTHZ),
                     "urls": [f"https://{self.minio_api_endpoint}/{self.minio_bucket_name}/{path_in_minio_bucket}"],
                 }
+                if journal:
+                    journal.record_stage(file_path, STAGE_UPLOADED, object_name=path_in_minio_bucket, minio_object=minio_object)
                 print(minio_object)
-                print(f"Object '{minio_object["file_name"]}' has been uploaded")
-            except:
-                print(f"Failed to upload file '{minio_object["file_name"]}'")
+                print(f"Object '{file_name}' has been uploaded")
+            upload_result["minio_object"] = minio_object
+            self.add_object_to_name_index(file_name, minio_object["md5"])
             
-            print("Updating manifest with metadata about newly uploaded minio object...")
-            self.update_minio_manifest_file(old_manifest_file)
+            if old_manifest_file and not (entry and entry["manifest_updated"]):
+                upload_result["stage"] = "manifest update"
+                print("Updating manifest with metadata about newly uploaded minio object...")
+                with self.metrics.time_phase("manifest_update"):
+                    self.update_minio_manifest_file(old_manifest_file)
+                if journal:
+                    journal.mark_manifest_updated([file_path])
             
-            try:
-                if did and rev:
-                    print(f"Updating indexd database record for uploaded file with did '{did}' and rev '{rev}'...")
+            if not has_reached_stage(entry, STAGE_INDEX_UPDATED):
+                upload_result["stage"] = "index update"
+                print(f"Updating indexd database record for uploaded file with did '{did}' and rev '{rev}'...")
+                with self.metrics.time_phase("index_update"):
                     self.update_blank_index(did, rev, minio_object)
-            except:
-                print(f"Failed to update blank index with GUID of '{minio_object["file_name"]}'.")
-        except:
-            print(f"Failed to create blank index for file '{file_name}'.")
-               
+                if journal:
+                    journal.record_stage(file_path, STAGE_INDEX_UPDATED)
+        except Exception as e:
+            print(f"Failed at stage '{upload_result['stage']}' for file '{file_name}': {e}")
+            upload_result["error"] = str(e)
+            if journal:
+                journal.record_error(file_path, f"{upload_result['stage']}: {e}")
+            self.metrics.increment("uploads_total", status="failed")
+            return upload_result
+        
+        upload_result["status"] = "uploaded"
+        upload_result["stage"] = "done"
+        self.metrics.increment("uploads_total", status="uploaded")
+        return upload_result
+    
+    # The part size the ETag of a 'file_size' byte file is calculated with,
+    # for this client's multipart setting or 'fput_object'
+    def get_upload_part_size(self, file_size: int, multipart: bool):
+        part_size, _ = get_minio_part_size(file_size, self.get_multipart_uploader().part_size if multipart else 0)
+        return part_size
+    
+    # Multipart upload that records its upload id and every finished part in
+    # the journal, and picks up already-uploaded parts when it is resumed
+    def upload_file_in_parts(self, file_path: str, path_in_minio_bucket: str, journal=None):
+        from minio.error import S3Error
+        multipart_uploader = self.get_multipart_uploader()
+        if journal is None:
+            return multipart_uploader.upload_file(file_path, path_in_minio_bucket)["etag"]
+        
+        entry = journal.get(file_path)
+        upload_id = entry["upload_id"] if entry["object_name"] == path_in_minio_bucket else None
+        completed_parts = journal.get_parts(file_path) if upload_id else {}
+        if completed_parts:
+            print(f"Resuming multipart upload of '{path_in_minio_bucket}' with {len(completed_parts)} parts already uploaded...")
+        try:
+            result = multipart_uploader.upload_file(
+                file_path,
+                path_in_minio_bucket,
+                upload_id=upload_id,
+                completed_parts=completed_parts,
+                on_upload_created=lambda new_upload_id: journal.record_upload_id(file_path, path_in_minio_bucket, new_upload_id),
+                on_part_uploaded=lambda part_upload_id, part: journal.record_part(file_path, part_upload_id, part),
+                abort_on_failure=False,
+            )
+        except S3Error as e:
+            # The server may have expired or aborted the upload in the meantime
+            if e.code != "NoSuchUpload" or upload_id is None:
+                raise
+            print(f"Multipart upload '{upload_id}' no longer exists. Starting the upload of '{path_in_minio_bucket}' again...")
+            journal.clear_parts(file_path)
+            return self.upload_file_in_parts(file_path, path_in_minio_bucket, journal=journal)
+        return result["etag"]
+    
+    def upload_file_and_update_record(self, file_path: str, old_manifest_file, multipart=None, journal_file=None):
+        self.load_minio_object_name_index(old_manifest_file, list_bucket=self.list_bucket_for_existence_check)
+        journal = UploadJournal(journal_file) if journal_file else None
+        upload_result = self.upload_file(file_path, old_manifest_file=old_manifest_file, multipart=multipart, journal=journal)
+        file_name = upload_result["file_name"]
+        if upload_result["status"] == "skipped":
+            return f"File '{file_name}' already exists in MinIO bucket. Process stopped."
+        if upload_result["status"] == "failed":
+            return f"Failed at stage '{upload_result['stage']}' for file '{file_name}': {upload_result['error']}"
         return f"File '{file_name}' uploaded successfully and indexd database records updated."
     
+    # Runs the per-file upload pipeline across a pool of workers, keeping the
+    # total size of files being hashed/uploaded at once below 'max_in_flight_bytes'.
+    # The manifest is updated once at the end with all of the uploaded objects.
+    def upload_files_and_update_records(self, file_paths, old_manifest_file, max_workers: int = DEFAULT_UPLOAD_WORKERS, max_in_flight_bytes: int = DEFAULT_MAX_IN_FLIGHT_BYTES, report_file=None, multipart=None, journal_file=None, reserved_records=None, reserve_blank_records: bool = False, max_connections: int = DEFAULT_MAX_CONNECTIONS):
+        self.load_minio_object_name_index(old_manifest_file, list_bucket=self.list_bucket_for_existence_check)
+        journal = UploadJournal(journal_file) if journal_file else None
+        reserved_records = dict(reserved_records or {})
+        if reserve_blank_records:
+            # Only files that will actually need a new blank record: not already
+            # in the bucket, not already reserved and not past that stage in the journal
+            file_paths_to_reserve = [
+                file_path for file_path in file_paths
+                if file_path not in reserved_records
+                and not has_reached_stage(journal.get(file_path) if journal else None, STAGE_BLANK_RECORD_CREATED)
+                and not self.check_if_object_is_in_minio_bucket(Path(file_path).name)
+            ]
+            print(f"Reserving blank records for {len(file_paths_to_reserve)} files...")
+            newly_reserved_records = self.reserve_blank_records(file_paths_to_reserve, max_connections=max_connections)
+            reserved_records.update(newly_reserved_records)
+        print(f"Uploading {len(file_paths)} files with {max_workers} workers...")
+        upload_results = upload_files_in_parallel(
+            lambda file_path: self.upload_file(file_path, multipart=multipart, journal=journal, reserved_record=reserved_records.get(file_path)),
+            file_paths,
+            max_workers=max_workers,
+            max_in_flight_bytes=max_in_flight_bytes,
+        )
+        
+        if reserve_blank_records:
+            # Files that were skipped as duplicates (or failed before reaching
+            # the blank record stage) never used their reserved record
+            unused_dids = [
+                newly_reserved_records[result["file_path"]]["did"] for result in upload_results
+                if result["file_path"] in newly_reserved_records and result.get("did") is None
+            ]
+            if unused_dids:
+                print(f"Deleting {len(unused_dids)} unused reserved blank records...")
+                self.release_blank_records(unused_dids, max_connections=max_connections)
+        
+        if journal:
+            # Includes files from earlier, interrupted runs whose objects were
+            # uploaded but never made it into the manifest
+            entries = journal.get_entries_awaiting_manifest_update()
+            uploaded_minio_objects = [entry["minio_object"] for entry in entries]
+        else:
+            uploaded_minio_objects = [result["minio_object"] for result in upload_results if result["minio_object"]]
+        if uploaded_minio_objects:
+            print(f"Adding {len(uploaded_minio_objects)} uploaded objects to manifest file...")
+            with self.metrics.time_phase("manifest_update") as phase:
+                self.append_minio_objects_to_manifest_file(old_manifest_file, uploaded_minio_objects)
+                phase["items"] = len(uploaded_minio_objects)
+            if journal:
+                journal.mark_manifest_updated([entry["file_path"] for entry in entries])
+        
+        if report_file:
+            write_upload_report(report_file, upload_results)
+            print(f"Wrote upload report to '{report_file}'.")
+        
+        summary = summarise_upload_results(upload_results)
+        print(summary)
+        return upload_results
+    
+    # Continues every file in the journal that did not finish, each from its
+    # last completed stage
+    def resume_uploads(self, journal_file: str, old_manifest_file, **kwargs):
+        journal = UploadJournal(journal_file)
+        file_paths = journal.get_incomplete_file_paths()
+        print(f"Resuming {len(file_paths)} incomplete uploads from journal '{journal_file}'...")
+        return self.upload_files_and_update_records(file_paths, old_manifest_file, journal_file=journal_file, **kwargs)
+    
+    def upload_directory_and_update_records(self, upload_dir: str, old_manifest_file, **kwargs):
+        file_paths = collect_file_paths_from_directory(upload_dir)
+        return self.upload_files_and_update_records(file_paths, old_manifest_file, **kwargs)
+    
+    def upload_file_list_and_update_records(self, upload_list_file: str, old_manifest_file, **kwargs):
+        file_paths = collect_file_paths_from_list(upload_list_file)
+        return self.upload_files_and_update_records(file_paths, old_manifest_file, **kwargs)
+    
     # download data of an object from MinIO bucket
     def download_file_from_minio_bucket(self, minio_object_name: str, prefix: str, guid: str, file_path: str):
         minio_download_path = f"/{prefix}/{guid}/{minio_object_name}"
@@ -439,8 +1411,153 @@ class Gen3MinioClient:
             file_path=file_path
         )
         return f"Downloaded MinIO object {minio_object_name} to {file_path} from bucket {self.minio_bucket_name}."
+    
+    def get_ranged_downloader(self):
+        return RangedDownloader(
+            self.client,
+            self.minio_bucket_name,
+            range_size=self.download_range_size,
+            max_workers=self.download_range_workers,
+        )
+    
+    def create_download_request(self, row):
+        object_names = [get_object_name_from_url(url, self.minio_bucket_name) for url in self.parse_manifest_list(row.get("urls"))]
+        object_names = [object_name for object_name in object_names if object_name]
+        return {
+            "guid": row.get("guid"),
+            "file_name": row.get("file_name"),
+            "object_name": object_names[0] if object_names else None,
+            "md5": row.get("md5"),
+            "file_size": int(row["file_size"]) if row.get("file_size") not in (None, "") else None,
+        }
+    
+    # Looks a GUID up in the manifest store (if configured), then in indexd.
+    # Records created by 'upload_file' keep their object under '<did>/<file name>',
+    # so a record without URLs is found by listing that prefix.
+    def resolve_download_request_for_guid(self, guid: str):
+        if self.manifest_store_location:
+            row = self.get_manifest_store().get_by_guid(guid)
+            if row:
+                return self.create_download_request(row)
+        response = self.get_indexd_client().get_record(guid)
+        if response.status_code != 200:
+            return {"guid": guid, "file_name": None, "object_name": None, "md5": None, "file_size": None}
+        record = response.json()
+        download_request = self.create_download_request({
+            "guid": guid,
+            "file_name": record.get("file_name"),
+            "md5": (record.get("hashes") or {}).get("md5"),
+            "file_size": record.get("size"),
+            "urls": record.get("urls"),
+        })
+        if download_request["object_name"] is None:
+            for obj in self.client.list_objects(self.minio_bucket_name, prefix=f"{guid}/", recursive=True):
+                download_request["object_name"] = obj.object_name
+                download_request["file_name"] = download_request["file_name"] or Path(obj.object_name).name
+                break
+        return download_request
+    
+    def get_download_requests(self, manifest_file=None, guids=None):
+        download_requests = []
+        if manifest_file:
+            guid_filter = set(guids) if guids else None
+            for row in self.iter_minio_manifest_file(manifest_file):
+                if guid_filter is None or row.get("guid") in guid_filter:
+                    download_requests.append(self.create_download_request(row))
+            if guid_filter:
+                found_guids = {download_request["guid"] for download_request in download_requests}
+                download_requests.extend(self.resolve_download_request_for_guid(guid) for guid in guids if guid not in found_guids)
+        elif guids:
+            download_requests = [self.resolve_download_request_for_guid(guid) for guid in guids]
+        return download_requests
+    
+    def get_download_file_name(self, download_request):
+        return (
+            get_safe_file_name(download_request["file_name"])
+            or get_safe_file_name(download_request["object_name"])
+            or get_safe_file_name(download_request["guid"])
+        )
+    
+    # Downloads one manifest entry into 'output_dir', skipping it when a local
+    # copy with the same md5 and size is already there, and verifying the
+    # downloaded file against the manifest before reporting success. Entries
+    # without a GUID, or whose file would end up outside 'output_dir', are refused.
+    def download_file(self, download_request, output_dir: str):
+        file_name = self.get_download_file_name(download_request)
+        file_path = download_request.get("file_path") or os.path.join(output_dir, file_name or "")
+        download_result = {
+            **download_request,
+            "file_name": file_name,
+            "file_path": file_path,
+            "status": "failed",
+            "error": None,
+        }
+        part_sizes = (self.multipart_part_size,)
+        try:
+            if not download_request["guid"]:
+                download_result["error"] = f"Manifest entry for '{file_name}' has no GUID."
+                return download_result
+            if download_request["object_name"] is None:
+                download_result["error"] = f"No MinIO object found for GUID '{download_request['guid']}'."
+                return download_result
+            if file_name is None or not is_path_within_directory(file_path, output_dir):
+                download_result["error"] = f"Refusing to download GUID '{download_request['guid']}' to '{file_path}', which is outside '{output_dir}'."
+                return download_result
+            
+            if os.path.exists(file_path) and verify_file_digests(file_path, download_request["md5"], download_request["file_size"], part_sizes):
+                download_result["status"] = "skipped"
+                return download_result
+            
+            print(f"Downloading '{download_request['object_name']}' to '{file_path}'...")
+            with self.metrics.time_phase("minio_get") as phase:
+                phase["bytes"] = self.get_ranged_downloader().download_object(download_request["object_name"], file_path, download_request["file_size"])
+            with self.metrics.time_phase("verification") as phase:
+                is_verified = verify_file_digests(file_path, download_request["md5"], download_request["file_size"], part_sizes)
+                phase["bytes"] = os.path.getsize(file_path)
+            if not is_verified:
+                os.remove(file_path)
+                download_result["error"] = f"Downloaded file '{file_path}' does not match the md5/size in the manifest."
+                return download_result
+            download_result["status"] = "downloaded"
+        except Exception as e:
+            download_result["error"] = str(e)
+        return download_result
+    
+    # Downloads every entry of a manifest (or only the given GUIDs) with
+    # 'max_workers' objects in flight, each split into parallel ranged GETs
+    def download_files(self, manifest_file=None, guids=None, output_dir: str = ".", max_workers: int = DEFAULT_DOWNLOAD_WORKERS, report_file=None):
+        download_requests = self.get_download_requests(manifest_file=manifest_file, guids=guids)
+        # Entries sharing a file name are kept apart in per-GUID directories
+        file_name_counts = {}
+        for download_request in download_requests:
+            file_name = self.get_download_file_name(download_request)
+            file_name_counts[file_name] = file_name_counts.get(file_name, 0) + 1
+        for download_request in download_requests:
+            file_name = self.get_download_file_name(download_request)
+            # Rows without a GUID are reported as failed by 'download_file'
+            if file_name and file_name_counts[file_name] > 1 and download_request["guid"]:
+                download_request["file_path"] = os.path.join(output_dir, download_request["guid"], file_name)
+        
+        print(f"Downloading {len(download_requests)} files with {max_workers} workers...")
+        download_results = download_objects_in_parallel(
+            lambda download_request: self.download_file(download_request, output_dir),
+            download_requests,
+            max_workers=max_workers,
+        )
+        for result in download_results:
+            if result["status"] == "failed":
+                print(f"Failed to download '{result['file_name']}': {result['error']}")
+        
+        if report_file:
+            write_download_report(report_file, download_results)
+            print(f"Wrote download report to '{report_file}'.")
+        
+        summary = summarise_download_results(download_results)
+        print(summary)
+        return download_results
                         
 if __name__ == '__main__':
+    configure_logging()
     gen3_minio_client = Gen3MinioClient()
     # gen3_minio_client.download_file_from_minio_bucket(
     #     minio_object_name="Essential_Microbiology.pdf",
@@ -0,0 +1,71 @@
+"""
+Persistent cache of local file digests for the gen3minioclient
+"""
+import json
+import os
+import sqlite3
+import time
+
+from gen3minioclient.hashing import calculate_file_digests
+from gen3minioclient.sqlite_connections import ThreadLocalSQLiteDatabase
+
+HASH_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_digests (
+    file_path TEXT NOT NULL,
+    part_size INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    file_size INTEGER NOT NULL,
+    file_mtime_ns INTEGER NOT NULL,
+    digests TEXT NOT NULL,
+    updated_at REAL,
+    PRIMARY KEY (file_path, part_size)
+);
+"""
+
+
+def get_file_signature(file_stat):
+    return (file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns)
+
+
+class HashCache(ThreadLocalSQLiteDatabase):
+    # Digests of local files keyed by absolute path and the part size their
+    # ETag was calculated with. An entry is only used while the file still has
+    # the inode, size and modification time it had when it was hashed, so
+    # a replaced or modified file is always hashed again.
+    def __init__(self, cache_file: str):
+        self.cache_file = cache_file
+        super().__init__(cache_file, HASH_CACHE_SCHEMA, row_factory=sqlite3.Row, synchronous="NORMAL")
+
+    def get(self, file_path: str, file_stat, part_size: int = 0, sha256: bool = False):
+        row = self.get_connection().execute(
+            "SELECT * FROM file_digests WHERE file_path = ? AND part_size = ?",
+            (file_path, part_size),
+        ).fetchone()
+        if row is None or (row["inode"], row["file_size"], row["file_mtime_ns"]) != get_file_signature(file_stat):
+            return None
+        digests = json.loads(row["digests"])
+        if sha256 and not digests.get("sha256"):
+            return None
+        return digests
+
+    def put(self, file_path: str, file_stat, digests, part_size: int = 0):
+        connection = self.get_connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO file_digests (file_path, part_size, inode, file_size, file_mtime_ns, digests, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (file_path, part_size, *get_file_signature(file_stat), json.dumps(digests), time.time()),
+            )
+
+    # Returns the digests of the file and whether they came from the cache
+    def get_file_digests(self, file_path: str, sha256: bool = False, part_size: int = 0):
+        file_path = os.path.abspath(file_path)
+        file_stat = os.stat(file_path)
+        digests = self.get(file_path, file_stat, part_size=part_size, sha256=sha256)
+        if digests is not None:
+            return digests, True
+        digests = calculate_file_digests(file_path, sha256=sha256, part_size=part_size)
+        # A file written to while it was being hashed is not cached, because
+        # the digests may not match what is on disk now
+        if get_file_signature(os.stat(file_path)) == get_file_signature(file_stat):
+            self.put(file_path, file_stat, digests, part_size=part_size)
+        return digests, False
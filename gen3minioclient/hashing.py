@@ -0,0 +1,110 @@
+"""
+Single-pass, bounded-memory hashing of local files for the gen3minioclient
+"""
+import hashlib
+import math
+import os
+
+# Same part-size rules the MinIO client applies in 'fput_object'
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PART_SIZE = 5 * 1024 * 1024 * 1024
+MAX_MULTIPART_COUNT = 10000
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+def get_minio_part_size(file_size: int, part_size: int = 0):
+    # Mirrors 'minio.helpers.get_part_info' so that the ETag we calculate
+    # locally matches the one MinIO returns after 'fput_object'
+    if part_size > 0:
+        part_size = min(part_size, file_size)
+    else:
+        part_size = math.ceil(math.ceil(file_size / MAX_MULTIPART_COUNT) / MIN_PART_SIZE) * MIN_PART_SIZE
+    part_count = math.ceil(file_size / part_size) if part_size else 1
+    return part_size, part_count
+
+
+# Raises ValueError when a file of 'file_size' bytes cannot be uploaded in
+# parts of 'part_size' bytes, before anything has been hashed or sent.
+# MinIO (like S3) takes at most 10000 parts of at most 5 GiB each.
+def check_multipart_part_size(file_size: int, part_size: int):
+    if part_size > MAX_PART_SIZE:
+        raise ValueError(f"Part size {part_size} is larger than the maximum of {MAX_PART_SIZE} bytes")
+    _, part_count = get_minio_part_size(file_size, part_size)
+    if part_count > MAX_MULTIPART_COUNT:
+        minimum_part_size = math.ceil(math.ceil(file_size / MAX_MULTIPART_COUNT) / MIN_PART_SIZE) * MIN_PART_SIZE
+        raise ValueError(
+            f"A file of {file_size} bytes needs {part_count} parts of {part_size} bytes, more than the {MAX_MULTIPART_COUNT} allowed; "
+            f"use a part size of at least {minimum_part_size} bytes"
+        )
+
+
+def calculate_multipart_etag(part_md5_digests):
+    # A single-part upload has the plain MD5 as its ETag, while a multipart
+    # upload has the MD5 of the concatenated part digests plus the part count
+    if len(part_md5_digests) == 1:
+        return part_md5_digests[0].hex()
+    combined_md5 = hashlib.md5(b"".join(part_md5_digests)).hexdigest()
+    return f"{combined_md5}-{len(part_md5_digests)}"
+
+
+class DigestAccumulator:
+    def __init__(self, part_size: int, sha256: bool = False):
+        self.part_size = part_size
+        self.file_size = 0
+        self.md5 = hashlib.md5()
+        self.sha256 = hashlib.sha256() if sha256 else None
+        self.part_md5 = hashlib.md5()
+        self.part_bytes = 0
+        self.part_md5_digests = []
+
+    def update(self, data):
+        self.md5.update(data)
+        if self.sha256 is not None:
+            self.sha256.update(data)
+        self.file_size += len(data)
+
+        # Split the chunk on part boundaries so that each part digest only
+        # covers the bytes MinIO will receive in that part
+        view = memoryview(data)
+        while len(view) > 0:
+            remaining_in_part = self.part_size - self.part_bytes if self.part_size else len(view)
+            piece = view[:remaining_in_part]
+            self.part_md5.update(piece)
+            self.part_bytes += len(piece)
+            view = view[len(piece):]
+            if self.part_size and self.part_bytes == self.part_size:
+                self.part_md5_digests.append(self.part_md5.digest())
+                self.part_md5 = hashlib.md5()
+                self.part_bytes = 0
+
+    def result(self):
+        part_md5_digests = list(self.part_md5_digests)
+        if self.part_bytes > 0 or not part_md5_digests:
+            part_md5_digests.append(self.part_md5.digest())
+        return {
+            "file_size": self.file_size,
+            "md5": self.md5.hexdigest(),
+            "sha256": self.sha256.hexdigest() if self.sha256 is not None else None,
+            "etag": calculate_multipart_etag(part_md5_digests),
+            "part_size": self.part_size,
+            "part_count": len(part_md5_digests),
+        }
+
+
+def calculate_file_digests(file_path: str, sha256: bool = False, part_size: int = 0, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    # Reads the file exactly once through a reusable buffer, so memory use is
+    # bounded by 'chunk_size' regardless of how large the file is
+    file_size = os.path.getsize(file_path)
+    part_size, _ = get_minio_part_size(file_size, part_size)
+    accumulator = DigestAccumulator(part_size, sha256=sha256)
+
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(file_path, "rb") as f:
+        while True:
+            bytes_read = f.readinto(buffer)
+            if not bytes_read:
+                break
+            accumulator.update(view[:bytes_read])
+    return accumulator.result()
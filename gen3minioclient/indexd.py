@@ -0,0 +1,96 @@
+"""
+Pooled, keep-alive HTTP access to indexd and Fence for the gen3minioclient
+"""
+import json
+
+from gen3minioclient.retries import record_retry
+
+DEFAULT_POOL_SIZE = 32
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+# (connect timeout, read timeout) in seconds
+DEFAULT_TIMEOUT = (10, 60)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+# POST is left out of the retried methods: creating a blank record is not
+# idempotent, so a retry after a 5xx/429 (or a read timeout) could create a
+# second record. urllib3 still retries a POST whose connection could not be
+# made, since nothing has been sent by then.
+#
+# requests and urllib3 are imported here rather than with the module, so
+# that importing the gen3minioclient does not pay for them.
+def create_http_session(pool_size: int = DEFAULT_POOL_SIZE, retries: int = DEFAULT_RETRIES, backoff_factor: float = DEFAULT_BACKOFF_FACTOR):
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    class MetricsRetry(Retry):
+        # Counts every retried request, labelled by HTTP method and the status
+        # code (or error) that triggered it
+        def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+            reason = str(response.status) if response is not None else type(error).__name__
+            record_retry(f"http_{(method or 'unknown').lower()}", reason)
+            return super().increment(method=method, url=url, response=response, error=error, _pool=_pool, _stacktrace=_stacktrace)
+
+    retry = MetricsRetry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(["GET", "HEAD", "PUT", "DELETE"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.verify = False
+    return session
+
+
+def json_dumps(data):
+    return json.dumps({k: v for (k, v) in data.items() if v is not None})
+
+
+class IndexdClient:
+    def __init__(self, gen3_commons_url: str, get_access_token, session=None, timeout=DEFAULT_TIMEOUT):
+        self.gen3_commons_url = gen3_commons_url
+        self.get_access_token = get_access_token
+        self.session = session if session is not None else create_http_session()
+        self.timeout = timeout
+
+    def headers(self):
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.get_access_token()}"
+        }
+
+    def create_blank_record(self, uploader: str, file_name: str):
+        url = f"{self.gen3_commons_url}/index/index/blank"
+        data = json_dumps({"uploader": uploader, "file_name": file_name})
+        return self.session.post(url, data=data, headers=self.headers(), timeout=self.timeout)
+
+    def update_blank_record(self, did: str, rev: str, hashes: dict, size: int, urls=None, authz=None):
+        url = f"{self.gen3_commons_url}/index/index/blank/{did}"
+        data = json_dumps({"hashes": hashes, "size": size, "urls": urls, "authz": authz})
+        return self.session.put(url, data=data, params={"rev": rev}, headers=self.headers(), timeout=self.timeout)
+
+    def get_record(self, guid: str):
+        url = f"{self.gen3_commons_url}/index/index/{guid}"
+        return self.session.get(url, timeout=self.timeout)
+
+    # One page of records. indexd pages either from the record after 'start'
+    # or by 'page' number, and also takes filters such as 'uploader' in 'params'
+    def list_records(self, limit: int, start=None, page=None, params=None):
+        url = f"{self.gen3_commons_url}/index/index"
+        query = {"limit": limit, **(params or {})}
+        if start is not None:
+            query["start"] = start
+        if page is not None:
+            query["page"] = page
+        return self.session.get(url, params=query, timeout=self.timeout)
+
+    def delete_record(self, guid: str, rev: str):
+        url = f"{self.gen3_commons_url}/index/index/{guid}"
+        return self.session.delete(url, params={"rev": rev}, headers=self.headers(), timeout=self.timeout)
@@ -0,0 +1,128 @@
+"""
+Streaming, paginated iteration over indexd records for the gen3minioclient
+"""
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from gen3minioclient.metrics import get_default_registry
+
+# indexd caps 'limit' at 1024 records per page
+DEFAULT_RECORD_PAGE_SIZE = 1000
+DEFAULT_RECORD_READ_AHEAD = 4
+
+# Only the fields the manifest and reconciliation tools need, as a tuple
+# rather than indexd's full JSON document
+IndexdRecord = namedtuple("IndexdRecord", ["did", "rev", "file_name", "size", "md5", "urls", "acl", "authz", "uploader"])
+
+
+def compact_record(record):
+    return IndexdRecord(
+        did=record["did"],
+        rev=record.get("rev"),
+        file_name=record.get("file_name"),
+        size=record.get("size"),
+        md5=(record.get("hashes") or {}).get("md5"),
+        urls=tuple(record.get("urls") or ()),
+        acl=tuple(record.get("acl") or ()),
+        authz=tuple(record.get("authz") or ()),
+        uploader=record.get("uploader"),
+    )
+
+
+# The manifest row ('MANIFEST_FIELDS') of a compact record
+def record_to_manifest_row(record: IndexdRecord):
+    return {
+        "guid": record.did,
+        "urls": list(record.urls),
+        "authz": list(record.authz),
+        "acl": list(record.acl),
+        "md5": record.md5,
+        "file_size": record.size,
+        "file_name": record.file_name,
+    }
+
+
+# The filters are also sent to indexd, but are checked again here so that
+# the url prefix (which indexd cannot filter on) and older indexd versions
+# that ignore a filter give the same results
+def record_matches(record, uploader=None, authz=None, url_prefix=None):
+    if uploader is not None and record.get("uploader") != uploader:
+        return False
+    if authz and not set(authz).issubset(record.get("authz") or ()):
+        return False
+    if url_prefix is not None and not any(url.startswith(url_prefix) for url in record.get("urls") or ()):
+        return False
+    return True
+
+
+def get_record_filter_params(uploader=None, authz=None):
+    params = {}
+    if uploader is not None:
+        params["uploader"] = uploader
+    if authz:
+        params["authz"] = ",".join(authz)
+    return params
+
+
+def fetch_record_page(indexd_client, page_size: int, start=None, page=None, params=None):
+    with get_default_registry().time_phase("index_list") as phase:
+        response = indexd_client.list_records(limit=page_size, start=start, page=page, params=params)
+        response.raise_for_status()
+        records = response.json()["records"]
+        phase["items"] = len(records)
+    return records
+
+
+# Pages by the last 'did' seen ('start'), one request at a time. Records
+# created or deleted while iterating cannot shift later pages.
+def iter_record_pages_by_start(indexd_client, page_size: int, params=None):
+    start = None
+    while True:
+        records = fetch_record_page(indexd_client, page_size, start=start, params=params)
+        if records:
+            yield records
+        if len(records) < page_size:
+            return
+        start = records[-1]["did"]
+
+
+# Pages by number, keeping 'read_ahead' pages in flight. Pages are yielded in
+# order, and at most 'read_ahead' pages are held in memory.
+def iter_record_pages_by_number(indexd_client, page_size: int, read_ahead: int, params=None):
+    with ThreadPoolExecutor(max_workers=read_ahead) as executor:
+        pending_pages = deque(
+            executor.submit(fetch_record_page, indexd_client, page_size, page=page, params=params)
+            for page in range(read_ahead)
+        )
+        next_page = read_ahead
+        while pending_pages:
+            records = pending_pages.popleft().result()
+            if records:
+                yield records
+            if len(records) < page_size:
+                # Every page after a short one is empty
+                for future in pending_pages:
+                    future.cancel()
+                return
+            pending_pages.append(executor.submit(fetch_record_page, indexd_client, page_size, page=next_page, params=params))
+            next_page += 1
+
+
+# Yields every indexd record matching the filters, one page of memory at a
+# time (or 'read_ahead' pages when pages are fetched in parallel):
+#
+# for record in iter_indexd_records(indexd_client, uploader="user@example.com"):
+#     print(record.did, record.md5)
+#
+# Records are 'IndexdRecord' tuples unless 'compact' is False, in which case
+# indexd's JSON documents are yielded unchanged.
+def iter_indexd_records(indexd_client, page_size: int = DEFAULT_RECORD_PAGE_SIZE, read_ahead: int = DEFAULT_RECORD_READ_AHEAD, uploader=None, authz=None, url_prefix=None, compact: bool = True):
+    params = get_record_filter_params(uploader=uploader, authz=authz)
+    if read_ahead > 1:
+        pages = iter_record_pages_by_number(indexd_client, page_size, read_ahead, params=params)
+    else:
+        pages = iter_record_pages_by_start(indexd_client, page_size, params=params)
+    for records in pages:
+        for record in records:
+            if record_matches(record, uploader=uploader, authz=authz, url_prefix=url_prefix):
+                yield compact_record(record) if compact else record
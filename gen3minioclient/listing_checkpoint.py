@@ -0,0 +1,64 @@
+"""
+Persisted bucket-listing state for incremental manifest syncs in the gen3minioclient
+"""
+from gen3minioclient.sqlite_connections import ThreadLocalSQLiteDatabase
+
+LISTING_CHECKPOINT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS listed_objects (
+    prefix TEXT NOT NULL,
+    object_name TEXT NOT NULL,
+    etag TEXT NOT NULL,
+    PRIMARY KEY (prefix, object_name)
+);
+"""
+
+# The most parameters SQLite accepts in one statement on older versions,
+# less one for the prefix
+CHECKPOINT_LOOKUP_BATCH_SIZE = 499
+
+
+class ListingCheckpoint(ThreadLocalSQLiteDatabase):
+    # The key and ETag of every object seen by earlier incremental syncs of a
+    # prefix. Keys look like '<did-prefix>/<uuid>/<name>', so a new object can
+    # land anywhere in the keyspace and no 'start_after' cursor can tell which
+    # key ranges gained objects. Each sync therefore lists the whole prefix
+    # (in parallel shards) and only the objects whose key is new or whose ETag
+    # changed are processed; only those rows are written here.
+    #
+    # Recorded objects are held in an open transaction until 'save', so the
+    # checkpoint only moves on once the manifest has been written.
+    def __init__(self, checkpoint_file: str):
+        self.checkpoint_file = checkpoint_file
+        super().__init__(checkpoint_file, LISTING_CHECKPOINT_SCHEMA, synchronous="NORMAL")
+
+    # Returns {object_name: etag} for the given names that were recorded
+    # under 'prefix' before
+    def get_known_etags(self, prefix: str, object_names):
+        object_names = list(object_names)
+        known_etags = {}
+        for start in range(0, len(object_names), CHECKPOINT_LOOKUP_BATCH_SIZE):
+            batch = object_names[start:start + CHECKPOINT_LOOKUP_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            known_etags.update(self.get_connection().execute(
+                f"SELECT object_name, etag FROM listed_objects WHERE prefix = ? AND object_name IN ({placeholders})",
+                (prefix or "", *batch),
+            ))
+        return known_etags
+
+    # 'etags' is {object_name: etag} for part of a listing of 'prefix';
+    # returns the object names that are new or have a different ETag
+    def get_new_or_changed(self, prefix: str, etags):
+        known_etags = self.get_known_etags(prefix, etags)
+        return [object_name for object_name in etags if known_etags.get(object_name) != etags[object_name]]
+
+    def record(self, prefix: str, etags):
+        self.get_connection().executemany(
+            "INSERT OR REPLACE INTO listed_objects (prefix, object_name, etag) VALUES (?, ?, ?)",
+            [(prefix or "", object_name, etag) for object_name, etag in etags.items()],
+        )
+
+    def save(self):
+        self.get_connection().commit()
+
+    def count(self, prefix: str = ""):
+        return self.get_connection().execute("SELECT COUNT(*) FROM listed_objects WHERE prefix = ?", (prefix or "",)).fetchone()[0]
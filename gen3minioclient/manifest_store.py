@@ -0,0 +1,153 @@
+"""
+SQLite-backed manifest store for the gen3minioclient
+"""
+import ast
+import sqlite3
+from csv import DictReader, DictWriter
+
+from gen3minioclient.sqlite_connections import ThreadLocalSQLiteDatabase
+
+DEFAULT_IMPORT_BATCH_SIZE = 10000
+
+MANIFEST_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS manifest (
+    guid TEXT PRIMARY KEY,
+    file_name TEXT,
+    md5 TEXT,
+    file_size INTEGER,
+    acl TEXT,
+    authz TEXT,
+    urls TEXT
+);
+CREATE TABLE IF NOT EXISTS manifest_urls (
+    guid TEXT NOT NULL,
+    url TEXT NOT NULL,
+    PRIMARY KEY (guid, url)
+);
+CREATE INDEX IF NOT EXISTS manifest_md5_index ON manifest (md5);
+CREATE INDEX IF NOT EXISTS manifest_file_name_index ON manifest (file_name);
+CREATE INDEX IF NOT EXISTS manifest_urls_url_index ON manifest_urls (url);
+"""
+
+
+# The 'urls', 'acl' and 'authz' columns are written as Python lists, e.g.
+# "['https://...']", but other tools write them space-separated
+def parse_manifest_list(value):
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value]
+    value = value.strip()
+    if value.startswith("["):
+        try:
+            return [str(item) for item in ast.literal_eval(value)]
+        except (ValueError, SyntaxError):
+            value = value.strip("[]")
+    return [item.strip("'\" ") for item in value.replace(",", " ").split() if item.strip("'\" ")]
+
+
+# Lists are stored the same way DictWriter writes them to the TSV manifest,
+# so that an export is identical to the file that was imported
+def format_manifest_list(value):
+    if isinstance(value, (list, tuple)):
+        return str(list(value))
+    return value
+
+
+class ManifestStore(ThreadLocalSQLiteDatabase):
+    def __init__(self, database_file: str, manifest_fields):
+        self.manifest_fields = manifest_fields
+        super().__init__(database_file, MANIFEST_STORE_SCHEMA, row_factory=sqlite3.Row, synchronous="NORMAL")
+
+    def row_to_minio_object(self, row):
+        return {field: row[field] for field in self.manifest_fields if field in row.keys()}
+
+    # All rows are written in one transaction, so concurrent readers either
+    # see the whole batch or none of it
+    def upsert_rows(self, rows):
+        connection = self.get_connection()
+        number_of_rows = 0
+        with connection:
+            for row in rows:
+                urls = parse_manifest_list(row.get("urls"))
+                connection.execute(
+                    "INSERT OR REPLACE INTO manifest (guid, file_name, md5, file_size, acl, authz, urls) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        row["guid"],
+                        row.get("file_name"),
+                        row.get("md5"),
+                        int(row["file_size"]) if row.get("file_size") not in (None, "") else None,
+                        format_manifest_list(row.get("acl")),
+                        format_manifest_list(row.get("authz")),
+                        format_manifest_list(row.get("urls")),
+                    ),
+                )
+                connection.execute("DELETE FROM manifest_urls WHERE guid = ?", (row["guid"],))
+                connection.executemany(
+                    "INSERT OR IGNORE INTO manifest_urls (guid, url) VALUES (?, ?)",
+                    [(row["guid"], url) for url in urls],
+                )
+                number_of_rows += 1
+        return number_of_rows
+
+    def delete_rows(self, guids):
+        connection = self.get_connection()
+        with connection:
+            for guid in guids:
+                connection.execute("DELETE FROM manifest WHERE guid = ?", (guid,))
+                connection.execute("DELETE FROM manifest_urls WHERE guid = ?", (guid,))
+
+    def get_by_guid(self, guid: str):
+        row = self.get_connection().execute("SELECT * FROM manifest WHERE guid = ?", (guid,)).fetchone()
+        return self.row_to_minio_object(row) if row else None
+
+    def find_by_md5(self, md5: str):
+        rows = self.get_connection().execute("SELECT * FROM manifest WHERE md5 = ?", (md5,)).fetchall()
+        return [self.row_to_minio_object(row) for row in rows]
+
+    def find_by_file_name(self, file_name: str):
+        rows = self.get_connection().execute("SELECT * FROM manifest WHERE file_name = ?", (file_name,)).fetchall()
+        return [self.row_to_minio_object(row) for row in rows]
+
+    def find_by_url(self, url: str):
+        rows = self.get_connection().execute(
+            "SELECT manifest.* FROM manifest JOIN manifest_urls ON manifest.guid = manifest_urls.guid WHERE manifest_urls.url = ?",
+            (url,),
+        ).fetchall()
+        return [self.row_to_minio_object(row) for row in rows]
+
+    def contains_md5(self, md5: str):
+        return self.get_connection().execute("SELECT 1 FROM manifest WHERE md5 = ? LIMIT 1", (md5,)).fetchone() is not None
+
+    def contains_url(self, url: str):
+        return self.get_connection().execute("SELECT 1 FROM manifest_urls WHERE url = ? LIMIT 1", (url,)).fetchone() is not None
+
+    def count(self):
+        return self.get_connection().execute("SELECT COUNT(*) FROM manifest").fetchone()[0]
+
+    def iter_rows(self):
+        cursor = self.get_connection().execute("SELECT * FROM manifest ORDER BY rowid")
+        for row in cursor:
+            yield self.row_to_minio_object(row)
+
+    def import_tsv(self, manifest_file: str, batch_size: int = DEFAULT_IMPORT_BATCH_SIZE):
+        number_of_rows = 0
+        batch = []
+        with open(manifest_file, "r") as f:
+            for row in DictReader(f, delimiter="\t"):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    number_of_rows += self.upsert_rows(batch)
+                    batch = []
+        number_of_rows += self.upsert_rows(batch)
+        return number_of_rows
+
+    def export_tsv(self, manifest_file: str):
+        number_of_rows = 0
+        with open(manifest_file, "w") as f:
+            writer = DictWriter(f, fieldnames=self.manifest_fields, delimiter="\t", extrasaction="ignore")
+            writer.writeheader()
+            for row in self.iter_rows():
+                writer.writerow(row)
+                number_of_rows += 1
+        return number_of_rows
@@ -0,0 +1,193 @@
+"""
+In-process timing metrics for the gen3minioclient, exposed in the Prometheus
+text format and as a JSON summary
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the phase duration histogram buckets
+DEFAULT_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+METRIC_PREFIX = "gen3minioclient"
+
+# The '# HELP' text of each metric in the Prometheus output
+METRIC_HELP = {
+    "phase_duration_seconds": "Duration of each phase of the pipeline.",
+    "phase_bytes_total": "Bytes processed by each phase of the pipeline.",
+    "phase_items_total": "Items (objects, records, rows) processed by each phase of the pipeline.",
+    "phase_errors_total": "Phases of the pipeline that ended with an error.",
+    "retries_total": "Retried requests, by operation and the status code or error that caused the retry.",
+    "uploads_total": "Finished uploads, by status.",
+    "hash_cache_total": "File digest lookups in the hash cache, by result.",
+    "presigned_urls_total": "Presigned URLs handed out, by method and whether they came from the cache.",
+}
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def escape_help_text(text):
+    return str(text).replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in sorted(labels.items())) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    # Estimated from the buckets, like Prometheus' histogram_quantile
+    def quantile(self, fraction: float):
+        if self.count == 0:
+            return None
+        rank = fraction * self.count
+        cumulative_count = 0
+        for index, bucket_count in enumerate(self.bucket_counts):
+            if cumulative_count + bucket_count >= rank and bucket_count:
+                lower_bound = self.buckets[index - 1] if index > 0 else 0.0
+                upper_bound = min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+                return lower_bound + (upper_bound - lower_bound) * (rank - cumulative_count) / bucket_count
+            cumulative_count += bucket_count
+        return self.max
+
+
+class MetricsRegistry:
+    # Every phase of the pipeline (hashing, token fetch, blank index, MinIO
+    # PUT, ...) records its duration in a histogram and optionally the number
+    # of bytes it processed. Counters track retries, errors and listed objects.
+    def __init__(self, buckets=DEFAULT_DURATION_BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def increment(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    # with metrics.time_phase("hashing") as phase:
+    #     digests = calculate_file_digests(file_path)
+    #     phase["bytes"] = digests["file_size"]
+    #
+    # 'phase["items"]' similarly counts objects listed, records written, ...
+    @contextmanager
+    def time_phase(self, phase_name: str):
+        phase = {"bytes": None, "items": None}
+        start = time.perf_counter()
+        try:
+            yield phase
+        except Exception:
+            self.increment("phase_errors_total", phase=phase_name)
+            raise
+        finally:
+            self.observe("phase_duration_seconds", time.perf_counter() - start, phase=phase_name)
+            if phase["bytes"]:
+                self.increment("phase_bytes_total", phase["bytes"], phase=phase_name)
+            if phase["items"]:
+                self.increment("phase_items_total", phase["items"], phase=phase_name)
+
+    def get_counter(self, name: str, **labels):
+        with self.lock:
+            return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def render_prometheus(self):
+        lines = []
+
+        def add_header(name, metric_type):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {escape_help_text(METRIC_HELP.get(name, name.replace('_', ' ')))}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {metric_type}")
+
+        with self.lock:
+            histogram_names = sorted({name for name, _ in self.histograms})
+            for name in histogram_names:
+                add_header(name, "histogram")
+                for (histogram_name, labels), histogram in sorted(self.histograms.items()):
+                    if histogram_name != name:
+                        continue
+                    labels = dict(labels)
+                    cumulative_count = 0
+                    for upper_bound, bucket_count in zip(self.buckets, histogram.bucket_counts):
+                        cumulative_count += bucket_count
+                        lines.append(f"{METRIC_PREFIX}_{name}_bucket{format_labels({**labels, 'le': upper_bound})} {cumulative_count}")
+                    lines.append(f"{METRIC_PREFIX}_{name}_bucket{format_labels({**labels, 'le': '+Inf'})} {histogram.count}")
+                    lines.append(f"{METRIC_PREFIX}_{name}_sum{format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{METRIC_PREFIX}_{name}_count{format_labels(labels)} {histogram.count}")
+            counter_names = sorted({name for name, _ in self.counters})
+            for name in counter_names:
+                add_header(name, "counter")
+                for (counter_name, labels), value in sorted(self.counters.items()):
+                    if counter_name == name:
+                        lines.append(f"{METRIC_PREFIX}_{name}{format_labels(dict(labels))} {value}")
+        return "\n".join(lines) + "\n"
+
+    # Per-phase durations and throughput, plus every counter, for printing at
+    # the end of a CLI run
+    def summary(self):
+        with self.lock:
+            phases = {}
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                if name != "phase_duration_seconds":
+                    continue
+                phase_name = dict(labels)["phase"]
+                number_of_bytes = self.counters.get(("phase_bytes_total", (("phase", phase_name),)), 0)
+                number_of_items = self.counters.get(("phase_items_total", (("phase", phase_name),)), 0)
+                phases[phase_name] = {
+                    "count": histogram.count,
+                    "total_seconds": histogram.sum,
+                    "mean_seconds": histogram.sum / histogram.count,
+                    "p50_seconds": histogram.quantile(0.5),
+                    "p95_seconds": histogram.quantile(0.95),
+                    "max_seconds": histogram.max,
+                    "errors": self.counters.get(("phase_errors_total", (("phase", phase_name),)), 0),
+                }
+                if number_of_bytes:
+                    phases[phase_name]["bytes"] = number_of_bytes
+                    phases[phase_name]["bytes_per_second"] = number_of_bytes / histogram.sum if histogram.sum else None
+                if number_of_items:
+                    phases[phase_name]["items"] = number_of_items
+                    phases[phase_name]["items_per_second"] = number_of_items / histogram.sum if histogram.sum else None
+            counters = {
+                f"{name}{format_labels(dict(labels))}": value
+                for (name, labels), value in sorted(self.counters.items())
+                if name not in ("phase_bytes_total", "phase_items_total", "phase_errors_total")
+            }
+        return {"phases": phases, "counters": counters}
+
+
+# Shared by every client in the process, so that the '/metrics' endpoint and
+# the CLI summary see all of the work done
+default_registry = MetricsRegistry()
+
+
+def get_default_registry():
+    return default_registry
@@ -0,0 +1,127 @@
+"""
+Concurrent multipart uploads of large files to MinIO for the gen3minioclient
+"""
+# The MinIO SDK has no public API for uploading individual parts, so this
+# module uses its private '_create_multipart_upload', '_upload_part',
+# '_complete_multipart_upload' and '_abort_multipart_upload' methods. Their
+# signatures are those of minio 7.2.x, which setup.py pins for that reason;
+# check them again before allowing a newer minio.
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from gen3minioclient.hashing import MIN_PART_SIZE, calculate_multipart_etag, check_multipart_part_size, get_minio_part_size
+from gen3minioclient.retries import call_with_retries
+
+DEFAULT_MULTIPART_PART_SIZE = 64 * 1024 * 1024
+DEFAULT_MULTIPART_WORKERS = 8
+DEFAULT_PART_RETRIES = 3
+DEFAULT_PART_RETRY_BACKOFF_SECONDS = 1.0
+
+
+def read_file_part(file_path: str, offset: int, length: int):
+    with open(file_path, "rb") as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+class MultipartUploader:
+    # Uploads the parts of one file across a pool of threads. At most
+    # 'max_workers' parts are held in memory at any time, and each part is
+    # retried on its own so a single failure does not restart the file.
+    def __init__(self, client, bucket_name: str, part_size: int = DEFAULT_MULTIPART_PART_SIZE, max_workers: int = DEFAULT_MULTIPART_WORKERS, part_retries: int = DEFAULT_PART_RETRIES, retry_backoff_seconds: float = DEFAULT_PART_RETRY_BACKOFF_SECONDS):
+        self.client = client
+        self.bucket_name = bucket_name
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.max_workers = max_workers
+        self.part_retries = part_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+    def create_multipart_upload(self, object_name: str):
+        return self.client._create_multipart_upload(self.bucket_name, object_name, {})
+
+    # 'parts' is {part_number: {"etag", "md5"}} and must hold every part from
+    # 1 up. Returns the ETag MinIO gives the completed object.
+    def complete_multipart_upload(self, object_name: str, upload_id: str, parts):
+        from minio.datatypes import Part
+        ordered_parts = [Part(part_number, parts[part_number]["etag"]) for part_number in range(1, len(parts) + 1)]
+        result = self.client._complete_multipart_upload(self.bucket_name, object_name, upload_id, ordered_parts)
+        return str(result.etag).strip('"')
+
+    def abort_multipart_upload(self, object_name: str, upload_id: str):
+        self.client._abort_multipart_upload(self.bucket_name, object_name, upload_id)
+
+    def upload_part(self, file_path: str, object_name: str, upload_id: str, part_number: int, offset: int, length: int):
+        return self.upload_part_data(object_name, upload_id, part_number, read_file_part(file_path, offset, length))
+
+    # Uploads one part held in memory, checking the ETag MinIO returns against
+    # its md5 (calculated here unless the caller already has it)
+    def upload_part_data(self, object_name: str, upload_id: str, part_number: int, data, md5=None):
+        md5 = md5 or hashlib.md5(data).hexdigest()
+
+        def upload():
+            etag = str(self.client._upload_part(self.bucket_name, object_name, data, None, upload_id, part_number)).strip('"')
+            if etag != md5:
+                raise ValueError(f"ETag '{etag}' of part {part_number} does not match its MD5 '{md5}'")
+            return {"part_number": part_number, "etag": etag, "md5": md5}
+
+        return call_with_retries(upload, self.part_retries, self.retry_backoff_seconds, "multipart_part", f"part {part_number} of '{object_name}'")
+
+    # 'upload_id' and 'completed_parts' ({part_number: {"etag", "md5"}}) allow an
+    # interrupted upload to continue, and 'on_upload_created'/'on_part_uploaded'
+    # are called as the upload progresses so that it can be recorded
+    def upload_file(self, file_path: str, object_name: str, upload_id=None, completed_parts=None, on_upload_created=None, on_part_uploaded=None, abort_on_failure: bool = True):
+        file_size = os.path.getsize(file_path)
+        check_multipart_part_size(file_size, self.part_size)
+        part_size, part_count = get_minio_part_size(file_size, self.part_size)
+
+        if part_count <= 1:
+            result = self.client.fput_object(
+                bucket_name=self.bucket_name,
+                object_name=object_name,
+                file_path=file_path,
+                part_size=self.part_size,
+            )
+            etag = str(result.etag).strip('"')
+            return {"etag": etag, "expected_etag": None, "upload_id": None, "part_size": part_size, "part_count": 1}
+
+        if upload_id is None:
+            upload_id = self.create_multipart_upload(object_name)
+            if on_upload_created:
+                on_upload_created(upload_id)
+        parts = dict(completed_parts or {})
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = []
+                for part_number in range(1, part_count + 1):
+                    if part_number in parts:
+                        continue
+                    offset = (part_number - 1) * part_size
+                    length = min(part_size, file_size - offset)
+                    futures.append(executor.submit(self.upload_part, file_path, object_name, upload_id, part_number, offset, length))
+                # Keep recording the parts that do finish even after one has
+                # failed, so that a resumed upload does not send them again
+                part_error = None
+                for future in as_completed(futures):
+                    try:
+                        part = future.result()
+                    except Exception as e:
+                        part_error = part_error or e
+                        continue
+                    parts[part["part_number"]] = {"etag": part["etag"], "md5": part["md5"]}
+                    if on_part_uploaded:
+                        on_part_uploaded(upload_id, part)
+                if part_error:
+                    raise part_error
+
+            etag = self.complete_multipart_upload(object_name, upload_id, parts)
+        except Exception:
+            if abort_on_failure:
+                self.abort_multipart_upload(object_name, upload_id)
+            raise
+
+        expected_etag = calculate_multipart_etag([bytes.fromhex(parts[part_number]["md5"]) for part_number in range(1, part_count + 1)])
+        if etag != expected_etag:
+            raise ValueError(f"ETag '{etag}' returned by MinIO does not match the locally calculated ETag '{expected_etag}'")
+        return {"etag": etag, "expected_etag": expected_etag, "upload_id": upload_id, "part_size": part_size, "part_count": part_count}
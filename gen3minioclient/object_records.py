@@ -0,0 +1,74 @@
+"""
+Compact records of the objects in a MinIO bucket for the gen3minioclient
+"""
+from collections.abc import Mapping
+from uuid import uuid4
+
+# Every object record shares these, rather than holding its own lists
+DEFAULT_OBJECT_ACL = ("*",)
+DEFAULT_OBJECT_AUTHZ = ("/programs/gen3Program502/projects/P502",)
+
+OBJECT_RECORD_FIELDS = ('guid', 'urls', 'authz', 'acl', 'md5', 'file_size', 'file_name')
+
+
+def get_object_url_prefix(minio_api_endpoint: str, bucket_name: str):
+    return f"https://{minio_api_endpoint}/{bucket_name}/"
+
+
+class MinioObjectRecord(Mapping):
+    # A read-only manifest row ('OBJECT_RECORD_FIELDS') for one object in a
+    # bucket listing. Only the object name, md5, size and the URL prefix (one
+    # string shared by the whole listing) are stored; the file name, URL,
+    # acl and authz are built when they are read, and the guid is only
+    # generated the first time it is read, so objects that are filtered out
+    # never get one. It can be passed anywhere a manifest row dict is read,
+    # e.g. to 'DictWriter.writerow' or 'ManifestStore.upsert_rows'.
+    __slots__ = ("object_name", "md5", "file_size", "url_prefix", "_guid")
+
+    def __init__(self, object_name: str, md5: str, file_size: int, url_prefix: str, guid=None):
+        self.object_name = object_name
+        self.md5 = md5
+        self.file_size = file_size
+        self.url_prefix = url_prefix
+        self._guid = guid
+
+    @property
+    def guid(self):
+        if self._guid is None:
+            self._guid = str(uuid4())
+        return self._guid
+
+    @property
+    def file_name(self):
+        return self.object_name.rsplit('/', 1)[-1]
+
+    # Lists, like the manifest rows built elsewhere, so that the TSV columns
+    # are written the same way
+    @property
+    def urls(self):
+        return [self.url_prefix + self.object_name]
+
+    @property
+    def acl(self):
+        return list(DEFAULT_OBJECT_ACL)
+
+    @property
+    def authz(self):
+        return list(DEFAULT_OBJECT_AUTHZ)
+
+    def __getitem__(self, key):
+        if key not in OBJECT_RECORD_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(OBJECT_RECORD_FIELDS)
+
+    def __len__(self):
+        return len(OBJECT_RECORD_FIELDS)
+
+    def __repr__(self):
+        return f"MinioObjectRecord({self.to_dict()!r})"
+
+    def to_dict(self):
+        return {field: self[field] for field in OBJECT_RECORD_FIELDS}
@@ -0,0 +1,92 @@
+"""
+Batch minting and caching of presigned MinIO URLs for the gen3minioclient
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from gen3minioclient.metrics import get_default_registry
+
+PRESIGNED_URL_METHODS = ("PUT", "GET")
+DEFAULT_PRESIGNED_URL_EXPIRY = timedelta(days=1)
+# A cached URL is handed out again only while it has at least this long left
+DEFAULT_PRESIGNED_URL_REFRESH_LEEWAY_SECONDS = 3600
+DEFAULT_PRESIGNED_URL_CACHE_SIZE = 100000
+MAX_PRESIGNED_URL_BATCH_SIZE = 10000
+
+
+class PresignedUrlCache:
+    # Presigned URLs keyed by (bucket, method, object name, expiry). A URL is
+    # reused until it gets within 'refresh_leeway_seconds' of expiring (or
+    # half of its lifetime, for short expiries), so asking for the same keys
+    # again signs nothing. The least recently used URLs are dropped once
+    # 'max_entries' is reached. 'clock' returns the current epoch seconds.
+    def __init__(self, refresh_leeway_seconds: int = DEFAULT_PRESIGNED_URL_REFRESH_LEEWAY_SECONDS, max_entries: int = DEFAULT_PRESIGNED_URL_CACHE_SIZE, clock=time.time):
+        self.refresh_leeway_seconds = refresh_leeway_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, expires_seconds: float):
+        leeway_seconds = min(self.refresh_leeway_seconds, expires_seconds / 2)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if self.clock() >= entry["expires_at"] - leeway_seconds:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+
+# Signs URLs for many object names at once, reusing the cached ones. Signing
+# is a local HMAC once the MinIO client knows the bucket region, so a batch
+# costs at most one request to MinIO however many keys it has.
+#
+# Returns {object name: {"url": ..., "method": ..., "expires_at": <epoch seconds>}}
+def mint_presigned_urls(client, bucket_name: str, object_names, method: str = "PUT", expires: timedelta = DEFAULT_PRESIGNED_URL_EXPIRY, cache: PresignedUrlCache = None, response_headers=None):
+    method = method.upper()
+    if method not in PRESIGNED_URL_METHODS:
+        raise ValueError(f"Presigned URLs can only be minted for {', '.join(PRESIGNED_URL_METHODS)} requests, not '{method}'")
+    expires_seconds = expires.total_seconds()
+    # Expiry times are taken from the cache's clock, so that they are
+    # compared with the same clock when the URLs are looked up again
+    clock = cache.clock if cache is not None else time.time
+    metrics = get_default_registry()
+    presigned_urls = {}
+    with metrics.time_phase("presign") as phase:
+        for object_name in object_names:
+            if object_name in presigned_urls:
+                continue
+            key = (bucket_name, method, object_name, expires_seconds)
+            entry = cache.get(key, expires_seconds) if cache is not None else None
+            if entry is None:
+                signed_at = clock()
+                url = client.get_presigned_url(method, bucket_name, object_name, expires=expires, response_headers=response_headers)
+                entry = {"url": url, "method": method, "expires_at": signed_at + expires_seconds}
+                if cache is not None:
+                    cache.put(key, entry)
+                metrics.increment("presigned_urls_total", method=method, cache="miss")
+            else:
+                metrics.increment("presigned_urls_total", method=method, cache="hit")
+            presigned_urls[object_name] = entry
+        phase["items"] = len(presigned_urls)
+    return presigned_urls
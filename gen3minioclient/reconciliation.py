@@ -0,0 +1,187 @@
+"""
+Three-way reconciliation of the MinIO bucket, indexd and the manifest for the
+gen3minioclient
+"""
+import csv
+import os
+import tempfile
+import zlib
+from csv import DictWriter
+
+from gen3minioclient.metrics import get_default_registry
+
+DEFAULT_RECONCILIATION_PARTITIONS = 64
+
+RECONCILIATION_SOURCES = ("bucket", "index", "manifest")
+RECONCILIATION_CATEGORIES = (
+    # In the bucket without an indexd record
+    "unindexed_object",
+    # An indexd record whose object is not in the bucket
+    "missing_object",
+    # In the bucket without a manifest row
+    "unlisted_object",
+    # A manifest row whose object is not in the bucket
+    "stale_manifest_row",
+    "md5_mismatch",
+    "size_mismatch",
+    # More than one indexd record or manifest row for the same object
+    "duplicate_index_record",
+    "duplicate_manifest_row",
+)
+RECONCILIATION_REPORT_FIELDS = [
+    'category', 'object_name', 'index_guid', 'manifest_guid',
+    'bucket_md5', 'index_md5', 'manifest_md5', 'bucket_size', 'index_size', 'manifest_size',
+]
+
+# Every source is reduced to entries of
+# (object name, guid, md5, size, acl, authz), with the lists as strings
+ENTRY_FIELDS = ("object_name", "guid", "md5", "size", "acl", "authz")
+
+
+def get_partition(object_name: str, number_of_partitions: int):
+    return zlib.crc32(object_name.encode()) % number_of_partitions
+
+
+class PartitionedEntries:
+    # Spreads the entries of one source over 'number_of_partitions' files by
+    # a hash of the object name, so that matching entries of every source land
+    # in the same partition and each partition can be compared on its own
+    def __init__(self, directory: str, source: str, number_of_partitions: int):
+        self.file_paths = [os.path.join(directory, f"{source}-{partition}.tsv") for partition in range(number_of_partitions)]
+        self.files = [open(file_path, "w", newline="") for file_path in self.file_paths]
+        self.writers = [csv.writer(f, delimiter="\t") for f in self.files]
+        self.number_of_entries = 0
+
+    def add_entries(self, entries):
+        for entry in entries:
+            self.writers[get_partition(entry[0], len(self.writers))].writerow(entry)
+            self.number_of_entries += 1
+
+    def close(self):
+        for f in self.files:
+            f.close()
+
+    # {object name: [entry, ...]} for one partition
+    def read_partition(self, partition: int):
+        entries = {}
+        with open(self.file_paths[partition], newline="") as f:
+            for row in csv.reader(f, delimiter="\t"):
+                entries.setdefault(row[0], []).append(dict(zip(ENTRY_FIELDS, row)))
+        return entries
+
+
+# Objects uploaded in parts have an ETag of '<md5>-<part count>', which can
+# only be compared with another ETag, not with a plain md5
+def is_multipart_etag(md5: str):
+    return "-" in md5
+
+
+def md5_values_disagree(md5_values):
+    md5_values = [md5 for md5 in md5_values if md5]
+    plain_md5_values = {md5 for md5 in md5_values if not is_multipart_etag(md5)}
+    multipart_etags = {md5 for md5 in md5_values if is_multipart_etag(md5)}
+    return len(plain_md5_values) > 1 or len(multipart_etags) > 1
+
+
+def size_values_disagree(size_values):
+    return len({int(size) for size in size_values if size not in (None, "")}) > 1
+
+
+def create_report_row(category: str, object_name: str, bucket_entry=None, index_entry=None, manifest_entry=None):
+    return {
+        "category": category,
+        "object_name": object_name,
+        "index_guid": index_entry["guid"] if index_entry else None,
+        "manifest_guid": manifest_entry["guid"] if manifest_entry else None,
+        "bucket_md5": bucket_entry["md5"] if bucket_entry else None,
+        "index_md5": index_entry["md5"] if index_entry else None,
+        "manifest_md5": manifest_entry["md5"] if manifest_entry else None,
+        "bucket_size": bucket_entry["size"] if bucket_entry else None,
+        "index_size": index_entry["size"] if index_entry else None,
+        "manifest_size": manifest_entry["size"] if manifest_entry else None,
+    }
+
+
+# Report rows for every object name seen in one partition of the three sources
+def reconcile_partition(bucket_entries, index_entries, manifest_entries):
+    for object_name in sorted(bucket_entries.keys() | index_entries.keys() | manifest_entries.keys()):
+        bucket_entry = bucket_entries.get(object_name, [None])[0]
+        object_index_entries = index_entries.get(object_name, [])
+        object_manifest_entries = manifest_entries.get(object_name, [])
+        index_entry = object_index_entries[0] if object_index_entries else None
+        manifest_entry = object_manifest_entries[0] if object_manifest_entries else None
+
+        if bucket_entry and not index_entry:
+            yield create_report_row("unindexed_object", object_name, bucket_entry, None, manifest_entry)
+        if index_entry and not bucket_entry:
+            for entry in object_index_entries:
+                yield create_report_row("missing_object", object_name, None, entry, manifest_entry)
+        if bucket_entry and not manifest_entry:
+            yield create_report_row("unlisted_object", object_name, bucket_entry, index_entry, None)
+        if manifest_entry and not bucket_entry:
+            for entry in object_manifest_entries:
+                yield create_report_row("stale_manifest_row", object_name, None, index_entry, entry)
+        entries = [entry for entry in (bucket_entry, index_entry, manifest_entry) if entry]
+        if md5_values_disagree(entry["md5"] for entry in entries):
+            yield create_report_row("md5_mismatch", object_name, bucket_entry, index_entry, manifest_entry)
+        if size_values_disagree(entry["size"] for entry in entries):
+            yield create_report_row("size_mismatch", object_name, bucket_entry, index_entry, manifest_entry)
+        for entry in object_index_entries[1:]:
+            yield create_report_row("duplicate_index_record", object_name, bucket_entry, entry, manifest_entry)
+        for entry in object_manifest_entries[1:]:
+            yield create_report_row("duplicate_manifest_row", object_name, bucket_entry, index_entry, entry)
+
+
+# Compares the three sources, each an iterable of entries (see
+# 'ENTRY_FIELDS'), in bounded memory: the entries are first written to
+# hash partitions on disk, then one partition of each source is loaded at a
+# time. Every disagreement is written to 'report_file'.
+#
+# 'create_repair_row(bucket_entry, manifest_entry)' turns an object without an
+# indexd record into a manifest row for indexing, or returns None when it
+# cannot (e.g. only a multipart ETag is known); these rows are written to
+# 'repair_manifest_file' with 'manifest_fields'.
+#
+# Returns the number of entries per source and of rows per category.
+def reconcile(bucket_entries, index_entries, manifest_entries, report_file: str, repair_manifest_file=None, create_repair_row=None, manifest_fields=None, number_of_partitions: int = DEFAULT_RECONCILIATION_PARTITIONS):
+    summary = {category: 0 for category in RECONCILIATION_CATEGORIES}
+    summary["repairable"] = 0
+    with tempfile.TemporaryDirectory(prefix="gen3minioclient-reconcile-") as directory:
+        partitioned_sources = {}
+        for source, entries in zip(RECONCILIATION_SOURCES, (bucket_entries, index_entries, manifest_entries)):
+            with get_default_registry().time_phase(f"reconcile_{source}") as phase:
+                partitioned_entries = PartitionedEntries(directory, source, number_of_partitions)
+                try:
+                    partitioned_entries.add_entries(entries)
+                finally:
+                    partitioned_entries.close()
+                phase["items"] = partitioned_entries.number_of_entries
+            partitioned_sources[source] = partitioned_entries
+            summary[f"{source}_entries"] = partitioned_entries.number_of_entries
+
+        repair_file = open(repair_manifest_file, "w") if repair_manifest_file else None
+        try:
+            repair_writer = None
+            if repair_file:
+                repair_writer = DictWriter(repair_file, fieldnames=manifest_fields, delimiter="\t")
+                repair_writer.writeheader()
+            with open(report_file, "w") as f, get_default_registry().time_phase("reconcile_compare"):
+                writer = DictWriter(f, fieldnames=RECONCILIATION_REPORT_FIELDS, delimiter="\t")
+                writer.writeheader()
+                for partition in range(number_of_partitions):
+                    bucket_partition, index_partition, manifest_partition = (
+                        partitioned_sources[source].read_partition(partition) for source in RECONCILIATION_SOURCES
+                    )
+                    for report_row in reconcile_partition(bucket_partition, index_partition, manifest_partition):
+                        writer.writerow(report_row)
+                        summary[report_row["category"]] += 1
+                        if repair_writer and report_row["category"] == "unindexed_object":
+                            object_name = report_row["object_name"]
+                            repair_row = create_repair_row(bucket_partition[object_name][0], manifest_partition.get(object_name, [None])[0])
+                            if repair_row:
+                                repair_writer.writerow(repair_row)
+                                summary["repairable"] += 1
+        finally:
+            if repair_file:
+                repair_file.close()
+    return summary
@@ -0,0 +1,35 @@
+"""
+Shared retry and backoff policy for the gen3minioclient
+"""
+import time
+
+from gen3minioclient.metrics import get_default_registry
+
+
+# Exponential backoff of 'backoff_factor' * 2 ** attempt seconds, unless the
+# server asked for a delay in seconds with a 'Retry-After' header
+def get_retry_delay(attempt: int, backoff_factor: float, retry_after=None):
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return backoff_factor * (2 ** attempt)
+
+
+# Counts a retry, labelled by the operation and the status code (or error)
+# that triggered it
+def record_retry(operation: str, reason: str):
+    get_default_registry().increment("retries_total", operation=operation, reason=reason)
+
+
+# Calls 'function' until it returns, retrying on any exception up to
+# 'retries' times with 'get_retry_delay' between attempts. 'description'
+# names what is retried in the progress message.
+def call_with_retries(function, retries: int, backoff_factor: float, operation: str, description: str):
+    for attempt in range(retries + 1):
+        try:
+            return function()
+        except Exception as e:
+            if attempt == retries:
+                raise
+            print(f"Retrying {description} after error: {e}")
+            record_retry(operation, type(e).__name__)
+            time.sleep(get_retry_delay(attempt, backoff_factor))
@@ -0,0 +1,160 @@
+"""
+Parallel listing of a MinIO bucket split into key-range shards for the
+gen3minioclient
+"""
+import itertools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from gen3minioclient.metrics import get_default_registry
+
+DEFAULT_LISTING_WORKERS = 8
+# Object keys are '<did-prefix>/<uuid>/<name>', so below the did prefix the
+# first character of a key is a hex digit of the uuid
+DEFAULT_SHARD_CHARACTERS = "0123456789abcdef"
+DEFAULT_SHARD_DEPTH = 1
+# Batches of objects (one listing page each) held per shard queue
+DEFAULT_SHARD_QUEUE_SIZE = 4
+# How many levels of '/' a shard plan looks below the prefix for the point
+# where the keyspace starts to branch
+DEFAULT_DISCOVERY_DEPTH = 3
+
+LISTING_BATCH_SIZE = 1000
+
+_SHARD_DONE = object()
+
+
+# Walks down from 'prefix' while every key below it shares one more '/'
+# level, e.g. from '' to 'PREFIX/' when every key starts with 'PREFIX/'.
+# Each level only reads the first entries of a non-recursive listing.
+def discover_shard_base_prefix(client, bucket_name: str, prefix: str = "", max_depth: int = DEFAULT_DISCOVERY_DEPTH):
+    for _ in range(max_depth):
+        entries = list(itertools.islice(client.list_objects(bucket_name, prefix=prefix or None, recursive=False), 2))
+        if len(entries) != 1 or not entries[0].is_dir:
+            break
+        prefix = entries[0].object_name
+    return prefix
+
+
+# Boundary keys that split the keys below 'base_prefix' into ranges by their
+# leading 'depth' characters, e.g. 'PREFIX/1', 'PREFIX/2', ... 'PREFIX/f'
+def get_shard_boundaries(base_prefix: str, characters: str = DEFAULT_SHARD_CHARACTERS, depth: int = DEFAULT_SHARD_DEPTH):
+    combinations = ("".join(combination) for combination in itertools.product(sorted(characters), repeat=depth))
+    return [base_prefix + combination for combination in itertools.islice(combinations, 1, None)]
+
+
+# A shard plan is a list of (lo, hi) ranges, each holding the keys with
+# lo < key <= hi, where None is an open end. Consecutive ranges share their
+# boundary, so every key belongs to exactly one shard whatever the keys look
+# like; the boundaries only decide how evenly the work is spread.
+def create_shard_plan(boundaries):
+    boundaries = [None] + sorted(set(boundaries)) + [None]
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+# The part of a shard plan after 'start_after'
+def clip_shard_plan(shard_plan, start_after: str):
+    return [
+        (start_after if lo is None or lo < start_after else lo, hi)
+        for lo, hi in shard_plan
+        if hi is None or hi > start_after
+    ]
+
+
+def discover_shard_plan(client, bucket_name: str, prefix: str = "", characters: str = DEFAULT_SHARD_CHARACTERS, depth: int = DEFAULT_SHARD_DEPTH):
+    base_prefix = discover_shard_base_prefix(client, bucket_name, prefix=prefix)
+    return create_shard_plan(get_shard_boundaries(base_prefix, characters=characters, depth=depth))
+
+
+# The objects of one shard, in key order
+def iter_shard(client, bucket_name: str, shard, prefix: str = ""):
+    lo, hi = shard
+    for obj in client.list_objects(bucket_name, prefix=prefix or None, recursive=True, start_after=lo):
+        if hi is not None and obj.object_name > hi:
+            return
+        yield obj
+
+
+# Lists the shards of 'shard_plan' (discovered when None) on 'max_workers'
+# threads and yields the objects as they arrive. With 'ordered' set, the
+# objects come out in key order, as from a single 'list_objects' call,
+# because the shards are yielded one after the other while the later ones
+# are listed ahead; otherwise they come out in whatever order the shards
+# produce them. Each shard holds at most 'queue_size' pages, so a slow
+# consumer blocks the listing threads instead of filling memory.
+def iter_sharded_objects(client, bucket_name: str, prefix: str = "", shard_plan=None, max_workers: int = DEFAULT_LISTING_WORKERS, ordered: bool = True, queue_size: int = DEFAULT_SHARD_QUEUE_SIZE):
+    if shard_plan is None:
+        shard_plan = discover_shard_plan(client, bucket_name, prefix=prefix)
+    stopped = threading.Event()
+    shared_queue = queue.Queue(maxsize=queue_size * max_workers)
+    shard_queues = [queue.Queue(maxsize=queue_size) if ordered else shared_queue for _ in shard_plan]
+
+    def put(shard_queue, item):
+        while not stopped.is_set():
+            try:
+                shard_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def list_shard(shard, shard_queue):
+        if stopped.is_set():
+            return
+        try:
+            with get_default_registry().time_phase("list_shard") as phase:
+                number_of_objects = 0
+                batch = []
+                for obj in iter_shard(client, bucket_name, shard, prefix=prefix):
+                    batch.append(obj)
+                    number_of_objects += 1
+                    if len(batch) >= LISTING_BATCH_SIZE:
+                        if not put(shard_queue, batch):
+                            return
+                        batch = []
+                phase["items"] = number_of_objects
+            if batch:
+                put(shard_queue, batch)
+            put(shard_queue, _SHARD_DONE)
+        except BaseException as error:
+            put(shard_queue, error)
+
+    def get_batches(shard_queue, number_of_shards: int):
+        while number_of_shards:
+            item = shard_queue.get()
+            if item is _SHARD_DONE:
+                number_of_shards -= 1
+            elif isinstance(item, BaseException):
+                raise item
+            else:
+                yield item
+
+    # The shards are started in order, so in ordered mode the shard being
+    # yielded has always been started and the listing cannot deadlock
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for shard, shard_queue in zip(shard_plan, shard_queues):
+            executor.submit(list_shard, shard, shard_queue)
+        if ordered:
+            batches = itertools.chain.from_iterable(get_batches(shard_queue, 1) for shard_queue in shard_queues)
+        else:
+            batches = get_batches(shared_queue, len(shard_plan))
+        for batch in batches:
+            yield from batch
+    finally:
+        # Lets the listing threads return when the caller stops early
+        stopped.set()
+        executor.shutdown(wait=True)
+
+
+# Lists the first page on its own and only shards the rest of the listing
+# when there is more than one page, so that small buckets cost a single
+# request instead of a shard plan discovery and a request per shard
+def iter_listing(client, bucket_name: str, prefix: str = "", max_workers: int = DEFAULT_LISTING_WORKERS, ordered: bool = True, depth: int = DEFAULT_SHARD_DEPTH):
+    first_page = list(itertools.islice(client.list_objects(bucket_name, prefix=prefix or None, recursive=True), LISTING_BATCH_SIZE))
+    yield from first_page
+    if len(first_page) < LISTING_BATCH_SIZE:
+        return
+    shard_plan = clip_shard_plan(discover_shard_plan(client, bucket_name, prefix=prefix, depth=depth), first_page[-1].object_name)
+    yield from iter_sharded_objects(client, bucket_name, prefix=prefix, shard_plan=shard_plan, max_workers=max_workers, ordered=ordered)
@@ -0,0 +1,43 @@
+"""
+Thread-local SQLite connections shared by the gen3minioclient's local databases
+"""
+import sqlite3
+import threading
+
+
+class ThreadLocalSQLiteDatabase:
+    # Base for the SQLite files the client keeps (manifest store, hash cache,
+    # upload journal, listing and indexing checkpoints). sqlite3 connections
+    # cannot be shared between threads, so each worker thread gets its own
+    # WAL-mode connection to the same database, and 'schema' is created on
+    # the first one.
+    #
+    # 'row_factory' is set on every connection (e.g. sqlite3.Row), and
+    # 'synchronous' sets the pragma of that name; files that must survive
+    # a power loss leave it at SQLite's default of FULL.
+    def __init__(self, database_file: str, schema: str, row_factory=None, synchronous=None):
+        self.database_file = database_file
+        self.row_factory = row_factory
+        self.synchronous = synchronous
+        self.local = threading.local()
+        self.get_connection().executescript(schema)
+
+    def get_connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.database_file, timeout=30)
+            if self.row_factory is not None:
+                connection.row_factory = self.row_factory
+            connection.execute("PRAGMA journal_mode=WAL")
+            if self.synchronous:
+                connection.execute(f"PRAGMA synchronous={self.synchronous}")
+            self.local.connection = connection
+        return connection
+
+    # Closes the calling thread's connection; a later call to
+    # 'get_connection' opens a new one
+    def close(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
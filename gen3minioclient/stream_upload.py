@@ -0,0 +1,104 @@
+"""
+Uploads of streamed data (e.g. HTTP request bodies) to MinIO without staging
+them on disk, for the gen3minioclient
+"""
+import asyncio
+import io
+
+from gen3minioclient.hashing import MAX_MULTIPART_COUNT, MIN_PART_SIZE, DigestAccumulator
+
+DEFAULT_STREAM_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_STREAM_PARTS_IN_FLIGHT = 2
+DEFAULT_MAX_CONCURRENT_STREAM_UPLOADS = 32
+
+
+class StreamingUploader:
+    # Uploads an async iterator of byte chunks whose total size is not known
+    # up front. The chunks are cut into 'part_size' parts that are hashed and
+    # sent as a multipart upload, with at most 'parts_in_flight' parts being
+    # sent at a time. One upload therefore holds at most about
+    # (parts_in_flight + 1) * part_size bytes. Streams that fit in a single
+    # part are sent with one PUT, so their ETag is their md5.
+    #
+    # The part size also caps the object size at 10000 parts.
+    def __init__(self, multipart_uploader, part_size: int = DEFAULT_STREAM_PART_SIZE, parts_in_flight: int = DEFAULT_STREAM_PARTS_IN_FLIGHT, executor=None):
+        self.multipart_uploader = multipart_uploader
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.parts_in_flight = max(parts_in_flight, 1)
+        # The MinIO SDK and hashing block, so they run on this executor (the
+        # event loop's default one when None)
+        self.executor = executor
+
+    async def run_blocking(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    # 'data' is at most one part. Without 'part_size', MinIO would split
+    # anything over 5 MiB into parts of its own choosing and the ETag would
+    # no longer be the md5 the stream was checked against.
+    def put_object(self, object_name: str, data):
+        client = self.multipart_uploader.client
+        result = client.put_object(self.multipart_uploader.bucket_name, object_name, io.BytesIO(data), len(data), part_size=self.part_size)
+        return str(result.etag).strip('"')
+
+    # Returns the digests of the stream ('file_size', 'md5', 'etag', ...) and
+    # the ETag MinIO gave the object, which has been checked to match them
+    async def upload(self, object_name: str, chunks):
+        accumulator = DigestAccumulator(self.part_size)
+        buffer = bytearray()
+        upload_id = None
+        pending_parts = {}
+        parts = {}
+
+        async def wait_for_parts(max_pending: int):
+            while len(pending_parts) > max_pending:
+                done, _ = await asyncio.wait(pending_parts.values(), return_when=asyncio.FIRST_COMPLETED)
+                for part_number, future in list(pending_parts.items()):
+                    if future in done:
+                        part = future.result()
+                        parts[part_number] = {"etag": part["etag"], "md5": part["md5"]}
+                        del pending_parts[part_number]
+
+        async def send_part(data, md5=None):
+            await wait_for_parts(self.parts_in_flight - 1)
+            part_number = len(parts) + len(pending_parts) + 1
+            if part_number > MAX_MULTIPART_COUNT:
+                raise ValueError(f"Stream is larger than {MAX_MULTIPART_COUNT} parts of {self.part_size} bytes")
+            pending_parts[part_number] = asyncio.ensure_future(self.run_blocking(self.multipart_uploader.upload_part_data, object_name, upload_id, part_number, data, md5))
+
+        try:
+            async for chunk in chunks:
+                buffer += chunk
+                # A part is only cut once more data follows it, so that the
+                # last part is never empty and a stream of exactly one part
+                # is still sent as a single PUT
+                while len(buffer) > self.part_size:
+                    data = bytes(buffer[:self.part_size])
+                    del buffer[:self.part_size]
+                    if upload_id is None:
+                        upload_id = await self.run_blocking(self.multipart_uploader.create_multipart_upload, object_name)
+                    await self.run_blocking(accumulator.update, data)
+                    await send_part(data, accumulator.part_md5_digests[-1].hex())
+
+            data = bytes(buffer)
+            buffer = None
+            await self.run_blocking(accumulator.update, data)
+            digests = accumulator.result()
+            if upload_id is None:
+                etag = await self.run_blocking(self.put_object, object_name, data)
+            else:
+                await send_part(data)
+                await wait_for_parts(0)
+                etag = await self.run_blocking(self.multipart_uploader.complete_multipart_upload, object_name, upload_id, parts)
+        except BaseException:
+            for future in pending_parts.values():
+                future.cancel()
+            await asyncio.gather(*pending_parts.values(), return_exceptions=True)
+            if upload_id is not None:
+                await self.run_blocking(self.multipart_uploader.abort_multipart_upload, object_name, upload_id)
+            raise
+
+        if etag != digests["etag"]:
+            # The object cannot be trusted, so it is not left behind
+            await self.run_blocking(self.multipart_uploader.client.remove_object, self.multipart_uploader.bucket_name, object_name)
+            raise ValueError(f"ETag '{etag}' returned by MinIO does not match the locally calculated ETag '{digests['etag']}'")
+        return {**digests, "etag": etag}
@@ -0,0 +1,157 @@
+"""
+Crash-safe, resumable upload journal for the gen3minioclient
+"""
+import json
+import os
+import sqlite3
+import time
+
+from gen3minioclient.sqlite_connections import ThreadLocalSQLiteDatabase
+
+# The stages of the upload pipeline, in the order they complete. Whether the
+# manifest has been updated is tracked separately, because bulk uploads update
+# the manifest once at the end rather than per file.
+STAGE_PENDING = "pending"
+STAGE_HASHED = "hashed"
+STAGE_BLANK_RECORD_CREATED = "blank_record_created"
+STAGE_UPLOADED = "uploaded"
+STAGE_INDEX_UPDATED = "index_updated"
+JOURNAL_STAGES = [STAGE_PENDING, STAGE_HASHED, STAGE_BLANK_RECORD_CREATED, STAGE_UPLOADED, STAGE_INDEX_UPDATED]
+
+UPLOAD_JOURNAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    file_path TEXT PRIMARY KEY,
+    stage TEXT NOT NULL,
+    file_size INTEGER,
+    file_mtime_ns INTEGER,
+    digests TEXT,
+    did TEXT,
+    rev TEXT,
+    object_name TEXT,
+    upload_id TEXT,
+    minio_object TEXT,
+    manifest_updated INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS upload_parts (
+    file_path TEXT NOT NULL,
+    part_number INTEGER NOT NULL,
+    etag TEXT NOT NULL,
+    md5 TEXT NOT NULL,
+    PRIMARY KEY (file_path, part_number)
+);
+"""
+
+JSON_COLUMNS = ("digests", "minio_object")
+
+
+def has_reached_stage(entry, stage: str):
+    return entry is not None and JOURNAL_STAGES.index(entry["stage"]) >= JOURNAL_STAGES.index(stage)
+
+
+class UploadJournal(ThreadLocalSQLiteDatabase):
+    # Keeps SQLite's default synchronous=FULL, so that a recorded stage
+    # survives a power loss and not only a crash of the process
+    def __init__(self, journal_file: str):
+        self.journal_file = journal_file
+        super().__init__(journal_file, UPLOAD_JOURNAL_SCHEMA, row_factory=sqlite3.Row)
+
+    def row_to_entry(self, row):
+        entry = dict(row)
+        for column in JSON_COLUMNS:
+            entry[column] = json.loads(entry[column]) if entry[column] else None
+        entry["manifest_updated"] = bool(entry["manifest_updated"])
+        return entry
+
+    def get(self, file_path: str):
+        row = self.get_connection().execute("SELECT * FROM uploads WHERE file_path = ?", (file_path,)).fetchone()
+        return self.row_to_entry(row) if row else None
+
+    # Records that 'file_path' has completed 'stage', along with whatever was
+    # learnt at that stage (digests, did/rev, upload id, ...). Each call is its
+    # own transaction, so the journal never goes backwards after a crash.
+    def record_stage(self, file_path: str, stage: str, **fields):
+        for column in JSON_COLUMNS:
+            if column in fields and fields[column] is not None:
+                fields[column] = json.dumps(fields[column])
+        fields["stage"] = stage
+        fields["updated_at"] = time.time()
+        connection = self.get_connection()
+        with connection:
+            connection.execute("INSERT OR IGNORE INTO uploads (file_path, stage) VALUES (?, ?)", (file_path, STAGE_PENDING))
+            assignments = ", ".join(f"{column} = ?" for column in fields)
+            connection.execute(f"UPDATE uploads SET {assignments} WHERE file_path = ?", (*fields.values(), file_path))
+
+    def record_error(self, file_path: str, error: str):
+        connection = self.get_connection()
+        with connection:
+            connection.execute("INSERT OR IGNORE INTO uploads (file_path, stage) VALUES (?, ?)", (file_path, STAGE_PENDING))
+            connection.execute("UPDATE uploads SET error = ?, updated_at = ? WHERE file_path = ?", (error, time.time(), file_path))
+
+    def record_upload_id(self, file_path: str, object_name: str, upload_id: str):
+        connection = self.get_connection()
+        with connection:
+            connection.execute(
+                "UPDATE uploads SET object_name = ?, upload_id = ?, updated_at = ? WHERE file_path = ?",
+                (object_name, upload_id, time.time(), file_path),
+            )
+
+    def record_part(self, file_path: str, upload_id: str, part):
+        connection = self.get_connection()
+        with connection:
+            connection.execute("UPDATE uploads SET upload_id = ? WHERE file_path = ?", (upload_id, file_path))
+            connection.execute(
+                "INSERT OR REPLACE INTO upload_parts (file_path, part_number, etag, md5) VALUES (?, ?, ?, ?)",
+                (file_path, part["part_number"], part["etag"], part["md5"]),
+            )
+
+    def get_parts(self, file_path: str):
+        rows = self.get_connection().execute(
+            "SELECT part_number, etag, md5 FROM upload_parts WHERE file_path = ?", (file_path,)
+        ).fetchall()
+        return {row["part_number"]: {"etag": row["etag"], "md5": row["md5"]} for row in rows}
+
+    def clear_parts(self, file_path: str):
+        connection = self.get_connection()
+        with connection:
+            connection.execute("DELETE FROM upload_parts WHERE file_path = ?", (file_path,))
+            connection.execute("UPDATE uploads SET upload_id = NULL WHERE file_path = ?", (file_path,))
+
+    # Throws away everything learnt from the file's contents, e.g. because the
+    # file changed on disk, while keeping the blank record so it can be reused
+    def reset_file_contents(self, file_path: str):
+        entry = self.get(file_path)
+        stage = STAGE_BLANK_RECORD_CREATED if entry and entry["did"] else STAGE_PENDING
+        self.clear_parts(file_path)
+        connection = self.get_connection()
+        with connection:
+            connection.execute(
+                "UPDATE uploads SET stage = ?, digests = NULL, minio_object = NULL, manifest_updated = 0, updated_at = ? WHERE file_path = ?",
+                (stage, time.time(), file_path),
+            )
+
+    def mark_manifest_updated(self, file_paths):
+        connection = self.get_connection()
+        with connection:
+            connection.executemany("UPDATE uploads SET manifest_updated = 1 WHERE file_path = ?", [(file_path,) for file_path in file_paths])
+
+    def is_file_unchanged(self, entry, file_path: str):
+        stat = os.stat(file_path)
+        return entry["file_size"] == stat.st_size and entry["file_mtime_ns"] == stat.st_mtime_ns
+
+    def iter_entries(self):
+        for row in self.get_connection().execute("SELECT * FROM uploads ORDER BY file_path"):
+            yield self.row_to_entry(row)
+
+    def get_incomplete_file_paths(self):
+        rows = self.get_connection().execute(
+            "SELECT file_path FROM uploads WHERE stage != ? ORDER BY file_path", (STAGE_INDEX_UPDATED,)
+        ).fetchall()
+        return [row["file_path"] for row in rows]
+
+    def get_entries_awaiting_manifest_update(self):
+        rows = self.get_connection().execute(
+            "SELECT * FROM uploads WHERE manifest_updated = 0 AND minio_object IS NOT NULL ORDER BY file_path"
+        ).fetchall()
+        return [self.row_to_entry(row) for row in rows]
@@ -33,7 +33,9 @@ setuptools.setup(
         "csv",
         "datetime",
         "uuid",
-        "minio"
+        # multipart_upload.py relies on private methods of the 7.2 client
+        "minio>=7.2.7,<7.3",
+        "httpx"
     ],
     packages=setuptools.find_packages(),
     python_requires=">=3.6",
@@ -0,0 +1,105 @@
+"""
+In-memory stand-in for the indexd endpoints the gen3minioclient uses
+"""
+import itertools
+import json
+
+import httpx
+import requests
+
+
+def make_response(status_code: int, body=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(body if body is not None else {}).encode()
+    response.url = "https://gen3.example.org/index/index"
+    return response
+
+
+class FakeIndexd:
+    def __init__(self):
+        self.records = {}
+        self.dids = itertools.count(1)
+        # Set to a status code to make every blank record update fail with it
+        self.update_status_code = None
+        self.list_calls = []
+        # {guid: status code} for records whose deletion fails
+        self.delete_status_codes = {}
+
+    # Adds a complete record, like one indexed from a manifest
+    def add_record(self, did: str, md5=None, size=None, file_name=None, urls=None, acl=None, authz=None, uploader=None):
+        self.records[did] = {
+            "did": did,
+            "rev": "00000001",
+            "file_name": file_name,
+            "hashes": {"md5": md5} if md5 else {},
+            "size": size,
+            "urls": list(urls or []),
+            "acl": list(acl or []),
+            "authz": list(authz or []),
+            "uploader": uploader,
+        }
+
+    def create_blank_record(self, uploader: str, file_name: str):
+        did = f"PREFIX/{next(self.dids):08d}"
+        self.records[did] = {"did": did, "rev": "00000001", "file_name": file_name, "hashes": {}, "size": None}
+        return make_response(201, {"did": did, "rev": "00000001", "baseid": did})
+
+    def update_blank_record(self, did: str, rev: str, hashes: dict, size: int, urls=None, authz=None):
+        if self.update_status_code:
+            return make_response(self.update_status_code, {"error": "indexd is unavailable"})
+        record = self.records[did]
+        if record["rev"] != rev:
+            return make_response(409, {"error": "revision mismatch"})
+        record.update(hashes=hashes, size=size, rev="00000002")
+        return make_response(200, {"did": did, "rev": record["rev"]})
+
+    def get_record(self, guid: str):
+        record = self.records.get(guid)
+        if record is None:
+            return make_response(404, {"error": "no record found"})
+        return make_response(200, record)
+
+    # Pages through the records in did order, by 'page' number or from the
+    # record after 'start', filtered by 'uploader' and 'authz' like indexd
+    def list_records(self, limit: int, start=None, page=None, params=None):
+        params = params or {}
+        self.list_calls.append({"limit": limit, "start": start, "page": page, **params})
+        records = [self.records[did] for did in sorted(self.records)]
+        if "uploader" in params:
+            records = [record for record in records if record.get("uploader") == params["uploader"]]
+        if "authz" in params:
+            records = [record for record in records if set(params["authz"].split(",")) <= set(record.get("authz") or ())]
+        if start is not None:
+            records = [record for record in records if record["did"] > start]
+        offset = (page or 0) * limit
+        return make_response(200, {"records": records[offset:offset + limit]})
+
+    def delete_record(self, guid: str, rev: str):
+        record = self.records.get(guid)
+        if record is None:
+            return make_response(404)
+        if guid in self.delete_status_codes:
+            return make_response(self.delete_status_codes[guid], {"error": "indexd is unavailable"})
+        if record["rev"] != rev:
+            return make_response(409, {"error": "revision mismatch"})
+        del self.records[guid]
+        return make_response(200)
+
+    # Serves the same endpoints over HTTP for the async client, e.g.
+    # httpx.AsyncClient(transport=httpx.MockTransport(indexd.handle_request))
+    def handle_request(self, request: httpx.Request):
+        path = request.url.path.removeprefix("/index/index").strip("/")
+        if request.method == "POST" and path == "blank":
+            body = json.loads(request.content)
+            response = self.create_blank_record(body.get("uploader"), body["file_name"])
+        elif request.method == "PUT" and path.startswith("blank/"):
+            body = json.loads(request.content)
+            response = self.update_blank_record(path.removeprefix("blank/"), request.url.params["rev"], body["hashes"], body["size"], urls=body.get("urls"), authz=body.get("authz"))
+        elif request.method == "GET":
+            response = self.get_record(path)
+        elif request.method == "DELETE":
+            response = self.delete_record(path, request.url.params["rev"])
+        else:
+            response = make_response(405)
+        return httpx.Response(response.status_code, content=response.content, headers={"Content-Type": "application/json"})
@@ -0,0 +1,119 @@
+"""
+In-memory stand-in for the parts of the MinIO client the gen3minioclient uses
+"""
+import hashlib
+import itertools
+from types import SimpleNamespace
+
+from minio.helpers import get_part_info
+
+from gen3minioclient.hashing import calculate_multipart_etag
+
+
+def calculate_etag(data: bytes, part_size: int):
+    # The ETag MinIO gives an object uploaded with 'put_object' or
+    # 'fput_object', which split anything over one part like the SDK does
+    part_size, part_count = get_part_info(len(data), part_size)
+    if part_count <= 1:
+        return hashlib.md5(data).hexdigest()
+    return calculate_multipart_etag([hashlib.md5(data[offset:offset + part_size]).digest() for offset in range(0, len(data), part_size)])
+
+
+class FakeMinio:
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.upload_ids = itertools.count(1)
+        self.list_calls = 0
+        self.remove_objects_calls = []
+        self.presigned_url_count = 0
+        # {object name: error code} for objects 'remove_objects' fails on
+        self.remove_errors = {}
+
+    def add_object(self, bucket_name: str, object_name: str, data: bytes = b"", etag=None):
+        self.objects[(bucket_name, object_name)] = {"data": data, "etag": etag or hashlib.md5(data).hexdigest()}
+
+    def put_object(self, bucket_name, object_name, data, length, part_size=0, **kwargs):
+        data = data.read(length)
+        etag = calculate_etag(data, part_size)
+        self.objects[(bucket_name, object_name)] = {"data": data, "etag": etag}
+        return SimpleNamespace(etag=etag)
+
+    def fput_object(self, bucket_name, object_name, file_path, part_size=0, **kwargs):
+        with open(file_path, "rb") as f:
+            data = f.read()
+        etag = calculate_etag(data, part_size)
+        self.objects[(bucket_name, object_name)] = {"data": data, "etag": etag}
+        return SimpleNamespace(etag=etag)
+
+    def stat_object(self, bucket_name, object_name):
+        obj = self.objects[(bucket_name, object_name)]
+        return SimpleNamespace(object_name=object_name, etag=obj["etag"], size=len(obj["data"]))
+
+    def get_object(self, bucket_name, object_name, offset=0, length=0):
+        data = self.objects[(bucket_name, object_name)]["data"]
+        data = data[offset:offset + length] if length else data[offset:]
+        return SimpleNamespace(
+            stream=lambda chunk_size: (data[start:start + chunk_size] for start in range(0, len(data), chunk_size)),
+            close=lambda: None,
+            release_conn=lambda: None,
+        )
+
+    # Each URL is numbered, so a test can tell a cached URL from a new one
+    def get_presigned_url(self, method, bucket_name, object_name, expires=None, response_headers=None):
+        self.presigned_url_count += 1
+        return f"https://minio.example.org/{bucket_name}/{object_name}?X-Amz-Expires={int(expires.total_seconds())}&method={method}&n={self.presigned_url_count}"
+
+    def remove_object(self, bucket_name, object_name):
+        self.objects.pop((bucket_name, object_name), None)
+
+    # Lazy like the SDK: nothing is removed until the errors are iterated over
+    def remove_objects(self, bucket_name, delete_object_list):
+        from minio.deleteobjects import DeleteError
+
+        names = [delete_object._name for delete_object in delete_object_list]
+        self.remove_objects_calls.append(names)
+        for name in names:
+            if name in self.remove_errors:
+                yield DeleteError(self.remove_errors[name], "could not delete", name, None)
+            else:
+                self.remove_object(bucket_name, name)
+
+    def _create_multipart_upload(self, bucket_name, object_name, headers):
+        upload_id = str(next(self.upload_ids))
+        self.uploads[upload_id] = {}
+        return upload_id
+
+    def _upload_part(self, bucket_name, object_name, data, headers, upload_id, part_number):
+        self.uploads[upload_id][part_number] = bytes(data)
+        return hashlib.md5(data).hexdigest()
+
+    def _complete_multipart_upload(self, bucket_name, object_name, upload_id, parts):
+        uploaded_parts = self.uploads.pop(upload_id)
+        part_data = [uploaded_parts[part.part_number] for part in parts]
+        etag = calculate_multipart_etag([hashlib.md5(data).digest() for data in part_data])
+        self.objects[(bucket_name, object_name)] = {"data": b"".join(part_data), "etag": etag}
+        return SimpleNamespace(etag=etag)
+
+    def _abort_multipart_upload(self, bucket_name, object_name, upload_id):
+        self.uploads.pop(upload_id, None)
+
+    # Listings are served in pages of 'max_keys' like ListObjectsV2, with
+    # 'recursive=False' rolling keys up to the next '/'
+    def list_objects(self, bucket_name, prefix=None, recursive=False, start_after=None, max_keys=1000):
+        prefix = prefix or ""
+        keys = sorted(key for (bucket, key) in self.objects if bucket == bucket_name and key.startswith(prefix) and key > (start_after or ""))
+        entries = []
+        for key in keys:
+            index = -1 if recursive else key.find("/", len(prefix))
+            entry = key if index == -1 else key[:index + 1]
+            if not entries or entries[-1] != entry:
+                entries.append(entry)
+        for page_start in range(0, len(entries) or 1, max_keys):
+            self.list_calls += 1
+            for entry in entries[page_start:page_start + max_keys]:
+                if entry.endswith("/") and not recursive:
+                    yield SimpleNamespace(object_name=entry, etag=None, size=None, is_dir=True)
+                else:
+                    obj = self.objects[(bucket_name, entry)]
+                    yield SimpleNamespace(object_name=entry, etag=f'"{obj["etag"]}"', size=len(obj["data"]), is_dir=False)
@@ -0,0 +1,223 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from gen3minioclient.async_client import AsyncGen3MinioClient
+from gen3minioclient.gen3minioclient import Gen3MinioClient
+from tests.fake_indexd import FakeIndexd
+from tests.fake_minio import FakeMinio
+
+BUCKET_NAME = "test-bucket"
+MINIO_OBJECT = {"md5": "d41d8cd98f00b204e9800998ecf8427e", "file_size": 0}
+
+
+def make_async_client(handler, retries: int = 2):
+    gen3_minio_client = Gen3MinioClient()
+    gen3_minio_client.gen3_commons_url = "https://gen3.example.org"
+    async_client = AsyncGen3MinioClient(gen3_minio_client, retries=retries, backoff_factor=0)
+    async_client.http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    access_token_provider = gen3_minio_client.get_gen3_access_token_provider()
+    access_token_provider.access_token = "token"
+    access_token_provider.expires_at = time.time() + 3600
+    return async_client
+
+
+def run(async_client, coroutine):
+    async def main():
+        async with async_client:
+            return await coroutine
+    return asyncio.run(main())
+
+
+def test_update_blank_index_raises_for_error_status():
+    async_client = make_async_client(lambda request: httpx.Response(409, json={"error": "revision mismatch"}))
+    with pytest.raises(httpx.HTTPStatusError):
+        run(async_client, async_client.update_blank_index("PREFIX/1", "rev", MINIO_OBJECT))
+
+
+def test_update_blank_records_reports_status_codes():
+    def handler(request):
+        did = request.url.path.rsplit("/", 1)[-1]
+        return httpx.Response(200 if did == "1" else 404, json={})
+
+    async_client = make_async_client(handler)
+    results = run(async_client, async_client.update_blank_records([("PREFIX/1", "rev", MINIO_OBJECT), ("PREFIX/2", "rev", MINIO_OBJECT)]))
+
+    assert results == {"PREFIX/1": 200, "PREFIX/2": 404}
+
+
+def count_requests(respond):
+    requests_by_method = {}
+
+    def handler(request):
+        requests_by_method[request.method] = requests_by_method.get(request.method, 0) + 1
+        return respond(request, requests_by_method[request.method])
+
+    return handler, requests_by_method
+
+
+def test_request_retries_idempotent_requests_on_5xx():
+    handler, requests_by_method = count_requests(lambda request, count: httpx.Response(503))
+    async_client = make_async_client(handler)
+
+    response = run(async_client, async_client.request("PUT", "https://gen3.example.org/index/index/blank/1"))
+
+    assert response.status_code == 503
+    assert requests_by_method == {"PUT": 3}
+
+
+def test_request_does_not_retry_post_on_5xx():
+    handler, requests_by_method = count_requests(lambda request, count: httpx.Response(503))
+    async_client = make_async_client(handler)
+
+    response = run(async_client, async_client.create_blank_index("file.bin"))
+
+    assert response.status_code == 503
+    assert requests_by_method == {"POST": 1}
+
+
+def test_request_does_not_retry_post_after_it_was_sent():
+    def respond(request, count):
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    handler, requests_by_method = count_requests(respond)
+    async_client = make_async_client(handler)
+
+    with pytest.raises(httpx.ReadTimeout):
+        run(async_client, async_client.create_blank_index("file.bin"))
+    assert requests_by_method == {"POST": 1}
+
+
+def test_request_retries_post_that_could_not_connect():
+    def respond(request, count):
+        if count == 1:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(201, json={"did": "PREFIX/1", "rev": "rev"})
+
+    handler, requests_by_method = count_requests(respond)
+    async_client = make_async_client(handler)
+
+    response = run(async_client, async_client.create_blank_index("file.bin"))
+
+    assert response.status_code == 201
+    assert requests_by_method == {"POST": 2}
+
+
+def test_access_token_is_fetched_once_and_shared_with_the_sync_client():
+    async_client = make_async_client(lambda request: httpx.Response(200, json={"did": "PREFIX/1", "rev": "rev"}))
+    access_token_provider = async_client.gen3_minio_client.get_gen3_access_token_provider()
+    access_token_provider.access_token = None
+    fetches = []
+
+    def fetch_access_token():
+        fetches.append(1)
+        # A JWT whose only claim is an 'exp' far in the future
+        return "e30.eyJleHAiOiA0MTAyNDQ0ODAwfQ.signature"
+
+    access_token_provider.fetch_access_token = fetch_access_token
+
+    async def fetch_many():
+        return await asyncio.gather(*(async_client.get_gen3_commons_access_token() for _ in range(10)))
+
+    tokens = run(async_client, fetch_many())
+
+    assert len(fetches) == 1
+    assert set(tokens) == {access_token_provider.get_access_token()}
+
+
+def make_streaming_client(minio):
+    indexd = FakeIndexd()
+    async_client = make_async_client(indexd.handle_request)
+    gen3_minio_client = async_client.gen3_minio_client
+    gen3_minio_client.minio_bucket_name = BUCKET_NAME
+    gen3_minio_client.minio_api_endpoint = "minio.example.org"
+    gen3_minio_client.manifest_file_location = None
+    gen3_minio_client.manifest_store_location = None
+    gen3_minio_client.client = minio
+    return async_client, indexd
+
+
+async def iter_chunks(data: bytes):
+    yield data
+
+
+def test_upload_stream_indexes_the_uploaded_object():
+    async_client, indexd = make_streaming_client(FakeMinio())
+
+    result = run(async_client, async_client.upload_stream("file.bin", iter_chunks(b"data")))
+
+    assert result["status"] == "uploaded"
+    assert indexd.records[result["did"]]["hashes"] == {"md5": result["md5"]}
+    assert (BUCKET_NAME, f"{result['did']}/file.bin") in async_client.gen3_minio_client.client.objects
+
+
+def test_failed_stream_upload_deletes_its_blank_record():
+    class FailingMinio(FakeMinio):
+        def put_object(self, *args, **kwargs):
+            raise ConnectionError("connection reset")
+
+    async_client, indexd = make_streaming_client(FailingMinio())
+
+    result = run(async_client, async_client.upload_stream("file.bin", iter_chunks(b"data")))
+
+    assert (result["status"], result["stage"]) == ("failed", "upload")
+    assert result["did"] is not None
+    assert result["blank_record_released"] is True
+    assert indexd.records == {}
+
+
+def test_failed_index_update_deletes_the_blank_record_and_the_object():
+    async_client, indexd = make_streaming_client(FakeMinio())
+    indexd.update_status_code = 503
+
+    result = run(async_client, async_client.upload_stream("file.bin", iter_chunks(b"data")))
+
+    assert (result["status"], result["stage"]) == ("failed", "index update")
+    assert result["blank_record_released"] is True
+    assert indexd.records == {}
+    assert async_client.gen3_minio_client.client.objects == {}
+
+
+def test_blank_record_that_cannot_be_deleted_is_returned():
+    async_client, indexd = make_streaming_client(FakeMinio())
+    indexd.update_status_code = 503
+    indexd.delete_status_codes = {"PREFIX/00000001": 500}
+
+    result = run(async_client, async_client.upload_stream("file.bin", iter_chunks(b"data")))
+
+    assert result["did"] == "PREFIX/00000001"
+    assert result["blank_record_released"] is False
+    assert list(indexd.records) == ["PREFIX/00000001"]
+    # The object is kept while its record still exists
+    assert (BUCKET_NAME, "PREFIX/00000001/file.bin") in async_client.gen3_minio_client.client.objects
+
+
+def test_gateway_closes_the_async_client_and_executor_on_shutdown(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from gen3minioclient import gen3api
+
+    async_client, indexd = make_streaming_client(FakeMinio())
+    monkeypatch.setattr(gen3api, "gen3_minio_client", async_client.gen3_minio_client)
+
+    def get_http_client(self):
+        if self.http_client is None:
+            self.http_client = httpx.AsyncClient(transport=httpx.MockTransport(indexd.handle_request))
+        return self.http_client
+
+    monkeypatch.setattr(AsyncGen3MinioClient, "get_http_client", get_http_client)
+
+    with TestClient(gen3api.app) as client:
+        response = client.put("/uploads/file.bin", content=b"data")
+        assert response.status_code == 201
+        assert response.json()["did"] in indexd.records
+        gateway_client = gen3api.async_gen3_minio_client
+        executor = gen3api.stream_upload_executor
+        assert gateway_client.executor is executor
+
+    assert gateway_client.http_client is None
+    assert executor._shutdown
+    assert gen3api.async_gen3_minio_client is None
+    assert gen3api.stream_upload_executor is None
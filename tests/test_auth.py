@@ -0,0 +1,169 @@
+import base64
+import json
+import threading
+import time
+
+import pytest
+
+from gen3minioclient.auth import Gen3AccessTokenProvider, get_jwt_expiry
+
+COMMONS_URL = "https://gen3.example.org"
+NOW = 1_000_000.0
+
+
+class FakeClock:
+    def __init__(self, now: float = NOW):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_jwt(claims: dict):
+    def encode(part):
+        return base64.urlsafe_b64encode(json.dumps(part).encode()).decode().rstrip("=")
+    return f"{encode({'alg': 'RS256'})}.{encode(claims)}.signature"
+
+
+class FakeResponse:
+    def __init__(self, content: bytes):
+        self.content = content
+
+
+# Stands in for the requests session: answers the Fence access token endpoint
+# with a new token that expires 'lifetime' seconds after the clock's time
+class FakeFence:
+    def __init__(self, clock, lifetime: int = 1200, delay: float = 0):
+        self.clock = clock
+        self.lifetime = lifetime
+        self.delay = delay
+        self.calls = []
+
+    def post(self, url, data=None, verify=None, timeout=None):
+        self.calls.append({"url": url, "data": data})
+        time.sleep(self.delay)
+        claims = {"sub": "1", "jti": str(len(self.calls))}
+        if self.lifetime is not None:
+            claims["exp"] = self.clock() + self.lifetime
+        return FakeResponse(json.dumps({"access_token": make_jwt(claims)}).encode())
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def credentials(tmp_path):
+    path = tmp_path / "credentials.json"
+    path.write_text(json.dumps({"api_key": "secret", "key_id": "key"}))
+    return str(path)
+
+
+def make_provider(credentials, clock, fence, refresh_leeway_seconds: int = 60):
+    return Gen3AccessTokenProvider(COMMONS_URL, credentials, refresh_leeway_seconds=refresh_leeway_seconds, session=fence, clock=clock)
+
+
+def test_get_jwt_expiry_reads_the_exp_claim():
+    assert get_jwt_expiry(make_jwt({"exp": 1234})) == 1234.0
+    assert get_jwt_expiry(make_jwt({"sub": "1"})) is None
+    assert get_jwt_expiry("not-a-jwt") is None
+    assert get_jwt_expiry("a.!!!.c") is None
+
+
+def test_access_token_is_fetched_from_fence_with_the_api_key(credentials, clock):
+    fence = FakeFence(clock)
+    provider = make_provider(credentials, clock, fence)
+
+    token = provider.get_access_token()
+
+    assert fence.calls == [{"url": f"{COMMONS_URL}/user/credentials/cdis/access_token", "data": {"api_key": "secret", "key_id": "key"}}]
+    assert provider.expires_at == NOW + 1200
+    assert get_jwt_expiry(token) == NOW + 1200
+
+
+def test_access_token_is_refreshed_before_the_leeway(credentials, clock):
+    fence = FakeFence(clock)
+    provider = make_provider(credentials, clock, fence)
+    first = provider.get_access_token()
+
+    clock.now = NOW + 1200 - 61
+    assert provider.is_valid()
+    assert provider.get_access_token() == first
+    assert len(fence.calls) == 1
+
+    # Within the leeway the token is treated as expired, although Fence
+    # would still accept it
+    clock.now = NOW + 1200 - 60
+    assert not provider.is_valid()
+    second = provider.get_access_token()
+
+    assert second != first
+    assert len(fence.calls) == 2
+    assert provider.expires_at == clock.now + 1200
+
+
+def test_token_without_expiry_is_fetched_for_every_call(credentials, clock):
+    fence = FakeFence(clock, lifetime=None)
+    provider = make_provider(credentials, clock, fence)
+
+    provider.get_access_token()
+    provider.get_access_token()
+
+    assert not provider.is_valid()
+    assert len(fence.calls) == 2
+
+
+def test_invalidate_forces_a_refresh(credentials, clock):
+    fence = FakeFence(clock)
+    provider = make_provider(credentials, clock, fence)
+    first = provider.get_access_token()
+
+    provider.invalidate()
+
+    assert provider.get_access_token() != first
+    assert len(fence.calls) == 2
+
+
+# Calls 'get_access_token' from many threads at once and returns the tokens
+def get_access_tokens_concurrently(provider, thread_count: int = 16):
+    barrier = threading.Barrier(thread_count)
+    tokens = []
+
+    def get_access_token():
+        barrier.wait()
+        tokens.append(provider.get_access_token())
+
+    threads = [threading.Thread(target=get_access_token) for _ in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return tokens
+
+
+def test_concurrent_callers_share_a_single_refresh(credentials, clock):
+    # The slow response keeps the first refresh in flight while the other
+    # threads ask for a token
+    fence = FakeFence(clock, delay=0.1)
+    provider = make_provider(credentials, clock, fence)
+
+    tokens = get_access_tokens_concurrently(provider)
+
+    assert len(fence.calls) == 1
+    assert len(tokens) == 16
+    assert set(tokens) == {provider.access_token}
+
+
+def test_concurrent_callers_share_a_single_refresh_after_expiry(credentials, clock):
+    fence = FakeFence(clock, delay=0.1)
+    provider = make_provider(credentials, clock, fence)
+    first = provider.get_access_token()
+    clock.now = NOW + 1200
+
+    tokens = get_access_tokens_concurrently(provider)
+
+    assert len(fence.calls) == 2
+    assert set(tokens) == {provider.access_token}
+    assert first not in tokens
+    assert provider.expires_at == NOW + 2400
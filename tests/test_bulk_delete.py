@@ -0,0 +1,157 @@
+import csv
+import time
+
+import httpx
+import pytest
+
+from gen3minioclient.async_client import AsyncGen3MinioClient
+from gen3minioclient.bulk_delete import remove_objects_in_batches
+from gen3minioclient.gen3minioclient import Gen3MinioClient
+from tests.fake_indexd import FakeIndexd
+from tests.fake_minio import FakeMinio
+
+BUCKET_NAME = "test-bucket"
+URL_PREFIX = f"https://minio.example.org/{BUCKET_NAME}/"
+
+
+class RecordCheckingMinio(FakeMinio):
+    # Fails a test that removes an object whose record still exists
+    def __init__(self, indexd):
+        super().__init__()
+        self.indexd = indexd
+
+    def remove_objects(self, bucket_name, delete_object_list):
+        delete_object_list = list(delete_object_list)
+        for delete_object in delete_object_list:
+            guid = delete_object._name.rsplit("/", 1)[0]
+            assert guid not in self.indexd.records
+        return super().remove_objects(bucket_name, delete_object_list)
+
+
+@pytest.fixture
+def gen3_minio_client(monkeypatch):
+    indexd = FakeIndexd()
+    client = Gen3MinioClient()
+    client.gen3_commons_url = "https://gen3.example.org"
+    client.minio_bucket_name = BUCKET_NAME
+    client.minio_api_endpoint = "minio.example.org"
+    client.manifest_file_location = None
+    client.manifest_store_location = None
+    client.client = RecordCheckingMinio(indexd)
+    client._indexd_client = indexd
+    access_token_provider = client.get_gen3_access_token_provider()
+    access_token_provider.access_token = "token"
+    access_token_provider.expires_at = time.time() + 3600
+    monkeypatch.setattr(AsyncGen3MinioClient, "get_http_client", lambda self: httpx.AsyncClient(transport=httpx.MockTransport(indexd.handle_request)))
+    return client
+
+
+def add_uploaded_file(gen3_minio_client, guid, file_name, with_url=True):
+    object_name = f"{guid}/{file_name}"
+    gen3_minio_client.client.add_object(BUCKET_NAME, object_name, file_name.encode())
+    gen3_minio_client._indexd_client.add_record(guid, md5="0" * 32, urls=[URL_PREFIX + object_name] if with_url else [])
+    # The record has been updated since it was created, so deleting it
+    # needs the rev looked up from indexd
+    gen3_minio_client._indexd_client.records[guid]["rev"] = "00000002"
+    return object_name
+
+
+def object_names(gen3_minio_client):
+    return sorted(object_name for _, object_name in gen3_minio_client.client.objects)
+
+
+def test_records_are_deleted_before_their_objects(gen3_minio_client, tmp_path):
+    add_uploaded_file(gen3_minio_client, "dg/1", "one.bin")
+    add_uploaded_file(gen3_minio_client, "dg/2", "two.bin")
+    kept = add_uploaded_file(gen3_minio_client, "dg/3", "three.bin")
+    report_file = str(tmp_path / "report.tsv")
+
+    results = gen3_minio_client.delete_records_and_objects(["dg/1", "dg/2", "dg/1"], report_file=report_file)
+
+    assert [(result["guid"], result["rev"], result["record_status"], result["object_status"]) for result in results] == [
+        ("dg/1", "00000002", "deleted", "deleted"),
+        ("dg/2", "00000002", "deleted", "deleted"),
+    ]
+    assert list(gen3_minio_client._indexd_client.records) == ["dg/3"]
+    assert object_names(gen3_minio_client) == [kept]
+    with open(report_file, newline="") as f:
+        assert [row["guid"] for row in csv.DictReader(f, delimiter="\t")] == ["dg/1", "dg/2"]
+
+
+def test_objects_are_kept_when_their_record_could_not_be_deleted(gen3_minio_client):
+    add_uploaded_file(gen3_minio_client, "dg/1", "one.bin")
+    kept = add_uploaded_file(gen3_minio_client, "dg/2", "two.bin")
+    gen3_minio_client._indexd_client.delete_status_codes = {"dg/2": 403}
+
+    results = gen3_minio_client.delete_records_and_objects(["dg/1", "dg/2", "dg/missing"])
+
+    assert [(result["record_status"], result["object_status"]) for result in results] == [
+        ("deleted", "deleted"),
+        ("failed", "skipped"),
+        ("not_found", "none"),
+    ]
+    assert "403" in results[1]["error"]
+    assert object_names(gen3_minio_client) == [kept]
+
+
+def test_records_without_urls_fall_back_to_their_guid_prefix(gen3_minio_client):
+    object_name = add_uploaded_file(gen3_minio_client, "dg/1", "one.bin", with_url=False)
+    # Shares the prefix as a string but not as a '/' level
+    kept = add_uploaded_file(gen3_minio_client, "dg/10", "ten.bin")
+
+    [result] = gen3_minio_client.delete_records_and_objects(["dg/1"])
+
+    assert result["object_names"] == [object_name]
+    assert result["object_status"] == "deleted"
+    assert object_names(gen3_minio_client) == [kept]
+
+
+def test_manifest_urls_are_removed_with_the_record_urls(gen3_minio_client, tmp_path):
+    add_uploaded_file(gen3_minio_client, "dg/1", "one.bin")
+    gen3_minio_client.client.add_object(BUCKET_NAME, "copies/one.bin", b"one.bin")
+    manifest_file = str(tmp_path / "manifest.tsv")
+    with open(manifest_file, "w") as f:
+        writer = csv.DictWriter(f, fieldnames=Gen3MinioClient.MANIFEST_FIELDS, delimiter="\t")
+        writer.writeheader()
+        writer.writerow({"guid": "dg/1", "urls": [URL_PREFIX + "copies/one.bin"], "md5": "0" * 32, "file_size": 7, "file_name": "one.bin"})
+
+    [result] = gen3_minio_client.delete_records_and_objects(manifest_file=manifest_file)
+
+    assert result["object_names"] == ["copies/one.bin", "dg/1/one.bin"]
+    assert object_names(gen3_minio_client) == []
+
+
+def test_keep_objects_only_deletes_records(gen3_minio_client):
+    object_name = add_uploaded_file(gen3_minio_client, "dg/1", "one.bin")
+
+    [result] = gen3_minio_client.delete_records_and_objects(["dg/1"], delete_objects=False)
+
+    assert (result["record_status"], result["object_status"]) == ("deleted", "skipped")
+    assert gen3_minio_client._indexd_client.records == {}
+    assert object_names(gen3_minio_client) == [object_name]
+    assert gen3_minio_client.client.remove_objects_calls == []
+
+
+def test_objects_minio_could_not_remove_are_reported(gen3_minio_client):
+    object_name = add_uploaded_file(gen3_minio_client, "dg/1", "one.bin")
+    gen3_minio_client.client.remove_errors = {object_name: "AccessDenied"}
+
+    [result] = gen3_minio_client.delete_records_and_objects(["dg/1"])
+
+    assert (result["record_status"], result["object_status"]) == ("deleted", "failed")
+    assert "AccessDenied" in result["error"]
+
+
+def test_remove_objects_in_batches_of_1000_keys():
+    client = FakeMinio()
+    names = [f"dg/{number}/file.bin" for number in range(2500)]
+    for name in names:
+        client.add_object(BUCKET_NAME, name)
+    client.remove_errors = {names[1500]: "AccessDenied"}
+
+    errors = remove_objects_in_batches(client, BUCKET_NAME, iter(names))
+
+    assert [len(batch) for batch in client.remove_objects_calls] == [1000, 1000, 500]
+    assert [name for batch in client.remove_objects_calls for name in batch] == names
+    assert errors == {names[1500]: "AccessDenied: could not delete"}
+    assert list(client.objects) == [(BUCKET_NAME, names[1500])]
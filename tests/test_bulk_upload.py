@@ -0,0 +1,188 @@
+import csv
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from gen3minioclient.bulk_upload import (
+    InFlightByteLimiter,
+    collect_file_paths_from_directory,
+    collect_file_paths_from_list,
+    summarise_upload_results,
+    upload_files_in_parallel,
+)
+from gen3minioclient.gen3minioclient import Gen3MinioClient
+from tests.fake_indexd import FakeIndexd
+from tests.fake_minio import FakeMinio
+
+BUCKET_NAME = "test-bucket"
+TIMEOUT_SECONDS = 10
+
+
+@pytest.fixture
+def gen3_minio_client():
+    client = Gen3MinioClient()
+    client.minio_bucket_name = BUCKET_NAME
+    client.minio_api_endpoint = "minio.example.org"
+    client.manifest_file_location = None
+    client.manifest_store_location = None
+    client.hash_cache_location = None
+    client.multipart_upload = False
+    client.client = FakeMinio()
+    client._indexd_client = FakeIndexd()
+    return client
+
+
+def write_files(directory, sizes: dict):
+    file_paths = []
+    for file_name, size in sizes.items():
+        path = directory / file_name
+        path.write_bytes(os.urandom(size))
+        file_paths.append(str(path))
+    return file_paths
+
+
+# A fake 'upload_file' that records how many bytes were in flight whenever a
+# file started, and which files overlapped
+class RecordingUpload:
+    def __init__(self, duration: float = 0.05):
+        self.duration = duration
+        self.in_flight = {}
+        self.max_in_flight_bytes = 0
+        self.overlaps = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, file_path):
+        file_size = os.path.getsize(file_path)
+        with self.lock:
+            self.overlaps[file_path] = set(self.in_flight)
+            for other_file_path in self.in_flight:
+                self.overlaps[other_file_path].add(file_path)
+            self.in_flight[file_path] = file_size
+            self.max_in_flight_bytes = max(self.max_in_flight_bytes, sum(self.in_flight.values()))
+        time.sleep(self.duration)
+        with self.lock:
+            del self.in_flight[file_path]
+        return {"file_path": file_path, "file_name": os.path.basename(file_path), "status": "uploaded", "file_size": file_size}
+
+
+# Runs 'upload_files_in_parallel' with a timeout, so that a deadlock fails the
+# test instead of hanging it
+def upload_in_parallel(upload_file, file_paths, **kwargs):
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(upload_files_in_parallel, upload_file, file_paths, **kwargs)
+    try:
+        return future.result(timeout=TIMEOUT_SECONDS)
+    finally:
+        executor.shutdown(wait=False)
+
+
+def test_limiter_blocks_until_there_is_room():
+    limiter = InFlightByteLimiter(100)
+    limiter.acquire(60)
+    acquired = threading.Event()
+
+    def acquire():
+        limiter.acquire(60)
+        acquired.set()
+
+    thread = threading.Thread(target=acquire)
+    thread.start()
+    assert not acquired.wait(0.1)
+
+    limiter.release(60)
+    assert acquired.wait(TIMEOUT_SECONDS)
+    thread.join()
+    assert limiter.in_flight_bytes == 60
+
+
+def test_limiter_lets_a_file_larger_than_the_budget_through_alone():
+    limiter = InFlightByteLimiter(100)
+
+    # Nothing else is in flight, so it does not wait
+    limiter.acquire(500)
+    assert limiter.in_flight_bytes == 500
+
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: (limiter.acquire(1), acquired.set()))
+    thread.start()
+    assert not acquired.wait(0.1)
+    limiter.release(500)
+    assert acquired.wait(TIMEOUT_SECONDS)
+    thread.join()
+
+
+def test_uploads_stay_within_the_byte_budget(tmp_path):
+    file_paths = write_files(tmp_path, {f"file_{i}.bin": 400 for i in range(8)})
+    upload = RecordingUpload()
+
+    results = upload_in_parallel(upload, file_paths, max_workers=8, max_in_flight_bytes=1000)
+
+    assert sorted(result["file_path"] for result in results) == sorted(file_paths)
+    # Two files fit in the budget, a third does not
+    assert upload.max_in_flight_bytes == 800
+
+
+def test_file_larger_than_the_budget_is_uploaded_alone(tmp_path):
+    file_paths = write_files(tmp_path, {"small_1.bin": 10, "large.bin": 5000, "small_2.bin": 10, "small_3.bin": 10})
+    large_file_path = str(tmp_path / "large.bin")
+    upload = RecordingUpload()
+
+    results = upload_in_parallel(upload, file_paths, max_workers=4, max_in_flight_bytes=1000)
+
+    assert summarise_upload_results(results) == {"uploaded": 4, "skipped": 0, "failed": 0}
+    assert upload.overlaps[large_file_path] == set()
+    assert upload.max_in_flight_bytes == 5000
+
+
+def test_missing_file_is_reported_without_stopping_the_others(tmp_path):
+    file_paths = write_files(tmp_path, {"a.bin": 10, "b.bin": 10})
+    missing_file_path = str(tmp_path / "missing.bin")
+
+    results = upload_in_parallel(RecordingUpload(duration=0), file_paths + [missing_file_path], max_workers=2, max_in_flight_bytes=1000)
+
+    results_by_path = {result["file_path"]: result for result in results}
+    assert set(results_by_path) == set(file_paths + [missing_file_path])
+    assert results_by_path[missing_file_path]["status"] == "failed"
+    assert results_by_path[missing_file_path]["stage"] == "hashing"
+    assert summarise_upload_results(results) == {"uploaded": 2, "skipped": 0, "failed": 1}
+
+
+def test_upload_report_has_a_row_per_file(gen3_minio_client, tmp_path):
+    upload_dir = tmp_path / "upload"
+    upload_dir.mkdir()
+    file_paths = write_files(upload_dir, {"new.bin": 1024, "duplicate.bin": 16})
+    gen3_minio_client.client.add_object(BUCKET_NAME, "PREFIX/existing/duplicate.bin", b"already uploaded")
+    gen3_minio_client.list_bucket_for_existence_check = True
+    missing_file_path = str(upload_dir / "missing.bin")
+    report_file = tmp_path / "report.tsv"
+
+    gen3_minio_client.upload_files_and_update_records(
+        file_paths + [missing_file_path],
+        str(tmp_path / "manifest.tsv"),
+        max_workers=2,
+        max_in_flight_bytes=512,
+        report_file=str(report_file),
+    )
+
+    with open(report_file) as f:
+        rows = {row["file_name"]: row for row in csv.DictReader(f, delimiter="\t")}
+    assert {file_name: row["status"] for file_name, row in rows.items()} == {"new.bin": "uploaded", "duplicate.bin": "skipped", "missing.bin": "failed"}
+    assert rows["new.bin"]["did"] in gen3_minio_client._indexd_client.records
+    assert rows["new.bin"]["file_size"] == "1024"
+    assert rows["missing.bin"]["stage"] == "hashing"
+    assert rows["missing.bin"]["error"]
+
+
+def test_collect_file_paths(tmp_path):
+    write_files(tmp_path, {"b.bin": 1, "a.bin": 1})
+    (tmp_path / "nested").mkdir()
+    write_files(tmp_path / "nested", {"c.bin": 1})
+    upload_list_file = tmp_path / "upload_list.txt"
+    upload_list_file.write_text("# files to upload\n/data/a.bin\n\n  /data/b.bin  \n")
+
+    assert collect_file_paths_from_directory(str(tmp_path / "nested")) == [str(tmp_path / "nested" / "c.bin")]
+    assert collect_file_paths_from_directory(str(tmp_path))[:2] == [str(tmp_path / "a.bin"), str(tmp_path / "b.bin")]
+    assert collect_file_paths_from_list(str(upload_list_file)) == ["/data/a.bin", "/data/b.bin"]
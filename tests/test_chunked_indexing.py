@@ -0,0 +1,162 @@
+import csv
+
+import pytest
+
+from gen3minioclient.chunked_indexing import IndexingCheckpoint, index_in_batches
+from gen3minioclient.gen3minioclient import Gen3MinioClient
+from tests.fake_indexd import FakeIndexd
+
+MANIFEST_FIELDS = Gen3MinioClient.MANIFEST_FIELDS
+
+
+def make_row(number, guid=True):
+    return {
+        "guid": f"dg/{number}" if guid else "",
+        "urls": [f"https://minio.example.org/test-bucket/dg/{number}/file-{number}.bin"],
+        "authz": [],
+        "acl": ["*"],
+        "md5": f"{number:032x}",
+        "file_size": number,
+        "file_name": f"file-{number}.bin",
+    }
+
+
+class FakeIndexObjectManifest:
+    # Stands in for gen3's 'index_object_manifest', indexing every row of the
+    # batch file into a FakeIndexd
+    def __init__(self, indexd):
+        self.indexd = indexd
+        self.indexed_guids = []
+        # guid: md5 that indexd ends up with instead of the row's
+        self.wrong_md5 = {}
+        # Raised when a batch with this guid is indexed
+        self.interrupt_at = None
+
+    def __call__(self, manifest_file, **kwargs):
+        files = []
+        with open(manifest_file, newline="") as f:
+            rows = list(csv.DictReader(f, delimiter="\t"))
+        for row in rows:
+            if row["guid"] == self.interrupt_at:
+                raise KeyboardInterrupt
+        for row in rows:
+            guid = row["guid"] or f"dg/new-{row['file_name']}"
+            self.indexd.add_record(guid, md5=self.wrong_md5.get(guid, row["md5"]), size=int(row["file_size"]))
+            self.indexed_guids.append(row["guid"] or guid)
+            files.append({"guid": guid, "md5": row["md5"]})
+        return files, []
+
+
+@pytest.fixture
+def gen3_minio_client(monkeypatch):
+    import gen3.tools.indexing.index_manifest
+
+    client = Gen3MinioClient()
+    client.manifest_file_location = None
+    client.manifest_store_location = None
+    client.indexing_batch_size = 2
+    client.indexing_batch_workers = 1
+    client.indexing_threads = 2
+    client._indexd_client = FakeIndexd()
+    client._gen3_auth = object()
+    client.index_object_manifest = FakeIndexObjectManifest(client._indexd_client)
+    monkeypatch.setattr(gen3.tools.indexing.index_manifest, "index_object_manifest", client.index_object_manifest)
+    return client
+
+
+def write_manifest(manifest_file, rows):
+    with open(manifest_file, "w") as f:
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_FIELDS, delimiter="\t")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def iter_manifest_rows(gen3_minio_client, manifest_file):
+    return list(gen3_minio_client.iter_minio_manifest_file(manifest_file))
+
+
+def test_checkpoint_keys_rows_by_guid_and_md5(tmp_path):
+    checkpoint = IndexingCheckpoint(str(tmp_path / "checkpoint.sqlite"))
+    rows = [make_row(1), make_row(2), make_row(3, guid=False)]
+
+    checkpoint.mark_indexed([rows[0], rows[2]])
+
+    assert checkpoint.filter_unindexed(rows) == [rows[1]]
+    # A row whose object has changed is indexed again
+    changed_row = {**rows[0], "md5": "f" * 32}
+    assert checkpoint.filter_unindexed([changed_row]) == [changed_row]
+    assert IndexingCheckpoint(checkpoint.checkpoint_file).count() == 2
+
+
+def test_failed_batches_are_not_recorded(tmp_path):
+    checkpoint = IndexingCheckpoint(str(tmp_path / "checkpoint.sqlite"))
+    rows = [make_row(number) for number in range(1, 6)]
+    report_file = str(tmp_path / "report.tsv")
+
+    def index_batch(batch_number, batch):
+        if batch_number == 2:
+            raise RuntimeError("indexd is unavailable")
+        return batch[:1]
+
+    summary = index_in_batches(iter(rows), index_batch, checkpoint, batch_size=2, batch_workers=2, report_file=report_file)
+
+    assert summary == {"batches": 3, "rows": 5, "skipped": 0, "indexed": 2, "failed": 3}
+    assert checkpoint.filter_unindexed(rows) == [rows[1], rows[2], rows[3]]
+    with open(report_file, newline="") as f:
+        report = sorted(csv.DictReader(f, delimiter="\t"), key=lambda row: int(row["batch"]))
+    assert [(row["batch"], row["rows"], row["indexed"]) for row in report] == [("1", "2", "1"), ("2", "2", "0"), ("3", "1", "1")]
+
+
+def test_interrupted_run_is_resumed_without_indexing_recorded_rows_again(gen3_minio_client, tmp_path):
+    manifest_file = str(tmp_path / "manifest.tsv")
+    rows = [make_row(number) for number in range(1, 8)]
+    write_manifest(manifest_file, rows)
+    index_object_manifest = gen3_minio_client.index_object_manifest
+    index_object_manifest.interrupt_at = "dg/5"
+
+    with pytest.raises(KeyboardInterrupt):
+        gen3_minio_client.index_manifest_in_batches(manifest_file)
+
+    checkpoint = IndexingCheckpoint(f"{manifest_file}.indexing.sqlite")
+    unrecorded_guids = [row["guid"] for row in checkpoint.filter_unindexed(iter_manifest_rows(gen3_minio_client, manifest_file))]
+    assert index_object_manifest.indexed_guids[:2] == ["dg/1", "dg/2"]
+    assert "dg/1" not in unrecorded_guids
+    assert {"dg/5", "dg/6"} <= set(unrecorded_guids)
+
+    index_object_manifest.interrupt_at = None
+    index_object_manifest.indexed_guids = []
+    summary = gen3_minio_client.index_manifest_in_batches(manifest_file)
+
+    assert index_object_manifest.indexed_guids == unrecorded_guids
+    assert (summary["skipped"], summary["indexed"], summary["failed"]) == (7 - len(unrecorded_guids), len(unrecorded_guids), 0)
+    assert checkpoint.count() == 7
+
+
+def test_rows_indexd_has_with_another_md5_are_indexed_again(gen3_minio_client, tmp_path):
+    manifest_file = str(tmp_path / "manifest.tsv")
+    checkpoint_file = str(tmp_path / "checkpoint.sqlite")
+    write_manifest(manifest_file, [make_row(1), make_row(2), make_row(3, guid=False)])
+    index_object_manifest = gen3_minio_client.index_object_manifest
+    index_object_manifest.wrong_md5 = {"dg/2": "e" * 32}
+
+    summary = gen3_minio_client.index_manifest_in_batches(manifest_file, checkpoint_file=checkpoint_file)
+
+    assert (summary["indexed"], summary["failed"]) == (2, 1)
+
+    index_object_manifest.wrong_md5 = {}
+    index_object_manifest.indexed_guids = []
+    summary = gen3_minio_client.index_manifest_in_batches(manifest_file, checkpoint_file=checkpoint_file)
+
+    assert index_object_manifest.indexed_guids == ["dg/2"]
+    assert (summary["skipped"], summary["indexed"], summary["failed"]) == (2, 1, 0)
+
+
+def test_rows_without_a_guid_are_matched_by_md5(gen3_minio_client):
+    indexd = gen3_minio_client._indexd_client
+    rows = [make_row(1, guid=False), make_row(2, guid=False)]
+    indexd.add_record("dg/created", md5=rows[0]["md5"])
+    indexd.add_record("dg/other", md5="e" * 32)
+
+    indexed_rows = gen3_minio_client.get_indexed_manifest_rows(rows, [{"guid": "dg/created", "md5": rows[0]["md5"]}, {"guid": "dg/other", "md5": rows[1]["md5"]}])
+
+    assert indexed_rows == [rows[0]]
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from gen3minioclient.concurrency import AdaptiveConcurrencyLimiter
+
+
+def test_healthy_requests_grow_the_limit_by_about_one_per_round():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=100)
+
+    async def run():
+        for _ in range(4):
+            await limiter.acquire()
+            await limiter.release(0.01, healthy=True)
+
+    asyncio.run(run())
+
+    assert 4.8 < limiter.limit < 5.0
+    assert limiter.summary()["successes"] == 4
+
+
+def test_the_limit_stays_within_its_bounds():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, min_limit=2, max_limit=3)
+
+    async def run():
+        for _ in range(20):
+            await limiter.acquire()
+            await limiter.release(0.01, healthy=True)
+        assert limiter.limit == 3
+        limiter.last_decrease = 0.0
+        await limiter.acquire()
+        await limiter.release(0.01, healthy=False)
+        limiter.last_decrease = 0.0
+        await limiter.acquire()
+        await limiter.release(0.01, healthy=False)
+
+    asyncio.run(run())
+
+    assert limiter.limit == 2
+
+
+def test_errors_halve_the_limit_once_per_round_trip():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=16)
+
+    async def run():
+        await limiter.acquire()
+        await limiter.release(0.01, healthy=True)
+        for _ in range(3):
+            await limiter.acquire()
+            await limiter.release(10.0, healthy=False)
+
+    asyncio.run(run())
+
+    assert 8 <= limiter.limit < 9
+    assert limiter.summary()["errors"] == 3
+
+
+def test_slow_requests_halve_the_limit():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=16, latency_tolerance=3.0)
+
+    async def run():
+        await limiter.acquire()
+        await limiter.release(0.001, healthy=True)
+        await limiter.acquire()
+        await limiter.release(0.01, healthy=True)
+
+    asyncio.run(run())
+
+    assert 8 <= limiter.limit < 9
+
+
+def test_slots_never_exceed_the_limit_and_exceptions_count_as_errors():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=3, max_limit=3)
+    peak = 0
+
+    async def request(fail: bool):
+        nonlocal peak
+        async with limiter.slot():
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.001)
+            if fail:
+                raise RuntimeError("request failed")
+
+    async def run():
+        return await asyncio.gather(*(request(i == 5) for i in range(20)), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert peak <= 3
+    assert limiter.in_flight == 0
+    assert sum(isinstance(result, RuntimeError) for result in results) == 1
+    assert limiter.summary()["errors"] == 1
+
+
+def test_unhealthy_slots_count_as_errors():
+    limiter = AdaptiveConcurrencyLimiter()
+
+    async def run():
+        async with limiter.slot() as slot:
+            slot["healthy"] = False
+
+    asyncio.run(run())
+
+    assert limiter.summary()["errors"] == 1
+    assert limiter.limit == pytest.approx(4)
@@ -0,0 +1,121 @@
+import hashlib
+import os
+from csv import DictReader, DictWriter
+
+import pytest
+
+from gen3minioclient.gen3minioclient import Gen3MinioClient
+from tests.fake_minio import FakeMinio
+
+BUCKET_NAME = "test-bucket"
+
+
+@pytest.fixture
+def gen3_minio_client():
+    client = Gen3MinioClient()
+    client.minio_bucket_name = BUCKET_NAME
+    client.manifest_store_location = None
+    client.client = FakeMinio()
+    return client
+
+
+def add_download_request(gen3_minio_client, guid: str, file_name: str, data: bytes = b"data"):
+    object_name = f"{guid}/object.bin"
+    gen3_minio_client.client.add_object(BUCKET_NAME, object_name, data)
+    return {"guid": guid, "file_name": file_name, "object_name": object_name, "md5": hashlib.md5(data).hexdigest(), "file_size": len(data)}
+
+
+@pytest.mark.parametrize("file_name", ["../escaped.bin", "/tmp/escaped.bin", "nested/../../escaped.bin"])
+def test_download_file_keeps_only_the_last_component_of_the_file_name(gen3_minio_client, tmp_path, file_name):
+    output_dir = tmp_path / "output"
+    download_request = add_download_request(gen3_minio_client, "guid-1", file_name)
+
+    result = gen3_minio_client.download_file(download_request, str(output_dir))
+
+    assert result["status"] == "downloaded"
+    assert result["file_path"] == os.path.join(str(output_dir), "escaped.bin")
+    assert (output_dir / "escaped.bin").read_bytes() == b"data"
+    assert not (tmp_path / "escaped.bin").exists()
+
+
+def test_download_file_refuses_paths_outside_output_dir(gen3_minio_client, tmp_path):
+    output_dir = tmp_path / "output"
+    download_request = add_download_request(gen3_minio_client, "../..", "file.bin")
+    download_request["file_path"] = os.path.join(str(output_dir), "..", "file.bin")
+
+    result = gen3_minio_client.download_file(download_request, str(output_dir))
+
+    assert result["status"] == "failed"
+    assert "outside" in result["error"]
+    assert not (tmp_path / "file.bin").exists()
+
+
+def test_download_files_puts_clashing_names_in_guid_directories(gen3_minio_client, tmp_path):
+    output_dir = tmp_path / "output"
+    download_requests = [
+        add_download_request(gen3_minio_client, "guid-1", "../file.bin", b"one"),
+        add_download_request(gen3_minio_client, "guid-2", "file.bin", b"two"),
+    ]
+    gen3_minio_client.get_download_requests = lambda manifest_file=None, guids=None: download_requests
+
+    results = gen3_minio_client.download_files(guids=["guid-1", "guid-2"], output_dir=str(output_dir))
+
+    assert [result["status"] for result in results] == ["downloaded", "downloaded"]
+    assert (output_dir / "guid-1" / "file.bin").read_bytes() == b"one"
+    assert (output_dir / "guid-2" / "file.bin").read_bytes() == b"two"
+
+
+def test_download_files_reports_rows_without_a_guid_as_failed(gen3_minio_client, tmp_path):
+    output_dir = tmp_path / "output"
+    manifest_file = tmp_path / "manifest.tsv"
+    rows = []
+    for guid, data in [("guid-1", b"one"), ("", b"two")]:
+        download_request = add_download_request(gen3_minio_client, guid or "missing", "file.bin", data)
+        rows.append({
+            "guid": guid,
+            "urls": f"['https://minio.example.org/{BUCKET_NAME}/{download_request['object_name']}']",
+            "md5": download_request["md5"],
+            "file_size": download_request["file_size"],
+            "file_name": "file.bin",
+        })
+    with open(manifest_file, "w") as f:
+        writer = DictWriter(f, fieldnames=Gen3MinioClient.MANIFEST_FIELDS, delimiter="\t", restval="")
+        writer.writeheader()
+        writer.writerows(rows)
+    report_file = tmp_path / "report.tsv"
+
+    results = gen3_minio_client.download_files(manifest_file=str(manifest_file), output_dir=str(output_dir), report_file=str(report_file))
+
+    statuses = {result["guid"]: result["status"] for result in results}
+    assert statuses == {"guid-1": "downloaded", "": "failed"}
+    assert "has no GUID" in [result for result in results if not result["guid"]][0]["error"]
+    assert (output_dir / "guid-1" / "file.bin").read_bytes() == b"one"
+    assert sorted(os.listdir(output_dir)) == ["guid-1"]
+    with open(report_file) as f:
+        assert sorted(row["status"] for row in DictReader(f, delimiter="\t")) == ["downloaded", "failed"]
+
+
+def test_download_file_refuses_a_request_without_a_guid(gen3_minio_client, tmp_path):
+    download_request = add_download_request(gen3_minio_client, "missing", "file.bin")
+    download_request["guid"] = None
+
+    result = gen3_minio_client.download_file(download_request, str(tmp_path))
+
+    assert result["status"] == "failed"
+    assert "has no GUID" in result["error"]
+    assert not (tmp_path / "file.bin").exists()
+
+
+def test_download_files_reports_a_clashing_name_without_a_guid_as_failed(gen3_minio_client, tmp_path):
+    output_dir = tmp_path / "output"
+    download_requests = [
+        add_download_request(gen3_minio_client, "guid-1", "file.bin", b"one"),
+        add_download_request(gen3_minio_client, "missing", "file.bin", b"two"),
+    ]
+    download_requests[1]["guid"] = None
+    gen3_minio_client.get_download_requests = lambda manifest_file=None, guids=None: download_requests
+
+    results = gen3_minio_client.download_files(manifest_file="manifest.tsv", output_dir=str(output_dir))
+
+    assert {result["guid"]: result["status"] for result in results} == {"guid-1": "downloaded", None: "failed"}
+    assert (output_dir / "guid-1" / "file.bin").read_bytes() == b"one"
@@ -0,0 +1,82 @@
+import hashlib
+import os
+
+import pytest
+
+from gen3minioclient.hash_cache import HashCache
+from gen3minioclient.hashing import MIN_PART_SIZE
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return HashCache(str(tmp_path / "hash_cache.db"))
+
+
+@pytest.fixture
+def file_path(tmp_path):
+    path = tmp_path / "file.bin"
+    path.write_bytes(b"contents")
+    return str(path)
+
+
+def test_second_lookup_is_a_hit_and_survives_reopening(cache, file_path):
+    digests, cached = cache.get_file_digests(file_path)
+
+    assert not cached
+    assert digests["md5"] == hashlib.md5(b"contents").hexdigest()
+    assert cache.get_file_digests(file_path) == (digests, True)
+    assert HashCache(cache.cache_file).get_file_digests(file_path) == (digests, True)
+
+
+def test_a_changed_size_is_a_miss(cache, file_path):
+    cache.get_file_digests(file_path)
+    stat = os.stat(file_path)
+    with open(file_path, "wb") as f:
+        f.write(b"longer contents")
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    digests, cached = cache.get_file_digests(file_path)
+
+    assert not cached
+    assert digests["md5"] == hashlib.md5(b"longer contents").hexdigest()
+
+
+def test_a_changed_mtime_is_a_miss(cache, file_path):
+    cache.get_file_digests(file_path)
+    stat = os.stat(file_path)
+    with open(file_path, "wb") as f:
+        f.write(b"CONTENTS")
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    digests, cached = cache.get_file_digests(file_path)
+
+    assert not cached
+    assert digests["md5"] == hashlib.md5(b"CONTENTS").hexdigest()
+
+
+def test_a_replaced_file_is_a_miss(cache, file_path, tmp_path):
+    cache.get_file_digests(file_path)
+    stat = os.stat(file_path)
+    replacement = tmp_path / "replacement.bin"
+    replacement.write_bytes(b"CONTENTS")
+    os.utime(replacement, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(replacement, file_path)
+
+    assert not cache.get_file_digests(file_path)[1]
+
+
+def test_entries_are_kept_per_part_size(cache, file_path):
+    cache.get_file_digests(file_path)
+
+    assert not cache.get_file_digests(file_path, part_size=MIN_PART_SIZE)[1]
+    assert cache.get_file_digests(file_path, part_size=MIN_PART_SIZE)[1]
+
+
+def test_sha256_requests_miss_entries_without_one(cache, file_path):
+    cache.get_file_digests(file_path)
+
+    digests, cached = cache.get_file_digests(file_path, sha256=True)
+
+    assert not cached
+    assert digests["sha256"] == hashlib.sha256(b"contents").hexdigest()
+    assert cache.get_file_digests(file_path)[1]
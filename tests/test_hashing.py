@@ -0,0 +1,61 @@
+import hashlib
+import os
+
+import pytest
+from minio.helpers import get_part_info
+
+from gen3minioclient.hashing import MIN_PART_SIZE, calculate_file_digests, calculate_multipart_etag, get_minio_part_size
+from tests.fake_minio import calculate_etag
+
+MEBIBYTE = 1024 * 1024
+
+
+@pytest.mark.parametrize("file_size", [0, 1, MIN_PART_SIZE, MIN_PART_SIZE + 1, 3 * MIN_PART_SIZE - 1, 100 * MEBIBYTE, 10000 * MIN_PART_SIZE + 1, 5 * 1024 ** 4])
+@pytest.mark.parametrize("part_size", [0, MIN_PART_SIZE, 8 * MEBIBYTE])
+def test_part_size_matches_minio(file_size, part_size):
+    if part_size and file_size > 10000 * part_size:
+        pytest.skip("MinIO refuses more than 10000 parts")
+    minio_part_size, minio_part_count = get_part_info(file_size, part_size)
+    part_size, part_count = get_minio_part_size(file_size, part_size)
+
+    # An empty file is sent as one empty part, whatever size MinIO reports
+    assert part_count == minio_part_count
+    if file_size:
+        assert part_size == minio_part_size
+
+
+def test_multipart_etag_of_one_part_is_its_md5():
+    md5 = hashlib.md5(b"data").digest()
+    assert calculate_multipart_etag([md5]) == md5.hex()
+
+
+def test_multipart_etag_is_md5_of_part_digests_and_count():
+    part_digests = [hashlib.md5(part).digest() for part in (b"one", b"two", b"three")]
+    assert calculate_multipart_etag(part_digests) == f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-3"
+
+
+@pytest.mark.parametrize("file_size", [0, 100, MIN_PART_SIZE, MIN_PART_SIZE + 1, 2 * MIN_PART_SIZE + 12345])
+@pytest.mark.parametrize("chunk_size", [MEBIBYTE, 3 * 1024 * 1024 + 7])
+def test_file_digests_match_minio_etag(tmp_path, file_size, chunk_size):
+    data = os.urandom(file_size)
+    file_path = tmp_path / "file.bin"
+    file_path.write_bytes(data)
+
+    digests = calculate_file_digests(str(file_path), sha256=True, part_size=MIN_PART_SIZE, chunk_size=chunk_size)
+
+    assert digests["file_size"] == file_size
+    assert digests["md5"] == hashlib.md5(data).hexdigest()
+    assert digests["sha256"] == hashlib.sha256(data).hexdigest()
+    assert digests["etag"] == calculate_etag(data, MIN_PART_SIZE)
+
+
+def test_file_digests_with_minio_default_part_size(tmp_path):
+    data = os.urandom(MIN_PART_SIZE + 1)
+    file_path = tmp_path / "file.bin"
+    file_path.write_bytes(data)
+
+    digests = calculate_file_digests(str(file_path))
+
+    assert digests["etag"] == calculate_etag(data, 0)
+    assert digests["etag"].endswith("-2")
+    assert digests["sha256"] is None
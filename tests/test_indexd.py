@@ -0,0 +1,48 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from gen3minioclient.indexd import create_http_session
+
+
+@pytest.fixture
+def unavailable_server():
+    requests_by_method = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def respond(self):
+            requests_by_method[self.command] = requests_by_method.get(self.command, 0) + 1
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        do_GET = do_POST = do_PUT = respond
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", requests_by_method
+    server.shutdown()
+    server.server_close()
+
+
+def test_session_retries_idempotent_requests_on_5xx(unavailable_server):
+    url, requests_by_method = unavailable_server
+    session = create_http_session(retries=2, backoff_factor=0)
+
+    assert session.get(url).status_code == 503
+    assert session.put(url, data="{}").status_code == 503
+    assert requests_by_method == {"GET": 3, "PUT": 3}
+
+
+def test_session_does_not_retry_post_on_5xx(unavailable_server):
+    url, requests_by_method = unavailable_server
+    session = create_http_session(retries=2, backoff_factor=0)
+
+    assert session.post(url, data="{}").status_code == 503
+    assert requests_by_method == {"POST": 1}
@@ -0,0 +1,121 @@
+import pytest
+
+from gen3minioclient.gen3minioclient import Gen3MinioClient
+from gen3minioclient.indexd_records import IndexdRecord, iter_indexd_records, record_to_manifest_row
+from tests.fake_indexd import FakeIndexd
+
+URL_PREFIX = "https://minio.example.org/test-bucket/"
+
+
+def make_indexd(number_of_records=7):
+    indexd = FakeIndexd()
+    for number in range(number_of_records):
+        indexd.add_record(
+            f"dg/{number:02d}",
+            md5=f"{number:032x}",
+            size=number,
+            file_name=f"file-{number}.bin",
+            urls=[f"{URL_PREFIX if number % 2 == 0 else 's3://other-bucket/'}dg/{number:02d}/file-{number}.bin"],
+            acl=["*"],
+            authz=["/programs/a"] if number < 4 else ["/programs/a", "/programs/b"],
+            uploader="alice" if number % 3 else "bob",
+        )
+    return indexd
+
+
+@pytest.mark.parametrize("read_ahead", [1, 3])
+@pytest.mark.parametrize("number_of_records", [0, 1, 6, 7])
+def test_every_record_is_yielded_once_in_order(read_ahead, number_of_records):
+    indexd = make_indexd(number_of_records)
+
+    records = list(iter_indexd_records(indexd, page_size=2, read_ahead=read_ahead))
+
+    assert [record.did for record in records] == sorted(indexd.records)
+
+
+def test_paging_by_start_follows_the_last_did():
+    indexd = make_indexd(5)
+
+    list(iter_indexd_records(indexd, page_size=2, read_ahead=1))
+
+    assert [call["start"] for call in indexd.list_calls] == [None, "dg/01", "dg/03"]
+    assert all(call["page"] is None for call in indexd.list_calls)
+
+
+def test_read_ahead_stops_at_a_short_page():
+    indexd = make_indexd(5)
+
+    records = list(iter_indexd_records(indexd, page_size=2, read_ahead=3))
+
+    assert len(records) == 5
+    # Pages 0 to 2 are read ahead, and pages 3 and 4 are requested once pages
+    # 0 and 1 are full. Page 2 is short, so nothing after that is requested.
+    assert max(call["page"] for call in indexd.list_calls) <= 4
+    assert all(call["start"] is None for call in indexd.list_calls)
+
+
+def test_records_are_compact_tuples():
+    indexd = make_indexd(1)
+
+    [record] = iter_indexd_records(indexd, page_size=2)
+
+    assert record == IndexdRecord(
+        did="dg/00", rev="00000001", file_name="file-0.bin", size=0, md5="0" * 32,
+        urls=(f"{URL_PREFIX}dg/00/file-0.bin",), acl=("*",), authz=("/programs/a",), uploader="bob",
+    )
+    assert record_to_manifest_row(record) == {
+        "guid": "dg/00",
+        "urls": [f"{URL_PREFIX}dg/00/file-0.bin"],
+        "authz": ["/programs/a"],
+        "acl": ["*"],
+        "md5": "0" * 32,
+        "file_size": 0,
+        "file_name": "file-0.bin",
+    }
+
+
+def test_compact_false_yields_indexd_documents():
+    indexd = make_indexd(2)
+
+    records = list(iter_indexd_records(indexd, page_size=2, compact=False))
+
+    assert records == [indexd.records["dg/00"], indexd.records["dg/01"]]
+
+
+@pytest.mark.parametrize("filters, expected_dids", [
+    ({"uploader": "bob"}, ["dg/00", "dg/03", "dg/06"]),
+    ({"authz": ["/programs/b"]}, ["dg/04", "dg/05", "dg/06"]),
+    ({"url_prefix": URL_PREFIX}, ["dg/00", "dg/02", "dg/04", "dg/06"]),
+    ({"uploader": "alice", "authz": ["/programs/a", "/programs/b"], "url_prefix": URL_PREFIX}, ["dg/04"]),
+])
+@pytest.mark.parametrize("read_ahead", [1, 3])
+def test_filters(filters, expected_dids, read_ahead):
+    indexd = make_indexd()
+
+    records = list(iter_indexd_records(indexd, page_size=2, read_ahead=read_ahead, **filters))
+
+    assert [record.did for record in records] == expected_dids
+    if "uploader" in filters:
+        assert all(call["uploader"] == filters["uploader"] for call in indexd.list_calls)
+
+
+def test_filters_are_checked_again_when_indexd_ignores_them():
+    class UnfilteredIndexd(FakeIndexd):
+        def list_records(self, limit, start=None, page=None, params=None):
+            return super().list_records(limit, start=start, page=page)
+
+    indexd = UnfilteredIndexd()
+    indexd.records = make_indexd().records
+
+    records = list(iter_indexd_records(indexd, page_size=2, uploader="bob", authz=["/programs/b"]))
+
+    assert [record.did for record in records] == ["dg/06"]
+
+
+def test_get_all_records_returns_indexd_documents():
+    client = Gen3MinioClient()
+    client._indexd_client = make_indexd()
+
+    records = client.get_all_records()
+
+    assert records == [client._indexd_client.records[did] for did in sorted(client._indexd_client.records)]
@@ -0,0 +1,145 @@
+import uuid
+from csv import DictReader
+
+import pytest
+
+from gen3minioclient.gen3minioclient import Gen3MinioClient
+from gen3minioclient.listing_checkpoint import ListingCheckpoint
+from tests.fake_minio import FakeMinio
+
+BUCKET_NAME = "test-bucket"
+
+
+@pytest.fixture(params=[1, 4], ids=["single_listing", "sharded_listing"])
+def gen3_minio_client(request):
+    client = Gen3MinioClient()
+    client.minio_bucket_name = BUCKET_NAME
+    client.minio_api_endpoint = "minio.example.org"
+    client.listing_workers = request.param
+    client.client = FakeMinio()
+    return client
+
+
+def add_object(gen3_minio_client, key_uuid: str, data: bytes = b"data"):
+    object_name = f"PREFIX/{key_uuid}/file.bin"
+    gen3_minio_client.client.add_object(BUCKET_NAME, object_name, data)
+    return object_name
+
+
+def sync(gen3_minio_client, checkpoint):
+    minio_objects = list(gen3_minio_client.iter_new_or_changed_minio_objects(checkpoint))
+    checkpoint.save()
+    return sorted(minio_object["urls"][0].split(f"/{BUCKET_NAME}/", 1)[1] for minio_object in minio_objects)
+
+
+def test_new_key_sorting_before_every_seen_key_is_found(gen3_minio_client, tmp_path):
+    checkpoint = ListingCheckpoint(str(tmp_path / "checkpoint.db"))
+    seen = [add_object(gen3_minio_client, key_uuid) for key_uuid in ("8f000000", "9a000000", "ff000000")]
+    assert sync(gen3_minio_client, checkpoint) == sorted(seen)
+
+    new_object_name = add_object(gen3_minio_client, "00000000")
+
+    assert sync(gen3_minio_client, checkpoint) == [new_object_name]
+    assert sync(gen3_minio_client, checkpoint) == []
+
+
+def test_changed_etag_is_found(gen3_minio_client, tmp_path):
+    checkpoint = ListingCheckpoint(str(tmp_path / "checkpoint.db"))
+    object_name = add_object(gen3_minio_client, "8f000000", b"old")
+    sync(gen3_minio_client, checkpoint)
+
+    add_object(gen3_minio_client, "8f000000", b"new")
+
+    assert sync(gen3_minio_client, checkpoint) == [object_name]
+
+
+def test_unsaved_objects_are_not_recorded(gen3_minio_client, tmp_path):
+    checkpoint_file = str(tmp_path / "checkpoint.db")
+    checkpoint = ListingCheckpoint(checkpoint_file)
+    object_name = add_object(gen3_minio_client, "8f000000")
+
+    # A run that fails before the manifest is written never calls 'save'
+    list(gen3_minio_client.iter_new_or_changed_minio_objects(checkpoint))
+    checkpoint.close()
+
+    assert sync(gen3_minio_client, ListingCheckpoint(checkpoint_file)) == [object_name]
+
+
+def test_many_random_keys_across_pages(gen3_minio_client, tmp_path):
+    checkpoint = ListingCheckpoint(str(tmp_path / "checkpoint.db"))
+    for _ in range(2500):
+        add_object(gen3_minio_client, str(uuid.uuid4()))
+    sync(gen3_minio_client, checkpoint)
+
+    new_object_names = sorted(add_object(gen3_minio_client, str(uuid.uuid4())) for _ in range(50))
+
+    assert sync(gen3_minio_client, checkpoint) == new_object_names
+    assert checkpoint.count() == 2550
+
+
+def test_incremental_manifest_update_only_appends_new_objects(gen3_minio_client, tmp_path):
+    manifest_file = str(tmp_path / "manifest.tsv")
+    add_object(gen3_minio_client, "8f000000", b"one")
+    gen3_minio_client.update_minio_manifest_file(manifest_file, incremental=True)
+
+    new_object_name = add_object(gen3_minio_client, "00000000", b"two")
+    gen3_minio_client.update_minio_manifest_file(manifest_file, incremental=True)
+
+    with open(manifest_file) as f:
+        rows = list(DictReader(f, delimiter="\t"))
+    assert len(rows) == 2
+    assert new_object_name in rows[1]["urls"]
+
+
+def read_manifest(manifest_file):
+    with open(manifest_file) as f:
+        return list(DictReader(f, delimiter="\t"))
+
+
+def test_overwritten_object_replaces_its_manifest_row(gen3_minio_client, tmp_path):
+    manifest_file = str(tmp_path / "manifest.tsv")
+    object_name = add_object(gen3_minio_client, "8f000000", b"old")
+    other_object_name = add_object(gen3_minio_client, "00000000", b"other")
+    gen3_minio_client.update_minio_manifest_file(manifest_file, incremental=True)
+    [old_row] = [row for row in read_manifest(manifest_file) if object_name in row["urls"]]
+
+    # Overwritten with the content of another object, so its new md5 is
+    # already in the manifest as well
+    add_object(gen3_minio_client, "8f000000", b"other")
+    message = gen3_minio_client.update_minio_manifest_file(manifest_file, incremental=True)
+
+    rows = read_manifest(manifest_file)
+    assert message == "Updated manifest file."
+    assert len(rows) == 2
+    [new_row] = [row for row in rows if object_name in row["urls"]]
+    assert new_row["guid"] == old_row["guid"]
+    assert new_row["md5"] == gen3_minio_client.client.objects[(BUCKET_NAME, object_name)]["etag"]
+    assert new_row["md5"] != old_row["md5"]
+    assert [row for row in rows if other_object_name in row["urls"]][0]["md5"] == new_row["md5"]
+    assert gen3_minio_client.update_minio_manifest_file(manifest_file, incremental=True) == "There are no new objects in the MinIO bucket."
+
+
+def test_first_incremental_run_keeps_rows_of_unchanged_objects(gen3_minio_client, tmp_path):
+    manifest_file = str(tmp_path / "manifest.tsv")
+    add_object(gen3_minio_client, "8f000000")
+    gen3_minio_client.update_minio_manifest_file(manifest_file)
+    rows = read_manifest(manifest_file)
+
+    # Every object is new to the checkpoint, but none of them has changed
+    assert gen3_minio_client.update_minio_manifest_file(manifest_file, incremental=True) == "Manifest file is already up to date."
+    assert read_manifest(manifest_file) == rows
+
+
+def test_appended_object_with_a_new_md5_replaces_its_row(gen3_minio_client, tmp_path):
+    manifest_file = str(tmp_path / "manifest.tsv")
+    object_name = add_object(gen3_minio_client, "8f000000", b"old")
+    gen3_minio_client.update_minio_manifest_file(manifest_file)
+    [old_row] = read_manifest(manifest_file)
+
+    uploaded_object = gen3_minio_client.create_object_record(object_name, "0" * 32, 3)
+    unchanged_object = gen3_minio_client.create_object_record(object_name, "0" * 32, 3)
+    gen3_minio_client.append_minio_objects_to_manifest_file(manifest_file, [uploaded_object, unchanged_object])
+
+    [row] = read_manifest(manifest_file)
+    assert row["guid"] == old_row["guid"]
+    assert row["md5"] == "0" * 32
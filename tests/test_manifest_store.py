@@ -0,0 +1,163 @@
+import csv
+
+import pytest
+
+from gen3minioclient.gen3minioclient import Gen3MinioClient
+from gen3minioclient.manifest_store import ManifestStore, parse_manifest_list
+from tests.fake_minio import FakeMinio
+
+BUCKET_NAME = "test-bucket"
+MANIFEST_FIELDS = Gen3MinioClient.MANIFEST_FIELDS
+
+
+def make_row(guid, md5, file_name, urls, file_size=1):
+    return {
+        "guid": guid,
+        "urls": urls,
+        "authz": ["/programs/test"],
+        "acl": ["*"],
+        "md5": md5,
+        "file_size": file_size,
+        "file_name": file_name,
+    }
+
+
+ROWS = [
+    make_row("dg/1", "a" * 32, "one.bin", ["https://minio.example.org/test-bucket/dg/1/one.bin"]),
+    make_row("dg/2", "b" * 32, "two.bin", ["https://minio.example.org/test-bucket/dg/2/two.bin", "s3://test-bucket/dg/2/two.bin"], 2),
+    make_row("dg/3", "a" * 32, "one.bin", ["https://minio.example.org/test-bucket/dg/3/one.bin"]),
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ManifestStore(str(tmp_path / "manifest.sqlite"), MANIFEST_FIELDS)
+
+
+def read_tsv(file_path):
+    with open(file_path, newline="") as f:
+        return list(csv.DictReader(f, delimiter="\t"))
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("['https://a', 'https://b']", ["https://a", "https://b"]),
+    ("https://a https://b", ["https://a", "https://b"]),
+    ("[https://a, https://b]", ["https://a", "https://b"]),
+    ("", []),
+    (["*"], ["*"]),
+])
+def test_parse_manifest_list(value, expected):
+    assert parse_manifest_list(value) == expected
+
+
+def test_rows_are_found_by_guid_md5_file_name_and_url(store):
+    assert store.upsert_rows(ROWS) == 3
+
+    assert store.count() == 3
+    assert store.get_by_guid("dg/2")["file_name"] == "two.bin"
+    assert store.get_by_guid("dg/4") is None
+    assert [row["guid"] for row in store.find_by_md5("a" * 32)] == ["dg/1", "dg/3"]
+    assert [row["guid"] for row in store.find_by_file_name("one.bin")] == ["dg/1", "dg/3"]
+    assert [row["guid"] for row in store.find_by_url("s3://test-bucket/dg/2/two.bin")] == ["dg/2"]
+    assert store.contains_md5("b" * 32) and not store.contains_md5("c" * 32)
+    assert store.contains_url("https://minio.example.org/test-bucket/dg/3/one.bin")
+
+
+def test_upsert_replaces_a_row_and_its_urls(store):
+    store.upsert_rows(ROWS)
+
+    store.upsert_rows([make_row("dg/2", "c" * 32, "two.bin", ["https://minio.example.org/test-bucket/dg/2/moved.bin"])])
+
+    assert store.count() == 3
+    assert store.get_by_guid("dg/2")["md5"] == "c" * 32
+    assert not store.contains_md5("b" * 32)
+    assert not store.contains_url("s3://test-bucket/dg/2/two.bin")
+    assert [row["guid"] for row in store.find_by_url("https://minio.example.org/test-bucket/dg/2/moved.bin")] == ["dg/2"]
+
+
+def test_deleted_rows_are_gone_from_every_lookup(store):
+    store.upsert_rows(ROWS)
+
+    store.delete_rows(["dg/1", "dg/2"])
+
+    assert [row["guid"] for row in store.iter_rows()] == ["dg/3"]
+    assert not store.contains_url("s3://test-bucket/dg/2/two.bin")
+
+
+def test_tsv_import_and_export_round_trip(store, tmp_path):
+    manifest_file = str(tmp_path / "manifest.tsv")
+    with open(manifest_file, "w") as f:
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_FIELDS, delimiter="\t")
+        writer.writeheader()
+        writer.writerows(ROWS)
+
+    assert store.import_tsv(manifest_file, batch_size=2) == 3
+    exported_file = str(tmp_path / "exported.tsv")
+    assert store.export_tsv(exported_file) == 3
+
+    with open(manifest_file) as original, open(exported_file) as exported:
+        assert exported.read() == original.read()
+    assert store.get_by_guid("dg/2")["file_size"] == 2
+
+
+@pytest.fixture
+def gen3_minio_client(tmp_path):
+    client = Gen3MinioClient()
+    client.minio_bucket_name = BUCKET_NAME
+    client.minio_api_endpoint = "minio.example.org"
+    client.manifest_file_location = None
+    client.manifest_store_location = str(tmp_path / "manifest.sqlite")
+    client.hash_cache_location = None
+    client.multipart_upload = False
+    client.client = FakeMinio()
+    return client
+
+
+def test_create_indexd_manifest_exports_the_synced_store(gen3_minio_client, tmp_path, monkeypatch):
+    import gen3.tools.indexing.index_manifest
+
+    minio = gen3_minio_client.client
+    minio.add_object(BUCKET_NAME, "dg/1/one.bin", b"one")
+    minio.add_object(BUCKET_NAME, "dg/2/two.bin", b"two")
+    # Already in the store, so it is exported as it is and not added again
+    gen3_minio_client.get_manifest_store().upsert_rows([
+        make_row("dg/1", minio.objects[(BUCKET_NAME, "dg/1/one.bin")]["etag"], "one.bin", ["https://minio.example.org/test-bucket/dg/1/one.bin"], 3),
+    ])
+    indexed_manifests = []
+
+    def index_object_manifest(manifest_file, **kwargs):
+        indexed_manifests.append(read_tsv(manifest_file))
+        return [], []
+
+    monkeypatch.setattr(gen3.tools.indexing.index_manifest, "index_object_manifest", index_object_manifest)
+    gen3_minio_client._gen3_auth = object()
+    manifest_file = str(tmp_path / "indexd_manifest.tsv")
+
+    gen3_minio_client.create_indexd_manifest(manifest_file)
+
+    [rows] = indexed_manifests
+    assert sorted(row["file_name"] for row in rows) == ["one.bin", "two.bin"]
+    assert [row["guid"] for row in rows if row["file_name"] == "one.bin"] == ["dg/1"]
+    assert all(parse_manifest_list(row["urls"])[0].startswith(f"https://minio.example.org/{BUCKET_NAME}/") for row in rows)
+    assert gen3_minio_client.get_manifest_store().count() == 2
+
+
+def test_incremental_store_update_replaces_the_row_of_an_overwritten_object(gen3_minio_client):
+    minio = gen3_minio_client.client
+    minio.add_object(BUCKET_NAME, "dg/1/one.bin", b"old")
+    minio.add_object(BUCKET_NAME, "dg/2/two.bin", b"new")
+    store = gen3_minio_client.get_manifest_store()
+    assert gen3_minio_client.update_minio_manifest_store(incremental=True) == 2
+    [old_row] = store.find_by_file_name("one.bin")
+
+    # The new content is a duplicate of another object, which would
+    # otherwise have been skipped by the md5 check
+    minio.add_object(BUCKET_NAME, "dg/1/one.bin", b"new")
+
+    assert gen3_minio_client.update_minio_manifest_store(incremental=True) == 1
+    [new_row] = store.find_by_file_name("one.bin")
+    assert new_row["guid"] == old_row["guid"]
+    assert new_row["md5"] == minio.objects[(BUCKET_NAME, "dg/1/one.bin")]["etag"] != old_row["md5"]
+    assert store.find_by_url("https://minio.example.org/test-bucket/dg/1/one.bin") == [new_row]
+    assert store.count() == 2
+    assert gen3_minio_client.update_minio_manifest_store(incremental=True) == 0
@@ -0,0 +1,127 @@
+import os
+
+import pytest
+
+from gen3minioclient.gen3minioclient import Gen3MinioClient
+from gen3minioclient.metrics import MetricsRegistry, get_default_registry
+from tests.fake_indexd import FakeIndexd
+from tests.fake_minio import FakeMinio
+
+
+def test_counters_are_rendered_with_help_type_and_escaped_labels():
+    metrics = MetricsRegistry()
+    metrics.increment("uploads_total", status="uploaded")
+    metrics.increment("uploads_total", 2, status="uploaded")
+    metrics.increment("retries_total", operation="http_put", reason='say "503"\\\n')
+
+    lines = metrics.render_prometheus().splitlines()
+
+    assert lines == [
+        "# HELP gen3minioclient_retries_total Retried requests, by operation and the status code or error that caused the retry.",
+        "# TYPE gen3minioclient_retries_total counter",
+        'gen3minioclient_retries_total{operation="http_put",reason="say \\"503\\"\\\\\\n"} 1',
+        "# HELP gen3minioclient_uploads_total Finished uploads, by status.",
+        "# TYPE gen3minioclient_uploads_total counter",
+        'gen3minioclient_uploads_total{status="uploaded"} 3',
+    ]
+
+
+def test_histograms_have_cumulative_buckets():
+    metrics = MetricsRegistry(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        metrics.observe("phase_duration_seconds", value, phase="hashing")
+
+    lines = metrics.render_prometheus().splitlines()
+
+    assert lines == [
+        "# HELP gen3minioclient_phase_duration_seconds Duration of each phase of the pipeline.",
+        "# TYPE gen3minioclient_phase_duration_seconds histogram",
+        'gen3minioclient_phase_duration_seconds_bucket{le="0.1",phase="hashing"} 2',
+        'gen3minioclient_phase_duration_seconds_bucket{le="1.0",phase="hashing"} 3',
+        'gen3minioclient_phase_duration_seconds_bucket{le="+Inf",phase="hashing"} 4',
+        'gen3minioclient_phase_duration_seconds_sum{phase="hashing"} 2.65',
+        'gen3minioclient_phase_duration_seconds_count{phase="hashing"} 4',
+    ]
+
+
+def test_metrics_without_help_text_get_one_from_their_name():
+    metrics = MetricsRegistry()
+    metrics.increment("objects_listed_total")
+
+    assert metrics.render_prometheus().splitlines()[0] == "# HELP gen3minioclient_objects_listed_total objects listed total"
+
+
+def test_summary_quantiles_are_estimated_from_the_buckets():
+    metrics = MetricsRegistry()
+    for _ in range(50):
+        metrics.observe("phase_duration_seconds", 0.003, phase="blank_index")
+        metrics.observe("phase_duration_seconds", 0.2, phase="blank_index")
+    metrics.increment("phase_items_total", 100, phase="blank_index")
+    metrics.increment("phase_errors_total", phase="blank_index")
+    metrics.increment("uploads_total", status="failed")
+
+    summary = metrics.summary()
+
+    phase = summary["phases"]["blank_index"]
+    assert phase["count"] == 100
+    assert phase["p50_seconds"] == pytest.approx(0.005)
+    assert phase["p95_seconds"] == pytest.approx(0.19)
+    assert phase["max_seconds"] == 0.2
+    assert phase["errors"] == 1
+    assert phase["items_per_second"] == pytest.approx(100 / phase["total_seconds"])
+    assert summary["counters"] == {'uploads_total{status="failed"}': 1}
+
+
+def test_time_phase_counts_errors_and_still_records_the_duration():
+    metrics = MetricsRegistry()
+
+    with pytest.raises(RuntimeError):
+        with metrics.time_phase("index_update"):
+            raise RuntimeError("indexd is unavailable")
+
+    assert metrics.get_counter("phase_errors_total", phase="index_update") == 1
+    assert metrics.summary()["phases"]["index_update"]["count"] == 1
+
+
+@pytest.fixture
+def metrics():
+    metrics = get_default_registry()
+    metrics.reset()
+    yield metrics
+    metrics.reset()
+
+
+@pytest.fixture
+def gen3_minio_client():
+    client = Gen3MinioClient()
+    client.minio_bucket_name = "test-bucket"
+    client.minio_api_endpoint = "minio.example.org"
+    client.manifest_file_location = None
+    client.manifest_store_location = None
+    client.hash_cache_location = None
+    client.multipart_upload = False
+    client.client = FakeMinio()
+    client._indexd_client = FakeIndexd()
+    return client
+
+
+def test_upload_file_records_its_phases_and_outcome(metrics, gen3_minio_client, tmp_path):
+    upload_path = tmp_path / "file.bin"
+    upload_path.write_bytes(os.urandom(1024))
+
+    assert gen3_minio_client.upload_file(str(upload_path))["status"] == "uploaded"
+    gen3_minio_client._indexd_client.update_status_code = 503
+    upload_path = tmp_path / "other.bin"
+    upload_path.write_bytes(os.urandom(2048))
+    assert gen3_minio_client.upload_file(str(upload_path))["status"] == "failed"
+
+    assert metrics.get_counter("uploads_total", status="uploaded") == 1
+    assert metrics.get_counter("uploads_total", status="failed") == 1
+    assert metrics.get_counter("phase_bytes_total", phase="hashing") == 3072
+    assert metrics.get_counter("phase_bytes_total", phase="minio_put") == 3072
+    assert metrics.get_counter("phase_errors_total", phase="index_update") == 1
+    phases = metrics.summary()["phases"]
+    assert {name: phases[name]["count"] for name in ("hashing", "existence_check", "blank_index", "minio_put", "index_update")} == {
+        "hashing": 2, "existence_check": 2, "blank_index": 2, "minio_put": 2, "index_update": 2,
+    }
+    assert 'gen3minioclient_uploads_total{status="failed"} 1' in metrics.render_prometheus()
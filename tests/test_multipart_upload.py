@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+from gen3minioclient.hashing import MAX_MULTIPART_COUNT, MAX_PART_SIZE, MIN_PART_SIZE, check_multipart_part_size
+from gen3minioclient.multipart_upload import MultipartUploader
+from tests.fake_minio import FakeMinio, calculate_etag
+
+BUCKET_NAME = "test-bucket"
+
+
+def test_check_multipart_part_size_accepts_up_to_the_part_limit():
+    check_multipart_part_size(MAX_MULTIPART_COUNT * MIN_PART_SIZE, MIN_PART_SIZE)
+    check_multipart_part_size(0, MIN_PART_SIZE)
+
+
+def test_check_multipart_part_size_rejects_too_many_parts():
+    with pytest.raises(ValueError, match=f"at least {2 * MIN_PART_SIZE} bytes"):
+        check_multipart_part_size(MAX_MULTIPART_COUNT * MIN_PART_SIZE + 1, MIN_PART_SIZE)
+
+
+def test_check_multipart_part_size_rejects_oversized_parts():
+    with pytest.raises(ValueError):
+        check_multipart_part_size(MIN_PART_SIZE, MAX_PART_SIZE + 1)
+
+
+def test_upload_file_rejects_part_size_before_creating_upload(tmp_path):
+    file_path = tmp_path / "large.bin"
+    # Sparse, so the file takes no space on disk
+    with open(file_path, "wb") as f:
+        f.truncate(MAX_MULTIPART_COUNT * MIN_PART_SIZE + 1)
+    client = FakeMinio()
+
+    with pytest.raises(ValueError):
+        MultipartUploader(client, BUCKET_NAME, part_size=MIN_PART_SIZE).upload_file(str(file_path), "did/large.bin")
+    assert next(client.upload_ids) == 1
+
+
+def test_upload_file_etag_matches_minio(tmp_path):
+    data = os.urandom(2 * MIN_PART_SIZE + 1)
+    file_path = tmp_path / "file.bin"
+    file_path.write_bytes(data)
+    client = FakeMinio()
+
+    result = MultipartUploader(client, BUCKET_NAME, part_size=MIN_PART_SIZE).upload_file(str(file_path), "did/file.bin")
+
+    assert result["part_count"] == 3
+    assert result["etag"] == result["expected_etag"] == calculate_etag(data, MIN_PART_SIZE)
+    assert client.objects[(BUCKET_NAME, "did/file.bin")]["data"] == data
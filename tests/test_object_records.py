@@ -0,0 +1,160 @@
+import uuid
+from csv import DictReader, DictWriter
+
+import pytest
+
+import gen3minioclient.gen3minioclient
+from gen3minioclient.gen3minioclient import Gen3MinioClient
+from gen3minioclient.manifest_store import parse_manifest_list
+from gen3minioclient.object_records import (
+    DEFAULT_OBJECT_ACL,
+    DEFAULT_OBJECT_AUTHZ,
+    OBJECT_RECORD_FIELDS,
+    MinioObjectRecord,
+    get_object_url_prefix,
+)
+from tests.fake_minio import FakeMinio
+
+BUCKET_NAME = "test-bucket"
+URL_PREFIX = get_object_url_prefix("minio.example.org", BUCKET_NAME)
+
+
+@pytest.fixture
+def record():
+    return MinioObjectRecord("PREFIX/1234/file.bin", "d41d8cd98f00b204e9800998ecf8427e", 42, URL_PREFIX)
+
+
+def test_to_dict_has_every_manifest_field(record):
+    row = record.to_dict()
+
+    assert list(row) == list(OBJECT_RECORD_FIELDS) == Gen3MinioClient.MANIFEST_FIELDS
+    assert row == {
+        "guid": record.guid,
+        "urls": [f"https://minio.example.org/{BUCKET_NAME}/PREFIX/1234/file.bin"],
+        "authz": list(DEFAULT_OBJECT_AUTHZ),
+        "acl": list(DEFAULT_OBJECT_ACL),
+        "md5": "d41d8cd98f00b204e9800998ecf8427e",
+        "file_size": 42,
+        "file_name": "file.bin",
+    }
+    assert dict(record) == row
+
+
+def test_guid_is_generated_once_on_first_read(record):
+    assert record._guid is None
+
+    guid = record.guid
+
+    assert uuid.UUID(guid)
+    assert record.guid == guid
+    assert record["guid"] == guid
+    assert record.to_dict()["guid"] == guid
+    assert MinioObjectRecord(record.object_name, record.md5, record.file_size, URL_PREFIX).guid != guid
+
+
+def test_given_guid_is_kept():
+    record = MinioObjectRecord("PREFIX/1234/file.bin", "md5", 1, URL_PREFIX, guid="PREFIX/1234")
+
+    assert record.guid == "PREFIX/1234"
+
+
+def test_record_is_read_only(record):
+    with pytest.raises(TypeError):
+        record["md5"] = "changed"
+    with pytest.raises(TypeError):
+        del record["md5"]
+    with pytest.raises(AttributeError):
+        record.guid = "changed"
+    # '__slots__' leaves no room for other attributes
+    with pytest.raises(AttributeError):
+        record.extra = "value"
+    with pytest.raises(KeyError):
+        record["extra"]
+    assert record.md5 == "d41d8cd98f00b204e9800998ecf8427e"
+
+
+def test_changing_returned_lists_does_not_change_the_record(record):
+    record.acl.append("changed")
+    record.authz.clear()
+    record.urls.append("https://elsewhere.example.org/file.bin")
+
+    assert record.acl == list(DEFAULT_OBJECT_ACL)
+    assert record.authz == list(DEFAULT_OBJECT_AUTHZ)
+    assert len(record.urls) == 1
+
+    row = record.to_dict()
+    row["md5"] = "changed"
+    assert record.md5 == "d41d8cd98f00b204e9800998ecf8427e"
+
+
+def test_record_is_written_like_a_manifest_row_dict(record, tmp_path):
+    manifest_file = tmp_path / "manifest.tsv"
+    with open(manifest_file, "w") as f:
+        writer = DictWriter(f, fieldnames=OBJECT_RECORD_FIELDS, delimiter="\t")
+        writer.writeheader()
+        writer.writerows([record, record.to_dict()])
+
+    with open(manifest_file) as f:
+        first_row, second_row = DictReader(f, delimiter="\t")
+    assert first_row == second_row
+    assert parse_manifest_list(first_row["urls"]) == record.urls
+
+
+@pytest.fixture
+def gen3_minio_client():
+    client = Gen3MinioClient()
+    client.minio_bucket_name = BUCKET_NAME
+    client.minio_api_endpoint = "minio.example.org"
+    client.listing_workers = 1
+    client.client = FakeMinio()
+    return client
+
+
+def test_manifest_rows_are_written_while_the_bucket_is_listed(gen3_minio_client, tmp_path, monkeypatch):
+    gen3_minio_client.manifest_write_batch_size = 2
+    for i in range(7):
+        gen3_minio_client.client.add_object(BUCKET_NAME, f"PREFIX/{i:04d}/file_{i}.bin", str(i).encode())
+    rows_written = []
+
+    class CountingDictWriter(DictWriter):
+        def writerows(self, rows):
+            rows = list(rows)
+            rows_written.append(len(rows))
+            return super().writerows(rows)
+
+    monkeypatch.setattr(gen3minioclient.gen3minioclient, "DictWriter", CountingDictWriter)
+    list_objects = gen3_minio_client.client.list_objects
+    rows_written_when_listed = []
+
+    def listing(*args, **kwargs):
+        for obj in list_objects(*args, **kwargs):
+            rows_written_when_listed.append(sum(rows_written))
+            yield obj
+
+    gen3_minio_client.client.list_objects = listing
+    manifest_file = tmp_path / "manifest.tsv"
+
+    gen3_minio_client.create_minio_manifest_file(str(manifest_file))
+
+    # At most one batch of records is held before it is written out
+    assert rows_written_when_listed == [0, 0, 2, 2, 4, 4, 6]
+    assert rows_written == [2, 2, 2, 1]
+    with open(manifest_file) as f:
+        rows = list(DictReader(f, delimiter="\t"))
+    assert [row["file_name"] for row in rows] == [f"file_{i}.bin" for i in range(7)]
+    assert len({row["guid"] for row in rows}) == 7
+    assert all(uuid.UUID(row["guid"]) for row in rows)
+
+
+def test_iter_minio_objects_yields_records_lazily(gen3_minio_client):
+    gen3_minio_client.client.add_object(BUCKET_NAME, "PREFIX/0001/file.bin", b"data")
+    gen3_minio_client.client.add_object(BUCKET_NAME, "PREFIX/0002/file.bin", b"data")
+
+    minio_objects = gen3_minio_client.iter_minio_objects()
+    assert gen3_minio_client.client.list_calls == 0
+
+    first_record = next(minio_objects)
+    assert isinstance(first_record, MinioObjectRecord)
+    assert first_record._guid is None
+    assert first_record.file_size == 4
+    assert len(list(minio_objects)) == 1
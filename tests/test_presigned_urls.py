@@ -0,0 +1,142 @@
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from gen3minioclient import gen3api
+from gen3minioclient.gen3minioclient import Gen3MinioClient
+from gen3minioclient.presigned_urls import PresignedUrlCache, mint_presigned_urls
+from tests.fake_minio import FakeMinio
+
+BUCKET_NAME = "test-bucket"
+ONE_DAY = timedelta(days=1)
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def cache(clock):
+    return PresignedUrlCache(refresh_leeway_seconds=3600, clock=clock)
+
+
+def mint(client, object_names, cache, **kwargs):
+    return mint_presigned_urls(client, BUCKET_NAME, object_names, cache=cache, **kwargs)
+
+
+def test_urls_are_reused_until_the_refresh_leeway(cache, clock):
+    client = FakeMinio()
+    first = mint(client, ["a", "b"], cache)
+
+    assert first["a"]["expires_at"] == clock.now + ONE_DAY.total_seconds()
+    clock.now += ONE_DAY.total_seconds() - 3601
+    assert mint(client, ["a", "b"], cache) == first
+    assert client.presigned_url_count == 2
+
+    clock.now += 1
+    second = mint(client, ["a"], cache)
+
+    assert second["a"]["url"] != first["a"]["url"]
+    assert second["a"]["expires_at"] == clock.now + ONE_DAY.total_seconds()
+
+
+def test_short_expiries_are_refreshed_after_half_their_lifetime(cache, clock):
+    client = FakeMinio()
+    expires = timedelta(minutes=10)
+    first = mint(client, ["a"], cache, expires=expires)
+
+    clock.now += 299
+    assert mint(client, ["a"], cache, expires=expires) == first
+
+    clock.now += 1
+    assert mint(client, ["a"], cache, expires=expires) != first
+
+
+def test_urls_are_cached_per_method_and_expiry(cache):
+    client = FakeMinio()
+
+    put_url = mint(client, ["a"], cache, method="put")["a"]
+    get_url = mint(client, ["a"], cache, method="GET")["a"]
+    short_put_url = mint(client, ["a"], cache, expires=timedelta(hours=2))["a"]
+
+    assert (put_url["method"], get_url["method"]) == ("PUT", "GET")
+    assert len({put_url["url"], get_url["url"], short_put_url["url"]}) == 3
+    assert mint(client, ["a"], cache)["a"] == put_url
+    assert client.presigned_url_count == 3
+
+
+def test_duplicate_names_are_signed_once(cache):
+    client = FakeMinio()
+
+    urls = mint(client, ["a", "b", "a"], cache)
+
+    assert list(urls) == ["a", "b"]
+    assert client.presigned_url_count == 2
+
+
+def test_least_recently_used_urls_are_evicted(clock):
+    cache = PresignedUrlCache(max_entries=2, clock=clock)
+    client = FakeMinio()
+    mint(client, ["a", "b"], cache)
+    # 'a' is now the most recently used
+    mint(client, ["a"], cache)
+
+    mint(client, ["c"], cache)
+
+    assert len(cache) == 2
+    assert [key[2] for key in cache.entries] == ["a", "c"]
+
+
+def test_only_put_and_get_are_signed(cache):
+    with pytest.raises(ValueError, match="DELETE"):
+        mint(FakeMinio(), ["a"], cache, method="DELETE")
+
+
+@pytest.fixture
+def api_client(monkeypatch):
+    gen3_minio_client = Gen3MinioClient()
+    gen3_minio_client.minio_bucket_name = BUCKET_NAME
+    gen3_minio_client.client = FakeMinio()
+    monkeypatch.setattr(gen3api, "gen3_minio_client", gen3_minio_client)
+    return TestClient(gen3api.app)
+
+
+def test_presigned_urls_endpoint_signs_a_batch(api_client):
+    response = api_client.post("/presigned-urls", json={"object_names": ["PREFIX/a.txt", "PREFIX/b.txt", "PREFIX/a.txt"], "method": "get", "expires_seconds": 600})
+
+    assert response.status_code == 200
+    urls = response.json()["urls"]
+    assert sorted(urls) == ["PREFIX/a.txt", "PREFIX/b.txt"]
+    assert urls["PREFIX/a.txt"]["method"] == "GET"
+    assert "X-Amz-Expires=600" in urls["PREFIX/a.txt"]["url"]
+
+
+@pytest.mark.parametrize("body, detail", [
+    ({"object_names": ["a"], "method": "DELETE"}, "'method'"),
+    ({"object_names": [f"object-{number}" for number in range(10001)]}, "At most 10000"),
+    ({"object_names": ["a"], "expires_seconds": 0}, "'expires_seconds'"),
+    ({"object_names": ["a"], "expires_seconds": 7 * 24 * 3600 + 1}, "'expires_seconds'"),
+])
+def test_presigned_urls_endpoint_rejects_invalid_requests(api_client, body, detail):
+    response = api_client.post("/presigned-urls", json=body)
+
+    assert response.status_code == 400
+    assert detail in response.json()["detail"]
+    assert gen3api.gen3_minio_client.client.presigned_url_count == 0
+
+
+def test_presigned_urls_endpoint_accepts_the_largest_batch(api_client):
+    response = api_client.post("/presigned-urls", json={"object_names": [f"object-{number}" for number in range(10000)], "expires_seconds": 7 * 24 * 3600})
+
+    assert response.status_code == 200
+    assert len(response.json()["urls"]) == 10000
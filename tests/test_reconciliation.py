@@ -0,0 +1,103 @@
+import csv
+
+import pytest
+
+from gen3minioclient.reconciliation import md5_values_disagree, reconcile, reconcile_partition
+
+MD5 = "d41d8cd98f00b204e9800998ecf8427e"
+OTHER_MD5 = "9e107d9d372bb6826bd81d3542a419d6"
+
+
+def entry(object_name, guid="", md5=MD5, size="0"):
+    return (object_name, guid, md5, size, "[]", "[]")
+
+
+def as_partition(entries):
+    partition = {}
+    for values in entries:
+        partition.setdefault(values[0], []).append(dict(zip(("object_name", "guid", "md5", "size", "acl", "authz"), values)))
+    return partition
+
+
+def categories(bucket_entries, index_entries, manifest_entries):
+    rows = reconcile_partition(as_partition(bucket_entries), as_partition(index_entries), as_partition(manifest_entries))
+    return sorted((row["category"], row["object_name"]) for row in rows)
+
+
+def read_tsv(file_path):
+    with open(file_path, newline="") as f:
+        return list(csv.DictReader(f, delimiter="\t"))
+
+
+def test_consistent_sources_report_nothing():
+    assert categories([entry("a")], [entry("a", "dg/1")], [entry("a", "dg/1")]) == []
+
+
+def test_objects_missing_from_a_source_are_reported():
+    result = categories(
+        [entry("only-in-bucket"), entry("not-listed")],
+        [entry("only-in-index", "dg/1"), entry("not-listed", "dg/2")],
+        [entry("stale", "dg/3")],
+    )
+
+    assert result == [
+        ("missing_object", "only-in-index"),
+        ("stale_manifest_row", "stale"),
+        ("unindexed_object", "only-in-bucket"),
+        ("unlisted_object", "not-listed"),
+        ("unlisted_object", "only-in-bucket"),
+    ]
+
+
+def test_mismatches_and_duplicates_are_reported():
+    result = categories(
+        [entry("md5"), entry("size"), entry("duplicate")],
+        [entry("md5", "dg/1", OTHER_MD5), entry("size", "dg/2", size="10"), entry("duplicate", "dg/3"), entry("duplicate", "dg/4")],
+        [entry("md5", "dg/1"), entry("size", "dg/2"), entry("duplicate", "dg/3"), entry("duplicate", "dg/3")],
+    )
+
+    assert result == [
+        ("duplicate_index_record", "duplicate"),
+        ("duplicate_manifest_row", "duplicate"),
+        ("md5_mismatch", "md5"),
+        ("size_mismatch", "size"),
+    ]
+
+
+@pytest.mark.parametrize("md5_values, disagree", [
+    ([MD5, MD5], False),
+    ([MD5, OTHER_MD5], True),
+    # A multipart ETag cannot be compared with a plain md5
+    ([MD5, "abc-2"], False),
+    (["abc-2", "def-2"], True),
+    ([MD5, ""], False),
+])
+def test_md5_values_disagree(md5_values, disagree):
+    assert md5_values_disagree(md5_values) == disagree
+
+
+def test_reconcile_writes_the_report_and_repair_manifest(tmp_path):
+    bucket_entries = [entry(f"object-{i}") for i in range(20)] + [entry("multipart", md5="abc-2")]
+    index_entries = [entry(f"object-{i}", f"dg/{i}") for i in range(10)]
+    manifest_entries = [entry(f"object-{i}", f"dg/{i}") for i in range(20)]
+    report_file = str(tmp_path / "report.tsv")
+    repair_manifest_file = str(tmp_path / "repair.tsv")
+
+    def create_repair_row(bucket_entry, manifest_entry):
+        if manifest_entry is None:
+            return None
+        return {"guid": manifest_entry["guid"], "md5": bucket_entry["md5"]}
+
+    summary = reconcile(
+        iter(bucket_entries), iter(index_entries), iter(manifest_entries), report_file,
+        repair_manifest_file=repair_manifest_file, create_repair_row=create_repair_row,
+        manifest_fields=["guid", "md5"], number_of_partitions=4,
+    )
+
+    assert (summary["bucket_entries"], summary["index_entries"], summary["manifest_entries"]) == (21, 10, 20)
+    assert summary["unindexed_object"] == 11
+    assert summary["unlisted_object"] == 1
+    assert summary["repairable"] == 10
+    assert sum(summary[category] for category in ("missing_object", "stale_manifest_row", "md5_mismatch", "size_mismatch")) == 0
+    assert len(read_tsv(report_file)) == 12
+    assert sorted(row["guid"] for row in read_tsv(repair_manifest_file)) == sorted(f"dg/{i}" for i in range(10, 20))
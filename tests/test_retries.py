@@ -0,0 +1,40 @@
+import pytest
+
+from gen3minioclient.metrics import get_default_registry
+from gen3minioclient.retries import call_with_retries, get_retry_delay
+
+
+def test_retry_delay_is_exponential():
+    assert [get_retry_delay(attempt, 0.5) for attempt in range(4)] == [0.5, 1.0, 2.0, 4.0]
+
+
+def test_retry_delay_honours_retry_after_seconds():
+    assert get_retry_delay(3, 0.5, "7") == 7.0
+    # An HTTP date is not understood, so the backoff is used instead
+    assert get_retry_delay(1, 0.5, "Wed, 21 Oct 2026 07:28:00 GMT") == 1.0
+
+
+def test_call_with_retries_returns_after_transient_errors():
+    attempts = []
+    before = get_default_registry().get_counter("retries_total", operation="test_operation", reason="OSError")
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise OSError("connection reset")
+        return "done"
+
+    assert call_with_retries(flaky, 3, 0, "test_operation", "the test call") == "done"
+    assert len(attempts) == 3
+    assert get_default_registry().get_counter("retries_total", operation="test_operation", reason="OSError") == before + 2
+
+
+def test_call_with_retries_raises_the_last_error():
+    attempts = []
+
+    def failing():
+        attempts.append(1)
+        raise ValueError(f"attempt {len(attempts)}")
+
+    with pytest.raises(ValueError, match="attempt 3"):
+        call_with_retries(failing, 2, 0, "test_operation", "the test call")
@@ -0,0 +1,104 @@
+import pytest
+
+from gen3minioclient.sharded_listing import (
+    LISTING_BATCH_SIZE,
+    clip_shard_plan,
+    create_shard_plan,
+    discover_shard_base_prefix,
+    get_shard_boundaries,
+    iter_listing,
+    iter_sharded_objects,
+)
+from tests.fake_minio import FakeMinio
+
+BUCKET = "bucket"
+
+
+def make_client(keys):
+    client = FakeMinio()
+    for key in keys:
+        client.add_object(BUCKET, key, key.encode())
+    return client
+
+
+# Keys below the did prefix that start with hex digits, plus ones that fall
+# outside the hex alphabet, before the first boundary and after the last one
+KEYS = sorted(
+    [f"PREFIX/{c}{i}/file" for c in "0123456789abcdef" for i in range(3)]
+    + ["PREFIX/-dash/file", "PREFIX/A-upper/file", "PREFIX/g/file", "PREFIX/zz/file", "PREFIX/é/file", "PREFIX/f/file"]
+)
+
+
+def test_discover_shard_base_prefix_walks_down_shared_levels():
+    client = make_client(["PREFIX/a/one", "PREFIX/b/two"])
+
+    assert discover_shard_base_prefix(client, BUCKET) == "PREFIX/"
+    assert discover_shard_base_prefix(make_client(["one/a", "two/b"]), BUCKET) == ""
+
+
+def test_shard_plan_covers_the_keyspace_without_gaps():
+    plan = create_shard_plan(get_shard_boundaries("PREFIX/"))
+
+    assert plan[0] == (None, "PREFIX/1")
+    assert plan[-1] == ("PREFIX/f", None)
+    assert all(plan[i][1] == plan[i + 1][0] for i in range(len(plan) - 1))
+
+
+def test_clip_shard_plan_drops_ranges_before_start_after():
+    plan = create_shard_plan(["b", "d", "f"])
+
+    assert clip_shard_plan(plan, "c") == [("c", "d"), ("d", "f"), ("f", None)]
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_every_key_is_listed_exactly_once(ordered, max_workers):
+    client = make_client(KEYS)
+
+    names = [obj.object_name for obj in iter_sharded_objects(client, BUCKET, max_workers=max_workers, ordered=ordered)]
+
+    assert sorted(names) == KEYS
+    if ordered:
+        assert names == KEYS
+
+
+def test_boundary_keys_are_listed_once():
+    keys = ["PREFIX/1", "PREFIX/10", "PREFIX/2", "PREFIX/f", "PREFIX/f0"]
+    client = make_client(keys)
+
+    names = [obj.object_name for obj in iter_sharded_objects(client, BUCKET, shard_plan=create_shard_plan(get_shard_boundaries("PREFIX/")))]
+
+    assert names == keys
+
+
+def test_listing_errors_are_raised_to_the_caller():
+    client = make_client(KEYS)
+    list_objects = client.list_objects
+
+    def failing_list_objects(bucket_name, prefix=None, recursive=False, start_after=None, **kwargs):
+        if start_after == "PREFIX/8":
+            raise RuntimeError("listing failed")
+        return list_objects(bucket_name, prefix=prefix, recursive=recursive, start_after=start_after, **kwargs)
+
+    client.list_objects = failing_list_objects
+
+    with pytest.raises(RuntimeError, match="listing failed"):
+        list(iter_sharded_objects(client, BUCKET, max_workers=4))
+
+
+def test_small_listings_are_not_sharded():
+    client = make_client(KEYS)
+
+    names = [obj.object_name for obj in iter_listing(client, BUCKET)]
+
+    assert names == KEYS
+    assert client.list_calls == 1
+
+
+def test_large_listings_are_complete_after_the_first_page():
+    keys = sorted(f"PREFIX/{i:05x}/file" for i in range(LISTING_BATCH_SIZE * 2 + 7))
+    client = make_client(keys + ["PREFIX/zz/file"])
+
+    names = [obj.object_name for obj in iter_listing(client, BUCKET, prefix="PREFIX/", max_workers=4)]
+
+    assert names == keys + ["PREFIX/zz/file"]
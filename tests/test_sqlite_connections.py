@@ -0,0 +1,46 @@
+import sqlite3
+import threading
+
+from gen3minioclient.sqlite_connections import ThreadLocalSQLiteDatabase
+
+SCHEMA = "CREATE TABLE IF NOT EXISTS items (name TEXT PRIMARY KEY);"
+
+
+def test_each_thread_gets_its_own_connection(tmp_path):
+    database = ThreadLocalSQLiteDatabase(str(tmp_path / "items.db"), SCHEMA)
+    connections = []
+
+    def insert(name):
+        connection = database.get_connection()
+        connections.append(connection)
+        with connection:
+            connection.execute("INSERT INTO items (name) VALUES (?)", (name,))
+
+    threads = [threading.Thread(target=insert, args=(f"item-{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(connection) for connection in connections}) == 4
+    assert database.get_connection().execute("SELECT COUNT(*) FROM items").fetchone()[0] == 4
+
+
+def test_connection_settings(tmp_path):
+    database = ThreadLocalSQLiteDatabase(str(tmp_path / "items.db"), SCHEMA, row_factory=sqlite3.Row, synchronous="NORMAL")
+    connection = database.get_connection()
+
+    assert connection.row_factory is sqlite3.Row
+    assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    # NORMAL is 1, SQLite's default of FULL is 2
+    assert connection.execute("PRAGMA synchronous").fetchone()[0] == 1
+    assert ThreadLocalSQLiteDatabase(str(tmp_path / "other.db"), SCHEMA).get_connection().execute("PRAGMA synchronous").fetchone()[0] == 2
+
+
+def test_close_opens_a_new_connection_on_next_use(tmp_path):
+    database = ThreadLocalSQLiteDatabase(str(tmp_path / "items.db"), SCHEMA)
+    connection = database.get_connection()
+
+    database.close()
+
+    assert database.get_connection() is not connection
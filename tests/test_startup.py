@@ -0,0 +1,26 @@
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ("requests", "urllib3", "httpx", "minio", "gen3")
+
+
+@pytest.mark.parametrize("module", ["gen3minioclient.gen3minioclient", "gen3minioclient.cli"])
+def test_importing_loads_no_heavy_dependencies(module):
+    # A fresh interpreter, since this one has already imported them
+    code = f"import sys, {module}; print(' '.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == ""
+
+
+def test_http_session_retries_idempotent_methods_only():
+    from gen3minioclient.indexd import create_http_session
+
+    retry = create_http_session(retries=2).get_adapter("https://gen3.example.org").max_retries
+
+    assert retry.total == 2
+    assert "POST" not in retry.allowed_methods
+    assert retry.new(total=1).increment.__func__ is retry.increment.__func__
@@ -0,0 +1,90 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from gen3minioclient.hashing import MIN_PART_SIZE
+from gen3minioclient.multipart_upload import MultipartUploader
+from gen3minioclient.stream_upload import StreamingUploader
+from tests.fake_minio import FakeMinio, calculate_etag
+
+BUCKET_NAME = "test-bucket"
+PART_SIZE = 8 * 1024 * 1024
+
+
+async def iter_chunks(data: bytes, chunk_size: int = 1024 * 1024):
+    for offset in range(0, len(data), chunk_size):
+        yield data[offset:offset + chunk_size]
+
+
+def upload(client, data: bytes, part_size: int = PART_SIZE):
+    uploader = StreamingUploader(MultipartUploader(client, BUCKET_NAME), part_size=part_size)
+    return asyncio.run(uploader.upload("did/file.bin", iter_chunks(data)))
+
+
+@pytest.mark.parametrize("size", [
+    0,
+    100,
+    MIN_PART_SIZE,
+    MIN_PART_SIZE + 1,
+    6 * 1024 * 1024,
+    PART_SIZE,
+    PART_SIZE + 1,
+    3 * PART_SIZE + 123,
+])
+def test_upload_etag_matches_object_at_size_boundaries(size):
+    client = FakeMinio()
+    data = os.urandom(size)
+
+    digests = upload(client, data)
+
+    stored = client.objects[(BUCKET_NAME, "did/file.bin")]
+    assert stored["data"] == data
+    assert digests["etag"] == stored["etag"] == calculate_etag(data, PART_SIZE)
+    assert digests["md5"] == hashlib.md5(data).hexdigest()
+    assert digests["file_size"] == size
+
+
+def test_stream_of_one_part_is_a_single_put():
+    client = FakeMinio()
+    digests = upload(client, os.urandom(PART_SIZE))
+
+    assert "-" not in digests["etag"]
+    assert client.uploads == {}
+
+
+def test_stream_over_one_part_is_a_multipart_upload():
+    client = FakeMinio()
+    digests = upload(client, os.urandom(PART_SIZE + 1))
+
+    assert digests["etag"].endswith("-2")
+    assert digests["part_count"] == 2
+
+
+def test_mismatched_etag_removes_object():
+    class CorruptingMinio(FakeMinio):
+        def put_object(self, *args, **kwargs):
+            result = super().put_object(*args, **kwargs)
+            result.etag = "0" * 32
+            return result
+
+    client = CorruptingMinio()
+    with pytest.raises(ValueError):
+        upload(client, b"some data")
+    assert client.objects == {}
+
+
+def test_failed_part_aborts_upload():
+    class FailingMinio(FakeMinio):
+        def _upload_part(self, bucket_name, object_name, data, headers, upload_id, part_number):
+            if part_number == 2:
+                raise IOError("connection reset")
+            return super()._upload_part(bucket_name, object_name, data, headers, upload_id, part_number)
+
+    client = FailingMinio()
+    uploader = StreamingUploader(MultipartUploader(client, BUCKET_NAME, part_retries=0), part_size=MIN_PART_SIZE)
+    with pytest.raises(IOError):
+        asyncio.run(uploader.upload("did/file.bin", iter_chunks(os.urandom(3 * MIN_PART_SIZE))))
+    assert client.uploads == {}
+    assert client.objects == {}
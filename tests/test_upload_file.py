@@ -0,0 +1,158 @@
+import os
+
+import pytest
+
+from gen3minioclient.gen3minioclient import Gen3MinioClient
+from gen3minioclient.upload_journal import STAGE_BLANK_RECORD_CREATED, STAGE_INDEX_UPDATED, STAGE_UPLOADED, UploadJournal
+from tests.fake_indexd import FakeIndexd
+from tests.fake_minio import FakeMinio
+
+BUCKET_NAME = "test-bucket"
+
+
+@pytest.fixture
+def gen3_minio_client():
+    client = Gen3MinioClient()
+    client.minio_bucket_name = BUCKET_NAME
+    client.minio_api_endpoint = "minio.example.org"
+    client.manifest_file_location = None
+    client.manifest_store_location = None
+    client.hash_cache_location = None
+    client.multipart_upload = False
+    client.client = FakeMinio()
+    client._indexd_client = FakeIndexd()
+    return client
+
+
+@pytest.fixture
+def upload_path(tmp_path):
+    path = tmp_path / "file.bin"
+    path.write_bytes(os.urandom(1024))
+    return str(path)
+
+
+def test_upload_file_indexes_uploaded_object(gen3_minio_client, upload_path, tmp_path):
+    journal = UploadJournal(str(tmp_path / "journal.db"))
+
+    result = gen3_minio_client.upload_file(upload_path, journal=journal)
+
+    assert result["status"] == "uploaded"
+    record = gen3_minio_client._indexd_client.records[result["did"]]
+    assert record["hashes"] == {"md5": result["md5"]}
+    assert (BUCKET_NAME, f"{result['did']}/file.bin") in gen3_minio_client.client.objects
+    assert journal.get(upload_path)["stage"] == STAGE_INDEX_UPDATED
+
+
+def test_upload_file_fails_on_etag_mismatch(gen3_minio_client, upload_path, tmp_path):
+    class CorruptingMinio(FakeMinio):
+        def fput_object(self, *args, **kwargs):
+            result = super().fput_object(*args, **kwargs)
+            result.etag = "0" * 32
+            return result
+
+    gen3_minio_client.client = CorruptingMinio()
+    journal = UploadJournal(str(tmp_path / "journal.db"))
+
+    result = gen3_minio_client.upload_file(upload_path, journal=journal)
+
+    assert result["status"] == "failed"
+    assert result["stage"] == "upload"
+    assert gen3_minio_client.client.objects == {}
+    entry = journal.get(upload_path)
+    # The blank record is kept for the next attempt, but the digests are not
+    assert entry["stage"] == STAGE_BLANK_RECORD_CREATED
+    assert entry["digests"] is None
+    assert "does not match" in entry["error"]
+
+    # The next run hashes the file again and reuses the blank record
+    gen3_minio_client.client = FakeMinio()
+    result = gen3_minio_client.upload_file(upload_path, journal=journal)
+
+    assert result["status"] == "uploaded"
+    assert result["did"] == entry["did"]
+    assert len(gen3_minio_client._indexd_client.records) == 1
+    assert journal.get(upload_path)["stage"] == STAGE_INDEX_UPDATED
+
+
+def test_resume_in_another_upload_mode_hashes_again(gen3_minio_client, upload_path, tmp_path):
+    class FailingMinio(FakeMinio):
+        def fput_object(self, *args, **kwargs):
+            raise ConnectionError("connection reset")
+
+    gen3_minio_client.client = FailingMinio()
+    journal = UploadJournal(str(tmp_path / "journal.db"))
+
+    result = gen3_minio_client.upload_file(upload_path, multipart=True, journal=journal)
+
+    assert result["status"] == "failed"
+    entry = journal.get(upload_path)
+    # A multipart upload of a small file has one part the size of the file,
+    # which 'fput_object' would reject
+    assert entry["digests"]["part_size"] == 1024
+
+    gen3_minio_client.client = FakeMinio()
+    result = gen3_minio_client.upload_file(upload_path, multipart=False, journal=journal)
+
+    assert result["status"] == "uploaded"
+    assert result["did"] == entry["did"]
+    assert len(gen3_minio_client._indexd_client.records) == 1
+    assert journal.get(upload_path)["digests"]["part_size"] != 1024
+
+
+def test_failed_index_update_does_not_advance_journal(gen3_minio_client, upload_path, tmp_path):
+    indexd = gen3_minio_client._indexd_client
+    indexd.update_status_code = 503
+    journal = UploadJournal(str(tmp_path / "journal.db"))
+
+    result = gen3_minio_client.upload_file(upload_path, journal=journal)
+
+    assert result["status"] == "failed"
+    assert result["stage"] == "index update"
+    assert journal.get(upload_path)["stage"] == STAGE_UPLOADED
+    assert indexd.records[result["did"]]["hashes"] == {}
+
+    # The next run only retries the index update, with the same record
+    indexd.update_status_code = None
+    result = gen3_minio_client.upload_file(upload_path, journal=journal)
+
+    assert result["status"] == "uploaded"
+    assert len(indexd.records) == 1
+    assert indexd.records[result["did"]]["hashes"] == {"md5": result["md5"]}
+    assert journal.get(upload_path)["stage"] == STAGE_INDEX_UPDATED
+
+
+def test_unused_reserved_records_are_released(gen3_minio_client, tmp_path):
+    indexd = gen3_minio_client._indexd_client
+    new_path = tmp_path / "new.bin"
+    new_path.write_bytes(os.urandom(1024))
+    duplicate_path = tmp_path / "duplicate.bin"
+    duplicate_path.write_bytes(b"already uploaded")
+    gen3_minio_client.client.add_object(BUCKET_NAME, "PREFIX/existing/other.bin", b"already uploaded")
+    gen3_minio_client.list_bucket_for_existence_check = True
+    released_dids = []
+
+    def reserve_blank_records(file_paths, max_connections=None):
+        records = {}
+        for file_path in file_paths:
+            record = indexd.create_blank_record("uploader", os.path.basename(file_path)).json()
+            records[file_path] = {"did": record["did"], "rev": record["rev"]}
+        return records
+
+    def release_blank_records(dids, max_connections=None):
+        released_dids.extend(dids)
+        for did in dids:
+            indexd.delete_record(did, indexd.records[did]["rev"])
+
+    gen3_minio_client.reserve_blank_records = reserve_blank_records
+    gen3_minio_client.release_blank_records = release_blank_records
+
+    results = gen3_minio_client.upload_files_and_update_records(
+        [str(new_path), str(duplicate_path)],
+        str(tmp_path / "manifest.tsv"),
+        reserve_blank_records=True,
+    )
+
+    statuses = {os.path.basename(result["file_path"]): result["status"] for result in results}
+    assert statuses == {"new.bin": "uploaded", "duplicate.bin": "skipped"}
+    assert len(released_dids) == 1
+    assert list(indexd.records) == [result["did"] for result in results if result["status"] == "uploaded"]
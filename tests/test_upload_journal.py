@@ -0,0 +1,129 @@
+import os
+
+import pytest
+
+from gen3minioclient.upload_journal import (
+    JOURNAL_STAGES,
+    STAGE_BLANK_RECORD_CREATED,
+    STAGE_HASHED,
+    STAGE_INDEX_UPDATED,
+    STAGE_PENDING,
+    STAGE_UPLOADED,
+    UploadJournal,
+    has_reached_stage,
+)
+
+DIGESTS = {"md5": "d41d8cd98f00b204e9800998ecf8427e", "etag": "d41d8cd98f00b204e9800998ecf8427e", "file_size": 0}
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return UploadJournal(str(tmp_path / "journal.db"))
+
+
+@pytest.fixture
+def file_path(tmp_path):
+    path = tmp_path / "file.bin"
+    path.write_bytes(b"")
+    return str(path)
+
+
+def test_has_reached_stage_follows_stage_order():
+    entry = {"stage": STAGE_BLANK_RECORD_CREATED}
+
+    assert has_reached_stage(entry, STAGE_HASHED)
+    assert has_reached_stage(entry, STAGE_BLANK_RECORD_CREATED)
+    assert not has_reached_stage(entry, STAGE_UPLOADED)
+    assert not has_reached_stage(None, STAGE_PENDING)
+
+
+def test_stages_are_recorded_in_order_and_survive_reopening(journal, file_path):
+    journal.record_stage(file_path, STAGE_HASHED, digests=DIGESTS, file_size=0, file_mtime_ns=1)
+    journal.record_stage(file_path, STAGE_BLANK_RECORD_CREATED, did="PREFIX/1", rev="rev")
+    journal.record_stage(file_path, STAGE_UPLOADED, object_name="PREFIX/1/file.bin", minio_object={"md5": DIGESTS["md5"]})
+
+    entry = UploadJournal(journal.journal_file).get(file_path)
+
+    assert entry["stage"] == STAGE_UPLOADED
+    assert entry["digests"] == DIGESTS
+    assert (entry["did"], entry["rev"]) == ("PREFIX/1", "rev")
+    assert entry["minio_object"] == {"md5": DIGESTS["md5"]}
+    assert journal.get_incomplete_file_paths() == [file_path]
+
+    journal.record_stage(file_path, STAGE_INDEX_UPDATED)
+
+    assert journal.get_incomplete_file_paths() == []
+
+
+def test_errors_do_not_change_the_stage(journal, file_path):
+    journal.record_stage(file_path, STAGE_HASHED, digests=DIGESTS)
+
+    journal.record_error(file_path, "blank index: 503")
+
+    entry = journal.get(file_path)
+    assert entry["stage"] == STAGE_HASHED
+    assert entry["error"] == "blank index: 503"
+
+
+def test_parts_are_kept_until_cleared(journal, file_path):
+    journal.record_stage(file_path, STAGE_BLANK_RECORD_CREATED, did="PREFIX/1", rev="rev")
+    journal.record_upload_id(file_path, "PREFIX/1/file.bin", "upload-1")
+    journal.record_part(file_path, "upload-1", {"part_number": 2, "etag": "b", "md5": "b"})
+    journal.record_part(file_path, "upload-1", {"part_number": 1, "etag": "a", "md5": "a"})
+
+    assert journal.get(file_path)["upload_id"] == "upload-1"
+    assert journal.get_parts(file_path) == {1: {"etag": "a", "md5": "a"}, 2: {"etag": "b", "md5": "b"}}
+
+    journal.clear_parts(file_path)
+
+    assert journal.get_parts(file_path) == {}
+    assert journal.get(file_path)["upload_id"] is None
+
+
+def test_reset_file_contents_keeps_the_blank_record(journal, file_path):
+    journal.record_stage(file_path, STAGE_HASHED, digests=DIGESTS)
+    journal.record_stage(file_path, STAGE_BLANK_RECORD_CREATED, did="PREFIX/1", rev="rev")
+    journal.record_part(file_path, "upload-1", {"part_number": 1, "etag": "a", "md5": "a"})
+    journal.record_stage(file_path, STAGE_UPLOADED, minio_object={"md5": DIGESTS["md5"]})
+
+    journal.reset_file_contents(file_path)
+
+    entry = journal.get(file_path)
+    assert entry["stage"] == STAGE_BLANK_RECORD_CREATED
+    assert entry["did"] == "PREFIX/1"
+    assert entry["digests"] is None and entry["minio_object"] is None
+    assert journal.get_parts(file_path) == {}
+
+
+def test_reset_file_contents_without_a_blank_record_starts_over(journal, file_path):
+    journal.record_stage(file_path, STAGE_HASHED, digests=DIGESTS)
+
+    journal.reset_file_contents(file_path)
+
+    assert journal.get(file_path)["stage"] == STAGE_PENDING
+
+
+def test_uploaded_entries_await_the_manifest_update_until_marked(journal, file_path):
+    journal.record_stage(file_path, STAGE_UPLOADED, minio_object={"md5": DIGESTS["md5"]})
+
+    assert [entry["file_path"] for entry in journal.get_entries_awaiting_manifest_update()] == [file_path]
+
+    journal.mark_manifest_updated([file_path])
+
+    assert journal.get_entries_awaiting_manifest_update() == []
+    assert journal.get(file_path)["manifest_updated"] is True
+
+
+def test_is_file_unchanged_compares_size_and_mtime(journal, file_path):
+    stat = os.stat(file_path)
+    journal.record_stage(file_path, STAGE_HASHED, digests=DIGESTS, file_size=stat.st_size, file_mtime_ns=stat.st_mtime_ns)
+    assert journal.is_file_unchanged(journal.get(file_path), file_path)
+
+    with open(file_path, "wb") as f:
+        f.write(b"changed")
+
+    assert not journal.is_file_unchanged(journal.get(file_path), file_path)
+
+
+def test_stage_list_is_complete():
+    assert JOURNAL_STAGES == [STAGE_PENDING, STAGE_HASHED, STAGE_BLANK_RECORD_CREATED, STAGE_UPLOADED, STAGE_INDEX_UPDATED]